@@ -0,0 +1,275 @@
+"""
+Headless batch summarization and indexing.
+
+Runs extraction, summarization and chunk embedding for a directory (or manifest)
+of PDFs in a process pool, one copy of the models per worker. Results are appended
+to results.jsonl as each document finishes, so an interrupted run resumes where it
+stopped when started again with the same output directory. Chunk embeddings go to
+embeddings/<hash>.npy and their texts, one JSON string per line, to
+embeddings/<hash>.chunks.jsonl.
+
+    python batch_summarize.py papers/ --output-dir out/ --workers 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+from extractor.pdf_document import count_pages, iter_page_texts, load_pdf_document
+from storage.artifact_cache import hash_pdf_file
+
+RESULTS_FILE = "results.jsonl"
+EMBEDDINGS_DIR = "embeddings"
+CHUNKS_SUFFIX = ".chunks.jsonl"
+EMBED_BATCH_SIZE = 64
+
+_worker = {}
+
+
+def find_pdfs(source):
+    """
+    List the PDFs to process: every .pdf under a directory, or the paths in a manifest
+    file (one per line, or JSON lines with a "path" field).
+    """
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+        return sorted(paths)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            path = json.loads(line)["path"] if line.startswith("{") else line
+            paths.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+    return paths
+
+
+def load_completed(results_path):
+    """Paths that already have a successful result, so a restarted run can skip them."""
+    completed = set()
+    if not os.path.exists(results_path):
+        return completed
+    with open(results_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line
+                continue
+            if "error" not in record:
+                completed.add(record["path"])
+    return completed
+
+
+def init_worker(options):
+    logging.basicConfig(level=logging.WARNING)
+    _worker["options"] = options
+
+
+def worker_model(name):
+    """
+    The worker's copy of a model, loaded on its first document. Loading here rather
+    than in the pool initializer matters: a failing initializer makes the pool respawn
+    the worker forever, while a failure here is reported as that document's error.
+    """
+    if name not in _worker:
+        import torch
+        torch.set_num_threads(_worker["options"]["threads"])
+        if name == "summarizer":
+            from summarizer.model_loader import load_summarizer_model
+            _worker[name] = load_summarizer_model()
+        else:
+            from chatbot.embedder import Embedder
+            _worker[name] = Embedder()
+    return _worker[name]
+
+
+def read_chunks(chunks_path) -> list:
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def embed_pdf_streaming(path, embeddings_path, chunks_path, record, options):
+    """
+    Extract, chunk and embed a PDF page by page, so memory does not grow with its length.
+
+    Embedding batches are appended to a raw float32 file and converted to .npy at the
+    end; chunk texts are appended to `chunks_path` as they are embedded. The word and
+    chunk counts are collected into `record`.
+    """
+    record["words"] = 0
+    record["chunks"] = 0
+
+    def pages():
+        for text in iter_page_texts(path):
+            text = text.replace("<n>", "\n")
+            record["words"] += len(text.split())
+            yield text
+
+    embedder = worker_model("embedder")
+    chunker = embedder.chunker(options["chunk_tokens"], options["chunk_overlap"])
+    chunks = chunker.iter_chunks(pages())
+    raw_path = embeddings_path + ".part"
+    dim = 0
+    with open(raw_path, "wb") as raw, open(chunks_path, "w", encoding="utf-8") as chunk_texts:
+        while True:
+            batch = list(islice(chunks, EMBED_BATCH_SIZE))
+            if not batch:
+                break
+            embeddings = embedder.embed_texts(batch)
+            dim = embeddings.shape[1]
+            raw.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+            chunk_texts.writelines(json.dumps(chunk) + "\n" for chunk in batch)
+            record["chunks"] += len(batch)
+
+    num_chunks = record["chunks"]
+    output = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32, shape=(num_chunks, dim))
+    if num_chunks:
+        output[:] = np.memmap(raw_path, dtype=np.float32, mode="r", shape=(num_chunks, dim))
+    output.flush()
+    del output
+    os.remove(raw_path)
+
+
+def process_pdf(path):
+    options = _worker["options"]
+    started = time.perf_counter()
+    try:
+        doc_hash = hash_pdf_file(path)
+        record = {
+            "path": path,
+            "doc_hash": doc_hash,
+            "pages": count_pages(path),
+        }
+
+        if options["embed"]:
+            embeddings_path = os.path.join(options["output_dir"], EMBEDDINGS_DIR, f"{doc_hash}.npy")
+            chunks_path = os.path.join(options["output_dir"], EMBEDDINGS_DIR, f"{doc_hash}{CHUNKS_SUFFIX}")
+            embed_pdf_streaming(path, embeddings_path, chunks_path, record, options)
+            record["embeddings_path"] = os.path.relpath(embeddings_path, options["output_dir"])
+            record["chunks_path"] = os.path.relpath(chunks_path, options["output_dir"])
+
+        if options["summarize"]:
+            from summarizer.extractive import ChunkEmbeddings
+            from summarizer.summarization import summarize_document
+            # Heading detection needs the whole document's layout, so summarization still parses it in full.
+            # Sequential: the pool already runs one document per core, and its workers cannot start processes.
+            with open(path, "rb") as f:
+                document = load_pdf_document(f.read(), workers=1)
+            full_text = document.full_text.replace("<n>", "\n")
+            record.setdefault("words", len(full_text.split()))
+            chunk_embeddings = None
+            if options["summary_mode"] != "full" and options["embed"]:
+                # Rank sentences with the chunk embeddings just written
+                chunk_embeddings = ChunkEmbeddings.locate(
+                    full_text, read_chunks(chunks_path), np.load(embeddings_path, mmap_mode="r")
+                )
+            summarizer = worker_model("summarizer") if options["summary_mode"] != "extractive" else None
+            record["summary"] = summarize_document(
+                full_text, summarizer, document, batch_size=options["batch_size"],
+                mode=options["summary_mode"], chunk_embeddings=chunk_embeddings,
+            )
+    except Exception as e:
+        record = {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def run(paths, output_dir, workers=1, summarize=True, embed=True, batch_size=8, threads=None,
+        chunk_tokens=128, chunk_overlap=24, summary_mode="full"):
+    os.makedirs(os.path.join(output_dir, EMBEDDINGS_DIR), exist_ok=True)
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+
+    completed = load_completed(results_path)
+    pending = [p for p in paths if p not in completed]
+    print(f"{len(paths)} PDFs, {len(completed & set(paths))} already done, {len(pending)} to process.")
+    if not pending:
+        return
+
+    # Split the cores between workers instead of letting every worker's torch use all of them
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    options = {
+        "output_dir": output_dir,
+        "summarize": summarize,
+        "embed": embed,
+        "batch_size": batch_size,
+        "threads": threads,
+        "chunk_tokens": chunk_tokens,
+        "summary_mode": summary_mode,
+        "chunk_overlap": chunk_overlap,
+    }
+
+    started = time.perf_counter()
+    docs_done = pages_done = failures = 0
+    # spawn: torch and tokenizers thread pools do not survive fork reliably
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=init_worker, initargs=(options,)) as pool, \
+            open(results_path, "a", encoding="utf-8") as results:
+        for record in pool.imap_unordered(process_pdf, pending):
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+            if "error" in record:
+                failures += 1
+                print(f"  failed {record['path']}: {record['error']}")
+                continue
+
+            docs_done += 1
+            pages_done += record["pages"]
+            elapsed = time.perf_counter() - started
+            print(
+                f"  [{docs_done + failures}/{len(pending)}] {os.path.basename(record['path'])} "
+                f"({record['pages']} pages, {record['seconds']:.1f}s) - "
+                f"{docs_done / elapsed * 60:.2f} docs/min, {pages_done / elapsed:.2f} pages/s"
+            )
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Done: {docs_done} documents ({failures} failed) in {elapsed:.1f}s - "
+        f"{docs_done / elapsed * 60:.2f} docs/min, {pages_done / elapsed:.2f} pages/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize and index a batch of PDFs without the Streamlit app.")
+    parser.add_argument("source", help="Directory of PDFs, or a manifest file listing PDF paths")
+    parser.add_argument("--output-dir", default="batch_output", help="Where results.jsonl and embeddings are written")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Torch threads per worker process (default: cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Summarizer chunks per forward pass")
+    parser.add_argument("--chunk-tokens", type=int, default=128, help="Embedder tokens per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=24, help="Embedder tokens shared by consecutive chunks")
+    parser.add_argument("--no-summary", action="store_true", help="Skip summarization")
+    parser.add_argument("--summary-mode", choices=["full", "fast", "extractive"], default="full",
+                        help="fast: summarize each section's most central sentences; extractive: return them as is")
+    parser.add_argument("--no-embeddings", action="store_true", help="Skip chunk embedding")
+    args = parser.parse_args()
+
+    run(
+        find_pdfs(args.source),
+        args.output_dir,
+        workers=args.workers,
+        summarize=not args.no_summary,
+        embed=not args.no_embeddings,
+        batch_size=args.batch_size,
+        threads=args.threads_per_worker,
+        chunk_tokens=args.chunk_tokens,
+        summary_mode=args.summary_mode,
+        chunk_overlap=args.chunk_overlap,
+    )
+
+
+if __name__ == "__main__":
+    main()
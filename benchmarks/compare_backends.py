@@ -0,0 +1,173 @@
+"""
+Compare inference backends for one model on the same sample set.
+
+The first backend is the reference. Each backend runs every sample once (after a
+warm-up call), and its latency and agreement with the reference outputs are reported:
+cosine similarity and top-k retrieval overlap for the embedder, exact-match rate and
+token F1 for the summarizer and chat model.
+
+    python -m benchmarks.compare_backends --role summarizer --backends torch int8 onnx
+    python -m benchmarks.compare_backends --role embedder --pdf paper.pdf --output compare.json
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+
+from benchmarks.run_benchmarks import QUERIES
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from extractor.pdf_document import load_pdf_document
+from inference.backends import BACKENDS
+from parser.chunker import chunk_text_with_overlap
+
+TOP_K = 5
+
+
+def load_samples(pdf_path, num_samples, seed):
+    if pdf_path:
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = make_synthetic_pdf(max(4, num_samples // 2), seed=seed)
+    chunks = chunk_text_with_overlap(load_pdf_document(pdf_bytes).full_text.replace("<n>", "\n"))
+    return chunks[:num_samples]
+
+
+def token_f1(prediction, reference):
+    pred, ref = prediction.lower().split(), reference.lower().split()
+    if not pred or not ref:
+        return float(pred == ref)
+    overlap = sum((Counter(pred) & Counter(ref)).values())
+    if overlap == 0:
+        return 0.0
+    precision, recall = overlap / len(pred), overlap / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def make_runner(role, backend, max_length):
+    """Load the model on `backend` and return a function mapping one sample to its output."""
+    if role == "embedder":
+        from chatbot.embedder import Embedder
+        from storage.embedding_cache import EmbeddingCache
+
+        # No cache: every call must actually run the model
+        embedder = Embedder(cache=EmbeddingCache(max_entries=0), backend=backend)
+        return lambda text: embedder.embed_texts([text])[0]
+
+    if role == "summarizer":
+        from summarizer.model_loader import load_summarizer_model
+
+        summarizer = load_summarizer_model(backend=backend)
+        return lambda text: summarizer(text, min_length=10, max_length=max_length, truncation=True)[0]["summary_text"]
+
+    import torch
+    from chatbot.prompt_builder import PromptBuilder
+    from inference.backends import load_text2text_pipeline
+
+    generator = load_text2text_pipeline("text2text-generation", "google/flan-t5-small", backend)
+    prompt_builder = PromptBuilder(generator.tokenizer, max_tokens=512)
+
+    def answer(text):
+        input_ids = torch.tensor([prompt_builder.build(QUERIES[len(text) % len(QUERIES)], [text], [])])
+        outputs = generator.model.generate(input_ids=input_ids, max_length=max_length, do_sample=False)
+        return generator.tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
+
+    return answer
+
+
+def run_backend(role, backend, samples, max_length):
+    started = time.perf_counter()
+    runner = make_runner(role, backend, max_length)
+    load_seconds = time.perf_counter() - started
+    runner(samples[0])
+
+    outputs, latencies = [], []
+    for sample in samples:
+        started = time.perf_counter()
+        outputs.append(runner(sample))
+        latencies.append(time.perf_counter() - started)
+
+    return runner, outputs, {
+        "load_seconds": load_seconds,
+        "median_seconds": statistics.median(latencies),
+        "p90_seconds": sorted(latencies)[int(0.9 * (len(latencies) - 1))],
+        "samples_per_second": len(samples) / sum(latencies),
+    }
+
+
+def agreement(role, outputs, reference, query_vectors=None, reference_query_vectors=None):
+    if role == "embedder":
+        outputs, reference = np.stack(outputs), np.stack(reference)
+        cosines = np.sum(outputs * reference, axis=1)
+        overlaps = []
+        for query, reference_query in zip(query_vectors, reference_query_vectors):
+            top = set(np.argsort(-outputs @ query)[:TOP_K])
+            reference_top = set(np.argsort(-reference @ reference_query)[:TOP_K])
+            overlaps.append(len(top & reference_top) / len(reference_top))
+        return {
+            "mean_cosine": float(cosines.mean()),
+            "min_cosine": float(cosines.min()),
+            f"top{TOP_K}_overlap": float(np.mean(overlaps)),
+        }
+
+    return {
+        "exact_match": float(np.mean([o == r for o, r in zip(outputs, reference)])),
+        "mean_token_f1": float(np.mean([token_f1(o, r) for o, r in zip(outputs, reference)])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare latency and output agreement of inference backends.")
+    parser.add_argument("--role", choices=["summarizer", "chat", "embedder"], default="summarizer")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["torch", "int8"],
+                        help="Backends to compare; the first is the reference")
+    parser.add_argument("--pdf", help="Take samples from this PDF instead of a synthetic one")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=64, help="Max generated tokens for summarizer/chat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    samples = load_samples(args.pdf, args.samples, args.seed)
+    print(f"Comparing {', '.join(args.backends)} for the {args.role} on {len(samples)} samples...")
+
+    report = {"role": args.role, "samples": len(samples), "backends": {}}
+    reference = reference_query_vectors = None
+    for backend in args.backends:
+        runner, outputs, result = run_backend(args.role, backend, samples, args.max_length)
+        query_vectors = None
+        if args.role == "embedder":
+            # Retrieval agreement: embed the benchmark questions with the same backend
+            query_vectors = [runner(query) for query in QUERIES]
+
+        if reference is None:
+            reference, reference_query_vectors = outputs, query_vectors
+            reference_seconds = result["median_seconds"]
+        else:
+            result.update(agreement(args.role, outputs, reference, query_vectors, reference_query_vectors))
+        result["speedup"] = reference_seconds / result["median_seconds"]
+        report["backends"][backend] = result
+
+    print(f"\n{'backend':<8}{'load s':>9}{'median s':>11}{'p90 s':>9}{'speedup':>9}  agreement with {args.backends[0]}")
+    for backend, result in report["backends"].items():
+        scores = ", ".join(
+            f"{name}={result[name]:.3f}"
+            for name in ("mean_cosine", "min_cosine", f"top{TOP_K}_overlap", "exact_match", "mean_token_f1")
+            if name in result
+        )
+        print(
+            f"{backend:<8}{result['load_seconds']:>9.2f}{result['median_seconds']:>11.4f}"
+            f"{result['p90_seconds']:>9.4f}{result['speedup']:>8.2f}x  {scores or '(reference)'}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
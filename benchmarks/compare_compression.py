@@ -0,0 +1,148 @@
+"""
+Compare compressed vector storage against the exact float32 index on one document.
+
+Every compression indexes the same chunk embeddings. Reported per compression: bytes
+per vector, index memory per document, query latency, recall@k of the compressed
+first pass alone and after exact re-ranking (against the uncompressed results), and
+how often the same number of results pass the relevance threshold. Recall counts
+tied scores as matches.
+
+    python -m benchmarks.compare_compression --pages 200
+    python -m benchmarks.compare_compression --pdf paper.pdf --models real --output compression.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.run_benchmarks import QUERIES
+from benchmarks.stubs import StubEmbedder
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from chatbot.vectorstore import COMPRESSIONS, VectorStore
+from extractor.pdf_document import load_pdf_document
+from parser.chunker import chunk_text_with_overlap
+
+DOC_ID = "document"
+# Exact scores this close count as ties: overlapping chunks often score identically
+TIE_TOLERANCE = 1e-5
+
+
+def load_chunks(pdf_path, pages, seed):
+    if pdf_path:
+        with open(pdf_path, "rb") as f:
+            pdf_bytes = f.read()
+    else:
+        pdf_bytes = make_synthetic_pdf(pages, seed=seed)
+    return chunk_text_with_overlap(load_pdf_document(pdf_bytes).full_text.replace("<n>", "\n"))
+
+
+def make_queries(chunks, num_queries, seed):
+    """The benchmark questions plus the opening words of randomly picked chunks."""
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(chunks), size=min(num_queries, len(chunks)), replace=False)
+    return QUERIES + [" ".join(chunks[i].split()[:12]) for i in picked]
+
+
+def tie_aware_recall(scores, reference_scores):
+    """Share of the reference top-k matched by results scoring at least the reference's k-th score."""
+    if not len(reference_scores):
+        return 1.0
+    hits = np.sum(scores >= reference_scores[-1] - TIE_TOLERANCE)
+    return min(int(hits), len(reference_scores)) / len(reference_scores)
+
+
+def run_compression(compression, embeddings, chunks, query_vectors, top_k, threshold, reference):
+    started = time.perf_counter()
+    store = VectorStore(embeddings.shape[1], compression=compression)
+    store.add_embeddings(embeddings, chunks, doc_id=DOC_ID)
+    build_seconds = time.perf_counter() - started
+
+    results, latencies = [], []
+    for query in query_vectors:
+        started = time.perf_counter()
+        results.append(store.search(query, top_k=top_k))
+        latencies.append(time.perf_counter() - started)
+
+    result = {
+        "bytes_per_vector": store.bytes_per_vector(),
+        "document_mb": store.memory_by_document()[DOC_ID] / 1024 ** 2,
+        "build_seconds": build_seconds,
+        "median_query_seconds": statistics.median(latencies),
+    }
+    if reference is None:
+        return store, results, result
+
+    first_pass, reranked, threshold_match = [], [], []
+    for query, (ids, scores), (ref_ids, ref_scores) in zip(query_vectors, results, reference):
+        # Recall of the compressed codes alone: a plain top-k search of the underlying index
+        _, raw_ids = store.index.search(query.reshape(1, -1).astype(np.float32), top_k)
+        raw_ids = raw_ids[0][raw_ids[0] >= 0]
+        first_pass.append(tie_aware_recall(embeddings[raw_ids] @ query, ref_scores))
+        reranked.append(tie_aware_recall(scores, ref_scores))
+        threshold_match.append(np.sum(scores >= threshold) == np.sum(ref_scores >= threshold))
+    result.update({
+        f"first_pass_recall@{top_k}": float(np.mean(first_pass)),
+        f"recall@{top_k}": float(np.mean(reranked)),
+        "threshold_agreement": float(np.mean(threshold_match)),
+    })
+    return store, results, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and recall of compressed vector storage.")
+    parser.add_argument("--compressions", nargs="+", choices=COMPRESSIONS, default=list(COMPRESSIONS),
+                        help="Compressions to compare; 'none' (exact) is always the reference")
+    parser.add_argument("--pdf", help="Index this PDF instead of a synthetic one")
+    parser.add_argument("--pages", type=int, default=200, help="Pages of the synthetic PDF")
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--queries", type=int, default=100, help="Chunk-derived queries besides the fixed questions")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf, args.pages, args.seed)
+    if args.models == "real":
+        from chatbot.embedder import Embedder
+
+        embedder = Embedder()
+    else:
+        embedder = StubEmbedder(dim=768)
+    embeddings = embedder.embed_texts(chunks)
+    query_vectors = embedder.embed_texts(make_queries(chunks, args.queries, args.seed))
+    print(f"{len(chunks)} chunks of {embeddings.shape[1]} dims, {len(query_vectors)} queries")
+
+    compressions = ["none"] + [c for c in args.compressions if c != "none"]
+    report = {"chunks": len(chunks), "dim": int(embeddings.shape[1]), "compressions": {}}
+    reference = None
+    for compression in compressions:
+        _, results, result = run_compression(
+            compression, embeddings, chunks, query_vectors, args.top_k, args.threshold, reference
+        )
+        reference = reference or results
+        report["compressions"][compression] = result
+
+    recall = f"recall@{args.top_k}"
+    print(
+        f"\n{'storage':<8}{'B/vector':>10}{'doc MB':>9}{'query ms':>10}"
+        f"{'first pass':>12}{recall:>11}{'threshold':>11}"
+    )
+    for compression, result in report["compressions"].items():
+        print(
+            f"{compression:<8}{result['bytes_per_vector']:>10}{result['document_mb']:>9.2f}"
+            f"{result['median_query_seconds'] * 1000:>10.3f}"
+            f"{result.get('first_pass_' + recall, 1.0):>12.3f}{result.get(recall, 1.0):>11.3f}"
+            f"{result.get('threshold_agreement', 1.0):>11.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
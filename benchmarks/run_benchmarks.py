@@ -0,0 +1,302 @@
+"""
+Benchmark every pipeline stage on synthetic research-paper PDFs.
+
+Each stage is timed separately (median of --repeat runs) and its peak Python heap
+allocation is measured with tracemalloc in one extra run. tracemalloc only sees
+allocations made through Python's allocator, not native ones (PyMuPDF pages, torch
+tensors, faiss indexes), so the figure is reported as python_heap_peak_mb rather
+than as process memory. Results for every page count are written as JSON; pass
+--baseline to compare against an earlier run.
+
+    python -m benchmarks.run_benchmarks --pages 10 50 200 --output bench.json
+    python -m benchmarks.run_benchmarks --pages 10 50 200 --baseline bench.json
+
+By default embedding, summarization and generation use offline stub models so
+the suite runs without network access; --models real loads the app's models.
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.stubs import StubEmbedder, StubSummarizer, StubTokenizer, stub_generate
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from chatbot.prompt_builder import PromptBuilder
+from chatbot.rag_pipeline import RAGPipeline
+from extractor.parallel import PARALLEL_MIN_PAGES
+from extractor.pdf_document import iter_page_texts, load_pdf_document
+from extractor.pdf_extractor import extract_text_from_pdf
+from parser.chunker import chunk_large_section, chunk_text_with_overlap, iter_chunks_with_overlap
+from parser.heading_detector import chunk_text_by_headings, detect_headings_from_lines
+from summarizer.extractive import ChunkEmbeddings
+from summarizer.summarization import extract_lines_with_bold_info, summarize_document
+from summarizer.utils import detect_image_only_pages, is_section_image_only
+
+QUERIES = [
+    "What dataset was used for training?",
+    "What is the main contribution of the paper?",
+    "How does the proposed approach compare to the baseline?",
+    "What are the limitations of the method?",
+    "accuracy",
+]
+
+
+def measure(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, {
+        "seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "python_heap_peak_mb": peak / 2 ** 20,
+    }
+
+
+def locate_sections(text, sections):
+    """Character spans of each section in the full text, as summarize_document finds them."""
+    spans = []
+    last_pos = 0
+    for heading, content in sections.items():
+        content = content.strip()
+        start_pos = text.find(content, last_pos) if content else -1
+        if start_pos == -1:
+            continue
+        last_pos = start_pos + len(content)
+        spans.append((heading, start_pos, last_pos))
+    return spans
+
+
+def load_models(kind):
+    if kind == "stub":
+        tokenizer = StubTokenizer()
+        prompt_builder = PromptBuilder(tokenizer, max_tokens=512)
+
+        def generate(query, chunks, history):
+            return stub_generate(prompt_builder.build(query, chunks, history))
+
+        return StubEmbedder(), StubSummarizer(), generate
+
+    from chatbot.chatbot_runner import ChatbotRunner
+    from chatbot.embedder import Embedder
+    from storage.embedding_cache import EmbeddingCache
+    from summarizer.model_loader import load_summarizer_model
+
+    # No embedding cache, so repeats measure encoding rather than cache hits
+    embedder = Embedder(cache=EmbeddingCache(max_entries=0))
+    chatbot = ChatbotRunner()
+
+    def generate(query, chunks, history):
+        return chatbot.generate_response(query, chunks, chat_history=history)
+
+    return embedder, load_summarizer_model(), generate
+
+
+def benchmark_document(pdf_bytes, embedder, summarizer, generate, repeat):
+    results = {}
+    # Also starts the extraction worker pool, so parallel_extraction below times parsing, not process startup
+    document = load_pdf_document(pdf_bytes)
+
+    # Sequential, so the stage measures the same parser at every page count
+    full_text, results["extract_text_from_pdf"] = measure(lambda: extract_text_from_pdf(pdf_bytes, workers=1), repeat)
+    if len(document) >= PARALLEL_MIN_PAGES:
+        # What the app runs for long documents: page ranges across the warm worker pool
+        _, results["parallel_extraction"] = measure(lambda: extract_text_from_pdf(pdf_bytes), repeat)
+
+    _, results["bold_line_extraction"] = measure(lambda: extract_lines_with_bold_info(document), repeat)
+
+    def detect_headings():
+        return detect_headings_from_lines(document.lines, full_text)
+
+    headings, results["heading_detection"] = measure(detect_headings, repeat)
+    results["heading_detection"]["pages_per_second"] = len(document) / max(results["heading_detection"]["seconds"], 1e-9)
+
+    def chunk():
+        sections = chunk_text_by_headings(full_text, headings)
+        section_chunks = [chunk_large_section(content) for content in sections.values()]
+        return sections, section_chunks, chunk_text_with_overlap(full_text)
+
+    (sections, _, chunks), results["chunking"] = measure(chunk, repeat)
+
+    def stream_chunks():
+        # Page-streaming extraction + chunking: its Python heap peak should not grow with page count
+        return sum(1 for _ in iter_chunks_with_overlap(iter_page_texts(pdf_bytes)))
+
+    _, results["streaming_chunking"] = measure(stream_chunks, repeat)
+
+    if hasattr(embedder, "chunker"):
+        # Real models: embed token-sized chunks, as the app does
+        chunker = embedder.chunker(128, 24)
+        chunks, results["token_chunking"] = measure(lambda: chunker.chunk(full_text), repeat)
+
+    def image_pages():
+        image_only_pages = detect_image_only_pages(document)
+        return [
+            is_section_image_only(start, end, [], image_only_pages, document)
+            for _, start, end in locate_sections(full_text, sections)
+        ]
+
+    _, results["image_page_detection"] = measure(image_pages, repeat)
+
+    embeddings, results["embedding"] = measure(lambda: embedder.embed_texts(chunks), repeat)
+
+    retriever = RAGPipeline(embedder, threshold=0.30, top_k=5)
+    retriever.index_document(chunks, embeddings=embeddings)
+
+    def retrieve():
+        return [retriever.get_relevant_chunks(query) for query in QUERIES]
+
+    retrieved, results["retrieval"] = measure(retrieve, repeat)
+
+    def retrieve_lexical():
+        return [retriever.get_relevant_chunks(query, mode="lexical") for query in QUERIES]
+
+    _, results["lexical_retrieval"] = measure(retrieve_lexical, repeat)
+
+    _, results["summarization"] = measure(lambda: summarize_document(full_text, summarizer, document), repeat)
+
+    def fast_summarize():
+        chunk_embeddings = ChunkEmbeddings.locate(full_text, *retriever.document_chunks("default"))
+        return summarize_document(full_text, summarizer, document, mode="fast", chunk_embeddings=chunk_embeddings)
+
+    _, results["fast_summarization"] = measure(fast_summarize, repeat)
+
+    top_chunks = retriever.get_chunk_texts(retrieved[0][0])
+    history = [(QUERIES[1], "The paper proposes a new approach.")]
+    _, results["generation"] = measure(lambda: generate(QUERIES[0], top_chunks, history), repeat)
+
+    return {
+        "pages": len(document),
+        "words": len(full_text.split()),
+        "chunks": len(chunks),
+        "sections": len(sections),
+        "stages": results,
+    }
+
+
+def scaling_exponents(runs):
+    """Log-log slope of time against page count between the smallest and largest document."""
+    if len(runs) < 2:
+        return {}
+    small, large = runs[0], runs[-1]
+    exponents = {}
+    for stage, metrics in large["stages"].items():
+        if stage not in small["stages"]:
+            continue
+        t_small = small["stages"][stage]["seconds"]
+        t_large = metrics["seconds"]
+        if t_small > 0 and t_large > 0:
+            exponents[stage] = math.log(t_large / t_small) / math.log(large["pages"] / small["pages"])
+    return exponents
+
+
+def compare(report, baseline, tolerance, min_delta):
+    """
+    Print time ratios against a baseline report and return the regressed (pages, stage) pairs.
+    Slowdowns smaller than `min_delta` seconds are treated as timer noise.
+    """
+    regressions = []
+    baseline_runs = {run["pages"]: run for run in baseline["runs"]}
+    print(f"\nComparison against baseline (regression if > {1 + tolerance:.2f}x):")
+    for run in report["runs"]:
+        base = baseline_runs.get(run["pages"])
+        if base is None:
+            continue
+        for stage, metrics in run["stages"].items():
+            base_seconds = base["stages"].get(stage, {}).get("seconds")
+            if not base_seconds:
+                continue
+            ratio = metrics["seconds"] / base_seconds
+            flag = ""
+            if ratio > 1 + tolerance and metrics["seconds"] - base_seconds > min_delta:
+                flag = "  <-- REGRESSION"
+                regressions.append((run["pages"], stage))
+            print(f"  {run['pages']:>5} pages  {stage:<24} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def print_table(report):
+    # Stages that only run on some documents (parallel_extraction) show as "-" for the others
+    stages = list(dict.fromkeys(stage for run in report["runs"] for stage in run["stages"]))
+    header = f"{'stage':<24}" + "".join(f"{run['pages']:>10}p" for run in report["runs"])
+
+    def row(stage, key, fmt):
+        cells = (run["stages"].get(stage, {}).get(key) for run in report["runs"])
+        return f"{stage:<24}" + "".join(f"{cell:>11{fmt}}" if cell is not None else f"{'-':>11}" for cell in cells)
+
+    print("\nMedian seconds per stage:")
+    print(header)
+    for stage in stages:
+        print(row(stage, "seconds", ".4f"))
+    print("\nPeak Python heap, tracemalloc (MB; native allocations not included):")
+    print(header)
+    for stage in stages:
+        print(row(stage, "python_heap_peak_mb", ".2f"))
+    print("\nHeading detection throughput:")
+    for run in report["runs"]:
+        print(f"  {run['pages']:>5} pages  {run['stages']['heading_detection']['pages_per_second']:,.0f} pages/s")
+    if report["scaling_exponents"]:
+        print("\nScaling exponent (time ~ pages^k):")
+        for stage, exponent in report["scaling_exponents"].items():
+            print(f"  {stage:<24} k = {exponent:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SmartScholar pipeline stages.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here (use it later as a baseline)")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging a regression")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="Ignore slowdowns below this many seconds")
+    args = parser.parse_args()
+
+    embedder, summarizer, generate = load_models(args.models)
+
+    runs = []
+    for num_pages in sorted(args.pages):
+        print(f"Benchmarking {num_pages}-page document...")
+        pdf_bytes = make_synthetic_pdf(num_pages, seed=args.seed)
+        runs.append(benchmark_document(pdf_bytes, embedder, summarizer, generate, args.repeat))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "models": args.models,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "runs": runs,
+        "scaling_exponents": scaling_exponents(runs),
+    }
+    print_table(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance, args.min_delta):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
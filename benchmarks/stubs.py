@@ -0,0 +1,130 @@
+import hashlib
+
+import numpy as np
+
+
+class StubEmbedder:
+    """Offline stand-in for Embedder: hashed bag-of-words vectors, L2-normalized."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.model_name = f"stub-embedder-{dim}"
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16) % self.dim
+                vectors[row, bucket] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_texts([query])[0]
+
+    def get_dim(self) -> int:
+        return self.dim
+
+
+class StubSummarizer:
+    """Offline stand-in for the summarization pipeline: keeps the first words of each input."""
+
+    def __init__(self, words=40):
+        self.words = words
+
+    def __call__(self, texts, min_length=None, max_length=None, **kwargs):
+        texts = [texts] if isinstance(texts, str) else texts
+        return [{"summary_text": " ".join(text.split()[:self.words])} for text in texts]
+
+
+class StubTokenizer:
+    """Whitespace tokenizer with the small part of the HF tokenizer API PromptBuilder uses."""
+
+    eos_token_id = 1
+
+    def __call__(self, text, add_special_tokens=True, **kwargs):
+        ids = [2 + (int(hashlib.md5(w.encode("utf-8")).hexdigest()[:6], 16) % 32000) for w in text.split()]
+        if add_special_tokens:
+            ids.append(self.eos_token_id)
+        return {"input_ids": ids}
+
+
+def stub_generate(input_ids, max_new_tokens=64):
+    """Stand-in for seq2seq decoding cost: one pass over the prompt per output token."""
+    prompt = np.asarray(input_ids, dtype=np.int64)
+    output = []
+    for step in range(max_new_tokens):
+        output.append(int((prompt * (step + 1)).sum() % 32000))
+    return output
+
+
+def word_tokenizer(vocabulary_size, model_max_length=512):
+    """Fast word-level tokenizer over the words w3 ... w{vocabulary_size - 1}."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"<pad>": 0, "</s>": 1, "<unk>": 2}
+    vocab.update((f"w{i}", i) for i in range(3, vocabulary_size))
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.post_processor = processors.TemplateProcessing(single="$A </s>", special_tokens=[("</s>", 1)])
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend, pad_token="<pad>", eos_token="</s>", unk_token="<unk>",
+        model_max_length=model_max_length,
+    )
+
+
+# t5-small's config.task_specific_params["summarization"], as the app's summarizer sees them
+T5_SMALL_SUMMARIZATION_PARAMS = {
+    "early_stopping": True,
+    "length_penalty": 2.0,
+    "max_length": 200,
+    "min_length": 30,
+    "no_repeat_ngram_size": 3,
+    "num_beams": 4,
+    "prefix": "summarize: ",
+}
+
+
+def tiny_t5_pipeline(vocabulary_size=256, seed=0):
+    """
+    Offline stand-in for the t5-small summarization pipeline: a randomly initialized
+    two-layer T5 with t5-small's generation settings and a word-level tokenizer.
+    Exposes the .model and .tokenizer that ServiceSummarizer wraps.
+    """
+    from types import SimpleNamespace
+
+    import torch
+    from transformers import T5Config, T5ForConditionalGeneration
+
+    tokenizer = word_tokenizer(vocabulary_size)
+    torch.manual_seed(seed)
+    config = T5Config(
+        vocab_size=vocabulary_size, d_model=32, d_kv=8, d_ff=64, num_layers=2, num_heads=4,
+        pad_token_id=0, eos_token_id=1, decoder_start_token_id=0,
+        task_specific_params={"summarization": dict(T5_SMALL_SUMMARIZATION_PARAMS)},
+    )
+    model = T5ForConditionalGeneration(config).eval()
+    return SimpleNamespace(model=model, tokenizer=tokenizer)
+
+
+def save_tiny_sentence_encoder(path, vocabulary_size=256, seed=0):
+    """
+    Save a randomly initialized two-layer BERT sentence encoder (mean pooling, 32 dims)
+    under `path`, loadable by name like a hub model: Embedder(model_name=path).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Pooling, Transformer
+    from transformers import BertConfig, BertModel
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=vocabulary_size, hidden_size=32, num_hidden_layers=2, num_attention_heads=4,
+        intermediate_size=64, max_position_embeddings=128, pad_token_id=0,
+    )
+    BertModel(config).save_pretrained(path)
+    word_tokenizer(vocabulary_size, model_max_length=128).save_pretrained(path)
+    transformer = Transformer(path, max_seq_length=128)
+    SentenceTransformer(modules=[transformer, Pooling(32, "mean")]).save(path)
+    return path
@@ -0,0 +1,70 @@
+import random
+
+import fitz  # PyMuPDF
+
+SECTION_HEADINGS = [
+    "Abstract",
+    "Introduction",
+    "Related Work",
+    "Methodology",
+    "Experimental Setup",
+    "Results",
+    "Discussion",
+    "Limitations",
+    "Conclusion",
+    "References",
+]
+
+VOCABULARY = (
+    "model data results method analysis training evaluation baseline dataset performance accuracy "
+    "network layer feature representation sample distribution error loss optimization gradient "
+    "parameter experiment benchmark proposed approach significant improvement compared previous "
+    "work study research paper section table figure equation value measure metric observe show"
+).split()
+
+
+def make_paragraph(rng, sentences=6):
+    words = []
+    for _ in range(sentences):
+        sentence = rng.choices(VOCABULARY, k=rng.randint(8, 20))
+        sentence[0] = sentence[0].capitalize()
+        words.append(" ".join(sentence) + ".")
+    return " ".join(words)
+
+
+def make_synthetic_pdf(num_pages, pages_per_section=4, image_page_every=10, seed=0, bold_headings=True) -> bytes:
+    """
+    Build a research-paper-like PDF: bold numbered section headings, dense body text,
+    and an image-only page every `image_page_every` pages. With bold_headings=False the
+    headings are unnumbered regular-weight text, told apart from the body only by size.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    section = 0
+
+    for page_num in range(num_pages):
+        page = doc.new_page(width=595, height=842)
+
+        if image_page_every and page_num % image_page_every == image_page_every - 1:
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 128, 128), 0)
+            pixmap.clear_with(rng.randint(0, 255))
+            page.insert_image(fitz.Rect(72, 72, 523, 523), pixmap=pixmap)
+            page.insert_text((72, 560), f"Figure {page_num + 1}", fontname="helv", fontsize=9)
+            continue
+
+        top = 72
+        if page_num % pages_per_section == 0:
+            heading = SECTION_HEADINGS[section % len(SECTION_HEADINGS)]
+            if bold_headings:
+                page.insert_text((72, top), f"{section + 1}. {heading}", fontname="hebo", fontsize=14)
+            else:
+                page.insert_text((72, top), heading, fontname="helv", fontsize=14)
+            section += 1
+            top += 24
+
+        body = "\n\n".join(make_paragraph(rng) for _ in range(4))
+        page.insert_textbox(fitz.Rect(72, top, 523, 790), body, fontname="helv", fontsize=10)
+
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
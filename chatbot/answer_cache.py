@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, scoped per document and model.
+
+    A question is answered from the cache when an earlier question on the same
+    document retrieved the same chunk set and its embedding is within
+    `similarity_threshold` (cosine) of the new one. Entries expire after
+    `ttl_seconds`, each document keeps at most `max_entries_per_document`, and at
+    most `max_documents` (document, model) namespaces are kept; both are evicted
+    least recently used first.
+    """
+
+    def __init__(self, similarity_threshold=0.95, max_entries_per_document=256, ttl_seconds=24 * 3600,
+                 max_documents=64):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_document = max_entries_per_document
+        self.ttl_seconds = ttl_seconds
+        self.max_documents = max_documents
+        self.namespaces = OrderedDict()  # (doc_id, model_name) -> OrderedDict[question -> entry], least recently used first
+        self.model_name = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, entries, now):
+        for question in [q for q, entry in entries.items() if now - entry["created"] > self.ttl_seconds]:
+            del entries[question]
+
+    def get(self, doc_id, model_name, query_embedding, chunk_ids):
+        """Return a cached answer for a near-duplicate question, or None."""
+        chunk_set = frozenset(int(i) for i in chunk_ids)
+        with self._lock:
+            entries = self.namespaces.get((doc_id, model_name))
+            if entries is None:
+                # Lookups never create a namespace: only answers that were put take up room
+                self.misses += 1
+                return None
+            self.namespaces.move_to_end((doc_id, model_name))
+            self._expire(entries, time.time())
+
+            candidates = [(q, entry) for q, entry in entries.items() if entry["chunk_ids"] == chunk_set]
+            if candidates:
+                matrix = np.stack([entry["embedding"] for _, entry in candidates])
+                similarities = matrix @ np.asarray(query_embedding, dtype=np.float32)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    question, entry = candidates[best]
+                    entries.move_to_end(question)
+                    self.hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, doc_id, model_name, query, query_embedding, chunk_ids, answer):
+        with self._lock:
+            entries = self.namespaces.setdefault((doc_id, model_name), OrderedDict())
+            self.namespaces.move_to_end((doc_id, model_name))
+            while len(self.namespaces) > self.max_documents:
+                self.namespaces.popitem(last=False)
+            entries[query] = {
+                "embedding": np.asarray(query_embedding, dtype=np.float32),
+                "chunk_ids": frozenset(int(i) for i in chunk_ids),
+                "answer": answer,
+                "created": time.time(),
+            }
+            entries.move_to_end(query)
+            while len(entries) > self.max_entries_per_document:
+                entries.popitem(last=False)
+
+    def invalidate(self, doc_id=None, model_name=None):
+        """Drop cached answers for a document and/or model; with no arguments, drop everything."""
+        with self._lock:
+            for key in list(self.namespaces):
+                if (doc_id is None or key[0] == doc_id) and (model_name is None or key[1] == model_name):
+                    del self.namespaces[key]
+
+    def switch_model(self, model_name):
+        """Make `model_name` the model answers are generated with, dropping the answers of the previous one."""
+        with self._lock:
+            previous, self.model_name = self.model_name, model_name
+            if previous in (None, model_name):
+                return
+            for key in [key for key in self.namespaces if key[1] == previous]:
+                del self.namespaces[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "documents": len(self.namespaces),
+        }
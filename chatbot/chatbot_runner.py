@@ -1,43 +1,57 @@
-from transformers import pipeline, set_seed, AutoTokenizer
-from chatbot.rag_pipeline import RAGPipeline
+from chatbot.prompt_builder import PromptBuilder
+from inference.backends import load_text2text_pipeline, model_key, resolve_backend
+from inference.service import GenerationService
+
 
 class ChatbotRunner:
-    def __init__(self, embedder_model_name="sentence-transformers/all-MiniLM-L6-v2", llm_model_name="google/flan-t5-small"):
-        self.rag = RAGPipeline(embedder_model_name=embedder_model_name)
-        self.generator = pipeline("text2text-generation", model=llm_model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(llm_model_name)
+    """
+    Answers questions from context chunks the caller retrieved (see RAGPipeline); it
+    holds only the chat model, not an index or an embedder.
+    """
+
+    def __init__(self, llm_model_name="google/flan-t5-small", backend=None):
+        from transformers import set_seed  # deferred: heavy import
+
+        self.llm_model_name = llm_model_name
+        self.backend = resolve_backend("chat", backend)
+        self.model_key = model_key(llm_model_name, self.backend)
+        self.generator = load_text2text_pipeline("text2text-generation", llm_model_name, self.backend)
+        self.tokenizer = self.generator.tokenizer
+        self.prompt_builder = PromptBuilder(self.tokenizer, max_tokens=512)
+        # Every chat request goes through one micro-batching service, shared by all sessions
+        self.service = GenerationService(self.generator.model, self.tokenizer, name="chat")
         set_seed(42)
 
-    def index_document(self, text_chunks: list[str]):
-        self.rag.index_document(text_chunks)
-
-    def generate_response(self, query: str, max_length=256, top_k=5, context_override=None, chat_history=None) -> str:
-        if context_override is None:
-            context_chunks = self.rag.retrieve_context(query, top_k=top_k)
+    def build_prompt(self, query: str, context_chunks, chat_history=None) -> list[int]:
+        """
+        Returns the prompt as token IDs, fitted to the model's 512-token input budget.
+        `context_chunks` may be a newline-joined string or a list of chunks, most relevant first.
+        """
+        if isinstance(context_chunks, str):
+            context_chunks = context_chunks.split("\n")
         else:
-            context_chunks = context_override.split("\n")
-
-        context_text = "\n".join(context_chunks)
-        chat_history = chat_history or []
-        history_text = "\n".join([f"Q: {q}\nA: {a}" for q, a in chat_history])
-
-        prompt = (
-            f"Answer the question based only on the following document context. "
-            f"If the answer is not contained in the context, say \"I don't know.\"\n\n"
-            f"Context:\n{context_text}\n\n"
-            f"Chat history:\n{history_text}\n\n"
-            f"Q: {query}\nA:"
-        )
+            context_chunks = list(context_chunks)
 
-        input_ids = self.tokenizer.encode(prompt, truncation=True, max_length=512)
-        prompt = self.tokenizer.decode(input_ids, skip_special_tokens=True)
+        return self.prompt_builder.build(query, context_chunks, chat_history)
 
-        outputs = self.generator(
-            prompt,
+    def _generation_kwargs(self, max_length: int) -> dict:
+        return dict(
             max_length=max_length,
             num_return_sequences=1,
-            do_sample=False,  
-            repetition_penalty=1.1
+            do_sample=False,
+            repetition_penalty=1.1,
         )
 
-        return outputs[0]['generated_text'].strip()
+    def generate_response(self, query: str, context_chunks, max_length=256, chat_history=None) -> str:
+        input_ids = self.build_prompt(query, context_chunks, chat_history=chat_history)
+        return self.service.generate(input_ids, **self._generation_kwargs(max_length))
+
+    def stream_response(self, query: str, context_chunks, max_length=256, chat_history=None, cancel_event=None):
+        """
+        Streaming variant of generate_response: yields text pieces as the model decodes them.
+
+        The request is batched with other concurrent questions. Setting `cancel_event`
+        (or closing the generator) stops decoding this answer after the current step.
+        """
+        input_ids = self.build_prompt(query, context_chunks, chat_history=chat_history)
+        yield from self.service.stream(input_ids, cancel_event=cancel_event, **self._generation_kwargs(max_length))
@@ -1,10 +1,21 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
+from storage.embedding_cache import EmbeddingCache, embedding_key
+from inference.backends import load_sentence_encoder, model_key, resolve_backend
+from instrumentation.metrics import metrics, record_tokens, span
+from parser.chunker import TokenChunker, token_budget
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+ENCODE_BATCH_SIZE = 32
 
 class Embedder:
-    def __init__(self, model_name="sentence-transformers/all-mpnet-base-v2"):
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, cache=None, backend=None):
+        self.model_name = model_name
         self.device = "cpu"
-        self.model = SentenceTransformer(model_name, device=self.device)
+        self.backend = resolve_backend("embedder", backend)
+        # Cache keys include the backend: int8 and ONNX vectors differ slightly from fp32 ones
+        self.model_key = model_key(model_name, self.backend)
+        self.model = load_sentence_encoder(model_name, self.backend, device=self.device)
+        self.cache = cache if cache is not None else EmbeddingCache()
 
     def clean_input(self, texts):
         cleaned = []
@@ -16,11 +27,68 @@ class Embedder:
         return cleaned if cleaned else ["placeholder"]
 
     def embed_texts(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed texts, encoding only those not already cached. Duplicates within the batch are encoded once.
+        """
         texts = self.clean_input(texts)
-        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, device=self.device)
+        keys = [embedding_key(self.model_key, t) for t in texts]
+        unique_keys = list(dict.fromkeys(keys))
+        vectors = self.cache.get_many(unique_keys)
+
+        missing_keys = [k for k in unique_keys if k not in vectors]
+        metrics.increment("embedding_cache_hits_total", len(unique_keys) - len(missing_keys), model=self.model_key)
+        metrics.increment("embedding_cache_misses_total", len(missing_keys), model=self.model_key)
+        if missing_keys:
+            text_by_key = dict(zip(keys, texts))
+            missing_texts = [text_by_key[k] for k in missing_keys]
+            with span("embedding", model=self.model_key, texts=len(missing_keys)) as attrs:
+                encoded, tokens_in = self._encode(missing_texts)
+                attrs["tokens_in"] = tokens_in
+            record_tokens(self.model_key, tokens_in)
+            self.cache.put_many(missing_keys, encoded)
+            vectors.update(zip(missing_keys, encoded))
+
+        return np.stack([vectors[k] for k in keys]).astype(np.float32, copy=False)
+
+    def _encode(self, texts):
+        """
+        Normalized embeddings of texts and the number of tokens the encoder attended to.
+
+        Does what SentenceTransformer.encode() does (length-sorted batches, truncation at
+        max_tokens), but keeps the tokenized batches so the token count is read from their
+        attention masks instead of tokenizing every text a second time.
+        """
+        import torch
+        from sentence_transformers.util import batch_to_device
+
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.get_dim()), dtype=np.float32)
+        tokens = 0
+        for start in range(0, len(texts), ENCODE_BATCH_SIZE):
+            rows = order[start:start + ENCODE_BATCH_SIZE]
+            features = self.model.tokenize([texts[i] for i in rows])
+            tokens += int(features["attention_mask"].sum())
+            with torch.no_grad():
+                batch = self.model(batch_to_device(features, self.model.device))["sentence_embedding"]
+            embeddings[rows] = torch.nn.functional.normalize(batch.float(), p=2, dim=1).cpu().numpy()
+        return embeddings, tokens
 
     def embed_query(self, query: str) -> np.ndarray:
         return self.embed_texts([query])[0]
 
     def get_dim(self) -> int:
         return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_tokens(self) -> int:
+        """Input length the encoder truncates at (384 tokens for mpnet)."""
+        return self.model.max_seq_length
+
+    def chunker(self, max_tokens, overlap_tokens=0) -> TokenChunker:
+        """TokenChunker for this encoder's tokenizer; `max_tokens` is capped so no chunk is truncated."""
+        max_tokens = min(max_tokens, token_budget(self.tokenizer, self.max_tokens))
+        return TokenChunker(self.tokenizer, max_tokens, min(overlap_tokens, max_tokens - 1))
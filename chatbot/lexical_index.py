@@ -0,0 +1,151 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+# Keeps technical terms whole: "resnet-50", "cifar-10", "eq.3", "f1_score"
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how in is it its of on or that the this to was were "
+    "what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _DocumentPostings:
+    """
+    BM25 postings for the chunks of one document.
+
+    Terms are collected in dicts while chunks are added and compacted into numpy
+    arrays (chunk positions and term frequencies per term) on the first search.
+    """
+
+    def __init__(self):
+        self.chunk_ids = []
+        self.lengths = []
+        self.pending = {}  # term -> ([positions], [term frequencies])
+        self.postings = {}  # term -> (positions array, tf array)
+        self.dirty = False
+
+    def add(self, chunk_ids, texts):
+        for chunk_id, text in zip(chunk_ids, texts):
+            position = len(self.chunk_ids)
+            terms = Counter(tokenize(text))
+            self.chunk_ids.append(int(chunk_id))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                positions, tfs = self.pending.setdefault(term, ([], []))
+                positions.append(position)
+                tfs.append(tf)
+        self.dirty = True
+
+    def compact(self):
+        if not self.dirty:
+            return
+        for term, (positions, tfs) in self.pending.items():
+            if term in self.postings:
+                old_positions, old_tfs = self.postings[term]
+                positions = np.concatenate([old_positions, positions])
+                tfs = np.concatenate([old_tfs, tfs])
+            self.postings[term] = (np.asarray(positions, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+        self.pending = {}
+        self.dirty = False
+        self.chunk_ids_array = np.asarray(self.chunk_ids, dtype=np.int64)
+        self.lengths_array = np.asarray(self.lengths, dtype=np.float32)
+        self.avg_length = max(float(self.lengths_array.mean()), 1.0) if self.lengths else 1.0
+
+    def memory_bytes(self) -> int:
+        # Arrays plus a rough per-term cost of the dict entry and term string
+        arrays = sum(positions.nbytes + tfs.nbytes for positions, tfs in self.postings.values())
+        pending = sum(16 * len(positions) for positions, _ in self.pending.values())
+        terms = 120 * (len(self.postings) + len(self.pending))
+        return arrays + pending + terms + 12 * len(self.chunk_ids)
+
+
+class LexicalIndex:
+    """
+    Per-document BM25 inverted index over chunk texts, keyed by the vector store's chunk ids.
+
+    Scores are normalized to [0, 1] by the score of a query whose every term is as rare
+    as a term can be in the document (found in a single chunk) and matched with saturated
+    term frequency. A term found in every chunk therefore adds almost nothing, so queries
+    sharing only ubiquitous words with the document cannot pass a fixed threshold, while a
+    rare term scores as it would against the query's own best case. Scores can be compared
+    with a fixed threshold and fused with cosine similarities.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = {}  # doc_id -> _DocumentPostings
+
+    def add(self, chunk_ids, texts, doc_id="default"):
+        self.documents.setdefault(doc_id, _DocumentPostings()).add(chunk_ids, texts)
+
+    def remove_document(self, doc_id):
+        self.documents.pop(doc_id, None)
+
+    def reset(self):
+        self.documents = {}
+
+    def compact(self):
+        """Compact all postings now rather than on first search, e.g. before sharing the index across threads."""
+        for postings in self.documents.values():
+            postings.compact()
+
+    def memory_bytes(self) -> int:
+        return sum(postings.memory_bytes() for postings in self.documents.values())
+
+    def _score_document(self, postings, terms):
+        postings.compact()
+        num_chunks = len(postings.chunk_ids)
+        scores = np.zeros(num_chunks, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * postings.lengths_array / postings.avg_length)
+        # IDF of a term in a single chunk: the ceiling each query term is normalized against
+        rare_idf = math.log(1 + (num_chunks - 0.5) / 1.5)
+        max_score = 0.0
+        for term in terms:
+            entry = postings.postings.get(term)
+            df = len(entry[0]) if entry is not None else 0
+            idf = math.log(1 + (num_chunks - df + 0.5) / (df + 0.5))
+            # Terms missing from the document keep their (higher) idf, so partial matches score lower
+            max_score += max(idf, rare_idf) * (self.k1 + 1)
+            if entry is None:
+                continue
+            positions, tfs = entry
+            scores[positions] += idf * tfs * (self.k1 + 1) / (tfs + norms[positions])
+        if max_score > 0:
+            scores /= max_score
+        return scores
+
+    def search(self, query: str, top_k=5, threshold=None, doc_ids=None):
+        """
+        Returns (chunk_ids, scores) of the best-matching chunks, best first. Chunks without
+        any query term are never returned; `threshold` applies to the normalized score.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        all_ids, all_scores = [], []
+        for doc_id in (self.documents if doc_ids is None else doc_ids):
+            postings = self.documents.get(doc_id)
+            if postings is None or not postings.chunk_ids:
+                continue
+            scores = self._score_document(postings, terms)
+            matched = np.flatnonzero(scores > 0)
+            all_ids.append(postings.chunk_ids_array[matched])
+            all_scores.append(scores[matched])
+        if not all_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        ids, scores = np.concatenate(all_ids), np.concatenate(all_scores)
+        if threshold is not None:
+            keep = scores >= threshold
+            ids, scores = ids[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return ids[order], scores[order]
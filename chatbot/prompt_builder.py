@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+from instrumentation.metrics import span
+
+INSTRUCTION = (
+    "Answer the question based only on the following document context. "
+    "If the answer is not contained in the context, say \"I don't know.\"\n\n"
+)
+
+
+class PromptBuilder:
+    """
+    Assembles generation prompts directly as token IDs within a fixed token budget.
+
+    The question is reserved first, then retrieved chunks are added in score order,
+    then as many of the most recent chat turns as still fit. Each piece is tokenized
+    once; chat turns are memoized so long conversations are not re-tokenized every turn.
+    """
+
+    def __init__(self, tokenizer, max_tokens=512, max_history_turns=6, max_answer_tokens=64, cache_size=1024):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.max_history_turns = max_history_turns
+        self.max_answer_tokens = max_answer_tokens
+        self.cache_size = cache_size
+        self._turn_cache = OrderedDict()
+        # The builder is shared by every session's generation thread
+        self._turn_cache_lock = threading.Lock()
+
+        self.instruction_ids = self.encode(INSTRUCTION)
+        self.context_label_ids = self.encode("Context:\n")
+        self.history_label_ids = self.encode("\n\nChat history:\n")
+        self.newline_ids = self.encode("\n")
+        self.eos_ids = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def encode_turn(self, question: str, answer: str) -> list[int]:
+        """Tokenize one chat turn; older answers are cut to max_answer_tokens."""
+        key = (question, answer)
+        with self._turn_cache_lock:
+            ids = self._turn_cache.get(key)
+            if ids is not None:
+                self._turn_cache.move_to_end(key)
+                return ids
+
+        # Tokenized outside the lock; two threads encoding the same turn just store the same ids
+        answer_ids = self.encode(f" {answer}")[:self.max_answer_tokens]
+        ids = self.encode(f"Q: {question}\nA:") + answer_ids + self.newline_ids
+        with self._turn_cache_lock:
+            self._turn_cache[key] = ids
+            if len(self._turn_cache) > self.cache_size:
+                self._turn_cache.popitem(last=False)
+        return ids
+
+    def build(self, query: str, context_chunks: list[str], chat_history=None) -> list[int]:
+        """
+        Return the prompt token IDs for a query.
+
+        Args:
+            query (str): The user question; always kept in full.
+            context_chunks (List[str]): Retrieved chunks, most relevant first.
+            chat_history (List[Tuple[str, str]]): Earlier (question, answer) turns, oldest first.
+        """
+        with span("prompt_construction") as attrs:
+            prompt_ids = self._build(query, context_chunks, chat_history)
+            attrs["prompt_tokens"] = len(prompt_ids)
+        return prompt_ids
+
+    def _build(self, query, context_chunks, chat_history):
+        question_ids = self.encode(f"\n\nQ: {query}\nA:")
+        budget = (
+            self.max_tokens
+            - len(self.instruction_ids)
+            - len(self.context_label_ids)
+            - len(question_ids)
+            - len(self.eos_ids)
+        )
+
+        context_ids = []
+        for chunk in context_chunks:
+            chunk_ids = self.encode(chunk) + self.newline_ids
+            if len(chunk_ids) > budget:
+                # The most relevant chunk is kept even when it has to be truncated
+                if not context_ids:
+                    context_ids = chunk_ids[:max(budget, 0)]
+                    budget -= len(context_ids)
+                break
+            context_ids += chunk_ids
+            budget -= len(chunk_ids)
+
+        history_ids = []
+        recent_turns = list(chat_history or [])[-self.max_history_turns:]
+        if recent_turns and budget > len(self.history_label_ids):
+            budget -= len(self.history_label_ids)
+            for question, answer in reversed(recent_turns):
+                turn_ids = self.encode_turn(question, answer)
+                if len(turn_ids) > budget:
+                    break
+                history_ids = turn_ids + history_ids
+                budget -= len(turn_ids)
+
+        prompt_ids = self.instruction_ids + self.context_label_ids + context_ids
+        if history_ids:
+            prompt_ids += self.history_label_ids + history_ids
+        prompt_ids += question_ids + self.eos_ids
+
+        # A question longer than the whole budget is the only way to overflow; keep its end
+        return prompt_ids[-self.max_tokens:]
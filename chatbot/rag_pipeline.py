@@ -1,21 +1,173 @@
-from chatbot.embedder import Embedder
+from itertools import islice
+import numpy as np
+from chatbot.embedder import Embedder, DEFAULT_EMBEDDING_MODEL
+from chatbot.lexical_index import LexicalIndex
 from chatbot.vectorstore import VectorStore
+from instrumentation.metrics import span
+
+STREAM_BATCH_SIZE = 64
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+# Hybrid score = cosine similarity + LEXICAL_WEIGHT * normalized BM25 score
+LEXICAL_WEIGHT = 0.3
+MIN_HYBRID_CANDIDATES = 20
+# Queries of at most this many words and no question mark are term lookups (see keyword_search)
+KEYWORD_MAX_WORDS = 3
 
 class RAGPipeline:
-    def __init__(self, embedder_model_name="sentence-transformers/all-mpnet-base-v2"):
-        self.embedder = Embedder(model_name=embedder_model_name)
-        self.vector_store = VectorStore(embedding_dim=self.embedder.get_dim())
+    """
+    Retrieval service: a single embedding model and a single index, shared by every indexed document.
+
+    A BM25 inverted index over the same chunks sits next to the dense index. It answers
+    term lookups without running the encoder and adds lexical evidence in hybrid ranking.
+    """
+
+    def __init__(self, embedder=None, embedder_model_name=DEFAULT_EMBEDDING_MODEL, threshold=None, top_k=5,
+                 vector_store=None, mode="hybrid", lexical_weight=LEXICAL_WEIGHT, **index_options):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {', '.join(RETRIEVAL_MODES)}.")
+        self.embedder = embedder or Embedder(model_name=embedder_model_name)
+        self.vector_store = vector_store or VectorStore(embedding_dim=self.embedder.get_dim(), **index_options)
+        self.threshold = threshold
+        self.top_k = top_k
+        self.mode = mode
+        self.lexical_weight = lexical_weight
+
+        # Rebuilt from the chunk texts rather than stored: tokenizing is cheap next to embedding
+        self.lexical_index = LexicalIndex()
+        for doc_id, chunk_ids in self.vector_store.documents.items():
+            self.lexical_index.add(chunk_ids, [self.vector_store.text_chunks[i] for i in chunk_ids], doc_id=doc_id)
+
+    def _add(self, embeddings, chunks, doc_id):
+        chunk_ids = self.vector_store.add_embeddings(embeddings, chunks, doc_id=doc_id)
+        self.lexical_index.add(chunk_ids, chunks, doc_id=doc_id)
+
+    def index_document(self, chunks: list[str], embeddings=None, doc_id: str = "default"):
+        """
+        Embeds and indexes the text chunks of one document, replacing any earlier version of it.
+        Precomputed embeddings can be passed to skip encoding.
+        """
+        if embeddings is None:
+            embeddings = self.embedder.embed_texts(chunks)
+        self.remove_document(doc_id)
+        self._add(embeddings, chunks, doc_id)
 
-    def index_document(self, chunks: list[str]):
+    def index_stream(self, chunks, doc_id: str = "default", batch_size: int = STREAM_BATCH_SIZE) -> int:
         """
-        Embeds and indexes the text chunks.
+        Embeds and indexes chunks from an iterable (e.g. TokenChunker.iter_chunks over pages)
+        `batch_size` at a time, so only one batch of chunks and embeddings is held besides
+        the index itself. Replaces any earlier version of the document; returns the chunk count.
         """
-        embeddings = self.embedder.embed_texts(chunks)
-        self.vector_store.add_embeddings(embeddings, chunks)
+        self.remove_document(doc_id)
+        chunks = iter(chunks)
+        indexed = 0
+        while True:
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                return indexed
+            self._add(self.embedder.embed_texts(batch), batch, doc_id)
+            indexed += len(batch)
+
+    def remove_document(self, doc_id: str):
+        self.vector_store.remove_document(doc_id)
+        self.lexical_index.remove_document(doc_id)
 
-    def retrieve_context(self, query: str, top_k: int = 5) -> list[str]:
+    @staticmethod
+    def is_keyword_query(query: str) -> bool:
+        """Short term lookups such as a dataset name, an equation label or an author."""
+        return "?" not in query and 0 < len(query.split()) <= KEYWORD_MAX_WORDS
+
+    def keyword_search(self, query: str, threshold=None, top_k=None, doc_ids=None):
+        """
+        Lexical fast path: for a keyword-style query with lexical matches above the threshold,
+        returns their (chunk_ids, scores) without running the encoder. Returns None otherwise,
+        in which case the caller should fall back to get_relevant_chunks.
+        """
+        if not self.is_keyword_query(query):
+            return None
+        chunk_ids, scores = self.get_relevant_chunks(query, threshold, top_k, doc_ids, mode="lexical")
+        return (chunk_ids, scores) if len(chunk_ids) else None
+
+    def _hybrid_search(self, query, query_embedding, top_k, threshold, doc_ids):
+        candidates = max(top_k * 4, MIN_HYBRID_CANDIDATES)
+        dense_ids, dense_scores = self.vector_store.search(query_embedding, top_k=candidates, doc_ids=doc_ids)
+        lexical_ids, lexical_scores = self.lexical_index.search(query, top_k=candidates, doc_ids=doc_ids)
+
+        fused = dict(zip(dense_ids.tolist(), dense_scores.tolist()))
+        # Lexical candidates the dense search did not return still need their cosine similarity
+        missing = [i for i in lexical_ids.tolist() if i not in fused]
+        if missing:
+            missing_ids, missing_scores = self.vector_store.search(
+                query_embedding, top_k=len(missing), chunk_ids=missing
+            )
+            fused.update(zip(missing_ids.tolist(), missing_scores.tolist()))
+            fused.update((i, 0.0) for i in missing if i not in fused)
+        for chunk_id, score in zip(lexical_ids.tolist(), lexical_scores.tolist()):
+            fused[chunk_id] += self.lexical_weight * score
+
+        ranked = sorted(fused.items(), key=lambda item: -item[1])
+        if threshold is not None:
+            ranked = [(i, s) for i, s in ranked if s >= threshold]
+        ranked = ranked[:top_k]
+        return (
+            np.array([i for i, _ in ranked], dtype=np.int64),
+            np.array([s for _, s in ranked], dtype=np.float32),
+        )
+
+    def get_relevant_chunks(self, query: str, threshold=None, top_k=None, doc_ids=None, query_embedding=None,
+                            mode=None):
+        """
+        Returns (chunk_ids, scores) of the chunks relevant to the query, best first.
+        Defaults to the pipeline's threshold, top_k and mode; `doc_ids` scopes the search to those documents.
+        An already computed `query_embedding` can be passed to skip encoding the query.
+
+        Modes: "dense" ranks by cosine similarity, "lexical" by normalized BM25 score (no
+        encoder), and "hybrid" by cosine similarity plus lexical_weight times the BM25
+        score. The threshold applies to whichever score the mode ranks by.
+        """
+        mode = mode or self.mode
+        top_k = top_k if top_k is not None else self.top_k
+        threshold = threshold if threshold is not None else self.threshold
+
+        if mode == "lexical":
+            with span("retrieval", mode=mode) as attrs:
+                chunk_ids, scores = self.lexical_index.search(query, top_k=top_k, threshold=threshold, doc_ids=doc_ids)
+                attrs["results"] = len(chunk_ids)
+            return chunk_ids, scores
+
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_query(query)
+        with span("retrieval", mode=mode) as attrs:
+            if mode == "hybrid":
+                chunk_ids, scores = self._hybrid_search(query, query_embedding, top_k, threshold, doc_ids)
+            else:
+                chunk_ids, scores = self.vector_store.search(
+                    query_embedding, top_k=top_k, threshold=threshold, doc_ids=doc_ids
+                )
+            attrs["results"] = len(chunk_ids)
+        return chunk_ids, scores
+
+    def memory_bytes(self) -> int:
+        """Approximate memory of the dense and lexical indexes (the embedder is shared and not counted)."""
+        return self.vector_store.memory_bytes() + self.lexical_index.memory_bytes()
+
+    def document_chunks(self, doc_id):
+        """(chunk texts, embeddings) of an indexed document in document order, e.g. to rank its sentences."""
+        chunk_ids = self.vector_store.documents.get(doc_id, [])
+        return self.get_chunk_texts(chunk_ids), self.vector_store.get_vectors(chunk_ids)
+
+    def get_chunk_texts(self, chunk_ids) -> list[str]:
+        return [self.vector_store.text_chunks[i] for i in chunk_ids]
+
+    def retrieve_context(self, query: str, top_k: int = 5, doc_ids=None) -> list[str]:
         """
         Retrieves top_k most relevant chunks for the user query.
         """
-        query_embedding = self.embedder.embed_query(query)
-        return self.vector_store.query(query_embedding, top_k=top_k)
+        chunk_ids, _ = self.get_relevant_chunks(query, top_k=top_k, doc_ids=doc_ids)
+        return self.get_chunk_texts(chunk_ids)
+
+    def save(self, path: str):
+        self.vector_store.save(path)
+
+    @classmethod
+    def load(cls, path: str, embedder=None, mmap=False, **kwargs):
+        return cls(embedder=embedder, vector_store=VectorStore.load(path, mmap=mmap), **kwargs)
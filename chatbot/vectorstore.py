@@ -1,23 +1,483 @@
+import json
+import os
+import sys
+import tempfile
+
 import faiss
 import numpy as np
 
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+# Storage of the vectors in the index: full float32, or fp16 / int8 scalar or product quantized codes
+COMPRESSIONS = ("none", "fp16", "int8", "pq")
+DEFAULT_COMPRESSION = os.environ.get("SMARTSCHOLAR_VECTOR_COMPRESSION", "none")
+# Compressed stores re-rank this many candidates per requested result (at least MIN_RERANK_CANDIDATES);
+# the coarser the codes, the more candidates it takes to keep the exact top results
+RERANK_FACTORS = {"fp16": 2, "int8": 4, "pq": 16}
+MIN_RERANK_CANDIDATES = 32
+# IVF and PQ quantizers first train on whatever the first add holds (a 64-chunk batch when streaming).
+# Until they have seen this many vectors per centroid, they are retrained on every stored vector
+# each time the store grows RETRAIN_GROWTH-fold, so the index reaches its configured size.
+TRAINING_POINTS_PER_CENTROID = 39
+RETRAIN_GROWTH = 4
+# HNSW cannot delete: once this share of its vectors are tombstones, it is rebuilt without them
+TOMBSTONE_REBUILD_FRACTION = 0.25
+
+
+def id_selector(ids):
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+
+
+class ChunkTexts:
+    """
+    Chunk texts addressed by chunk id.
+
+    Texts loaded from disk stay in a memory-mapped UTF-8 blob with an offsets array;
+    texts added afterwards are kept in a list until the next save.
+    """
+
+    def __init__(self, blob=None, offsets=None):
+        self.blob = blob
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype=np.int64)
+        self.added = []
+
+    @property
+    def num_saved(self):
+        return len(self.offsets) - 1
+
+    def __len__(self):
+        return self.num_saved + len(self.added)
+
+    def __getitem__(self, chunk_id):
+        chunk_id = int(chunk_id)
+        if chunk_id < self.num_saved:
+            start, end = self.offsets[chunk_id], self.offsets[chunk_id + 1]
+            return bytes(self.blob[start:end]).decode("utf-8")
+        return self.added[chunk_id - self.num_saved]
+
+    def extend(self, texts):
+        self.added.extend(texts)
+
+    def memory_bytes(self) -> int:
+        """Heap held by the texts; a memory-mapped blob is file-backed and not counted."""
+        return self.offsets.nbytes + sum(sys.getsizeof(text) for text in self.added)
+
+    def save(self, blob_path, offsets_path):
+        encoded = [self[i].encode("utf-8") for i in range(len(self))]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        # Write to temporary files and swap them in, so a memory-mapped previous save stays readable
+        with open(blob_path + ".tmp", "wb") as f:
+            for e in encoded:
+                f.write(e)
+        with open(offsets_path + ".tmp", "wb") as f:
+            np.save(f, offsets)
+        os.replace(blob_path + ".tmp", blob_path)
+        os.replace(offsets_path + ".tmp", offsets_path)
+
+    @classmethod
+    def load(cls, blob_path, offsets_path):
+        offsets = np.load(offsets_path, mmap_mode="r")
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+
+class ExactVectors:
+    """
+    Full-precision copies of compressed vectors, used to re-rank candidates exactly.
+
+    They are kept on disk rather than in memory: vectors of a loaded store stay
+    memory-mapped, and vectors added afterwards are appended to a temporary spill
+    file, so only the rows a re-rank reads are paged in.
+    """
+
+    def __init__(self, dim, saved=None):
+        self.dim = dim
+        self.saved = saved if saved is not None else np.zeros((0, dim), dtype=np.float32)
+        self._spill = None
+        self._num_added = 0
+        self._added = None
+
+    def __len__(self):
+        return len(self.saved) + self._num_added
+
+    def extend(self, vectors):
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(prefix="smartscholar-vectors-")
+        self._spill.seek(0, os.SEEK_END)
+        self._spill.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._spill.flush()
+        self._num_added += len(vectors)
+        self._added = None
+
+    def _added_rows(self):
+        if self._added is None:
+            self._added = np.memmap(self._spill, dtype=np.float32, mode="r", shape=(self._num_added, self.dim))
+        return self._added
+
+    def take(self, ids) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.empty((len(ids), self.dim), dtype=np.float32)
+        is_saved = ids < len(self.saved)
+        rows[is_saved] = self.saved[ids[is_saved]]
+        if not is_saved.all():
+            rows[~is_saved] = self._added_rows()[ids[~is_saved] - len(self.saved)]
+        return rows
+
+    def save(self, path, block_size=65536):
+        output = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.float32, shape=(len(self), self.dim))
+        for start in range(0, len(self), block_size):
+            output[start:start + block_size] = self.take(np.arange(start, min(start + block_size, len(self))))
+        output.flush()
+        del output
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, dim):
+        return cls(dim, np.load(path, mmap_mode="r"))
+
+
+def default_pq_m(dim):
+    """Sub-quantizers for product quantization: about one byte per 16 dimensions, dividing `dim`."""
+    m = max(1, dim // 16)
+    while dim % m:
+        m -= 1
+    return m
+
+
 class VectorStore:
-    def __init__(self, embedding_dim: int):
+    def __init__(self, embedding_dim: int, index_type: str = "flat", nlist: int = 256, nprobe: int = 16,
+                 hnsw_m: int = 32, ef_construction: int = 80, ef_search: int = 64,
+                 compression: str = DEFAULT_COMPRESSION, pq_m: int | None = None, rerank_factor: int | None = None):
         """
-        Initializes a FAISS index for fast similarity search.
+        Initializes a FAISS index for similarity search over chunks from many documents.
         Uses Inner Product (IP) for cosine similarity search (assuming normalized vectors).
+
+        Args:
+            embedding_dim (int): Dimension of the stored embeddings.
+            index_type (str): "flat" (exact), "ivf" (inverted lists) or "hnsw" (graph).
+            nlist (int): Number of IVF clusters.
+            nprobe (int): IVF clusters visited per query; higher means better recall.
+            hnsw_m (int): HNSW neighbours per node.
+            ef_construction (int): HNSW build-time search depth.
+            ef_search (int): HNSW query-time search depth; higher means better recall.
+            compression (str): "none" keeps float32 vectors in the index; "fp16", "int8" (scalar
+                quantization) and "pq" (product quantization) keep compressed codes, search
+                them first and re-rank the best candidates with exact vectors kept on disk,
+                so scores and threshold decisions are those of the uncompressed store.
+                Flat and IVF indexes only.
+            pq_m (int | None): Product quantization sub-quantizers; must divide embedding_dim.
+            rerank_factor (int | None): Candidates re-ranked per requested result when compressed;
+                defaults to RERANK_FACTORS of the compression.
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'. Expected one of {COMPRESSIONS}.")
+        if compression != "none" and index_type == "hnsw":
+            raise ValueError("Compression is supported for flat and IVF indexes, not HNSW.")
+        pq_m = pq_m or default_pq_m(embedding_dim)
+        if compression == "pq" and embedding_dim % pq_m:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {embedding_dim}.")
+
         self.embedding_dim = embedding_dim
-        self.index = faiss.IndexFlatIP(embedding_dim)  # Use IP for cosine similarity
-        self.text_chunks = []
+        self.config = {
+            "index_type": index_type,
+            "nlist": nlist,
+            "nprobe": nprobe,
+            "hnsw_m": hnsw_m,
+            "ef_construction": ef_construction,
+            "ef_search": ef_search,
+            "compression": compression,
+            "pq_m": pq_m,
+            "rerank_factor": rerank_factor or RERANK_FACTORS.get(compression, 1),
+        }
+        self.index = self._build_index()
+        self.exact_vectors = ExactVectors(embedding_dim) if compression != "none" else None
+        self.text_chunks = ChunkTexts()
+        self.documents = {}  # doc_id -> list of chunk ids
+        self.removed_ids = set()  # tombstones for indexes that cannot delete (HNSW)
+        self.trained_on = 0  # vectors the IVF / PQ quantizers were trained on
+
+    @property
+    def index_type(self):
+        return self.config["index_type"]
+
+    @property
+    def compression(self):
+        return self.config["compression"]
+
+    def _build_index(self, nlist=None, pq_bits=8):
+        index_type = self.index_type
+        compression = self.compression
+        dim, ip = self.embedding_dim, faiss.METRIC_INNER_PRODUCT
+        scalar_types = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+        if index_type == "flat":
+            if compression in scalar_types:
+                return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, scalar_types[compression], ip))
+            if compression != "pq":
+                return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+            # IndexPQ cannot filter by id, so flat PQ is an IVF-PQ with a single list (one full scan)
+            nlist = 1
+        if index_type == "ivf" or compression == "pq":
+            quantizer = faiss.IndexFlatIP(dim)
+            nlist = nlist or self.config["nlist"]
+            if compression in scalar_types:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, scalar_types[compression], ip)
+            elif compression == "pq":
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, self.config["pq_m"], pq_bits, ip)
+                # Small documents train on few vectors by design; silence faiss' per-codebook warning
+                index.pq.cp.min_points_per_centroid = 1
+            else:
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+            index.nprobe = min(self.config["nprobe"], nlist)
+            return index
+        base = faiss.IndexHNSWFlat(self.embedding_dim, self.config["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = self.config["ef_construction"]
+        base.hnsw.efSearch = self.config["ef_search"]
+        return faiss.IndexIDMap2(base)
+
+    def set_recall(self, nprobe=None, ef_search=None):
+        """Tune the recall/latency trade-off of IVF and HNSW indexes at query time."""
+        if nprobe is not None:
+            self.config["nprobe"] = nprobe
+            if self.index_type == "ivf":
+                self.index.nprobe = nprobe
+        if ef_search is not None:
+            self.config["ef_search"] = ef_search
+            if self.index_type == "hnsw":
+                faiss.downcast_index(self.index.index).hnsw.efSearch = ef_search
 
-    def add_embeddings(self, embeddings: np.ndarray, texts: list[str]):
+    @property
+    def needs_training(self) -> bool:
+        return self.index_type == "ivf" or self.compression == "pq"
+
+    def train(self, sample_embeddings: np.ndarray):
+        """
+        Trains an IVF or quantized index on a representative sample. Called automatically on the first add
+        otherwise; a sample too small for the configured nlist / PQ codebooks shrinks them until the store
+        has grown enough to retrain at full size.
+        """
+        if self.index.is_trained:
+            return
+        sample = np.ascontiguousarray(sample_embeddings, dtype="float32")
+        nlist, pq_bits = None, 8
+        if self.index_type == "ivf" and len(sample) < self.config["nlist"]:
+            # Too few vectors for the configured cluster count; use one cluster per vector
+            nlist = max(1, len(sample))
+        if self.compression == "pq" and len(sample) < 2 ** pq_bits:
+            # Likewise for the PQ codebooks: no more centroids per sub-quantizer than vectors
+            pq_bits = max(1, int(np.log2(len(sample))))
+        if nlist is not None or pq_bits != 8:
+            self.index = self._build_index(nlist=nlist, pq_bits=pq_bits)
+        self.index.train(sample)
+        self.trained_on = len(sample)
+
+    def _needs_retraining(self) -> bool:
+        if not self.needs_training:
+            return False
+        nlist = self.config["nlist"] if self.index_type == "ivf" else 1
+        centroids = max(nlist, 2 ** 8 if self.compression == "pq" else 1)
+        return (self.trained_on < TRAINING_POINTS_PER_CENTROID * centroids
+                and self.num_chunks >= RETRAIN_GROWTH * self.trained_on)
+
+    def _rebuild(self):
         """
-        Adds embeddings and their corresponding text chunks to the store.
+        Rebuild the index from the vectors of the stored documents, keeping their chunk ids:
+        retrains IVF / PQ quantizers on all of them and drops HNSW tombstones.
         """
-        self.index.add(embeddings)
+        ids = np.array(sorted(i for chunk_ids in self.documents.values() for i in chunk_ids), dtype=np.int64)
+        vectors = self.get_vectors(ids)
+        self.index = self._build_index()
+        self.trained_on = 0
+        self.removed_ids = set()
+        if len(ids):
+            self.train(vectors)
+            self.index.add_with_ids(vectors, ids)
+
+    def add_embeddings(self, embeddings: np.ndarray, texts: list[str], doc_id: str = "default"):
+        """
+        Adds embeddings and their corresponding text chunks to the store under a document id.
+        Returns the chunk ids assigned to them.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        self.train(embeddings)
+
+        first_id = len(self.text_chunks)
+        ids = np.arange(first_id, first_id + len(texts), dtype=np.int64)
+        self.index.add_with_ids(embeddings, ids)
+        if self.exact_vectors is not None:
+            self.exact_vectors.extend(embeddings)
         self.text_chunks.extend(texts)
+        self.documents.setdefault(doc_id, []).extend(ids.tolist())
+        if self._needs_retraining():
+            self._rebuild()
+        return ids
+
+    def remove_document(self, doc_id: str):
+        """
+        Removes every chunk of a document from the store.
+        """
+        ids = self.documents.pop(doc_id, [])
+        if not ids:
+            return
+        if self.index_type == "hnsw":
+            self.removed_ids.update(ids)
+            # Every search filters the tombstones, so they are not left to pile up
+            if len(self.removed_ids) > TOMBSTONE_REBUILD_FRACTION * self.index.ntotal:
+                self._rebuild()
+        else:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def reset(self):
+        """
+        Removes all embeddings and text chunks from the store.
+        """
+        self.index = self._build_index()
+        self.exact_vectors = ExactVectors(self.embedding_dim) if self.compression != "none" else None
+        self.text_chunks = ChunkTexts()
+        self.documents = {}
+        self.removed_ids = set()
+        self.trained_on = 0
+
+    @property
+    def num_chunks(self):
+        return sum(len(ids) for ids in self.documents.values())
+
+    def bytes_per_vector(self) -> int:
+        """In-memory bytes per stored vector: its code (float32 or compressed), id and HNSW links."""
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap2):
+            index = faiss.downcast_index(index.index)
+        code_size = index.code_size if hasattr(index, "code_size") else self.embedding_dim * 4
+        per_vector = code_size + 8
+        if self.index_type == "hnsw":
+            per_vector += self.config["hnsw_m"] * 2 * 4
+        return per_vector
+
+    def memory_bytes(self) -> int:
+        """Approximate memory of the index and chunk texts; exact vectors of a compressed store are on disk."""
+        return self.index.ntotal * self.bytes_per_vector() + self.text_chunks.memory_bytes()
+
+    def memory_by_document(self) -> dict:
+        """Approximate index memory per document id."""
+        per_vector = self.bytes_per_vector()
+        return {doc_id: len(ids) * per_vector for doc_id, ids in self.documents.items()}
+
+    def _search_params(self, doc_ids, chunk_ids=None):
+        if chunk_ids is not None:
+            selector = id_selector(chunk_ids)
+            keep_alive = (selector,)
+        elif doc_ids is not None:
+            allowed = [i for doc_id in doc_ids for i in self.documents.get(doc_id, [])]
+            selector = id_selector(allowed)
+            keep_alive = (selector,)
+        elif self.removed_ids:
+            removed = id_selector(sorted(self.removed_ids))
+            selector = faiss.IDSelectorNot(removed)
+            keep_alive = (selector, removed)
+        else:
+            return None, None
+
+        if self.index_type == "ivf" or self.compression == "pq":
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.config["ef_search"])
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        # The selectors must outlive the search call
+        return params, keep_alive
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, threshold: float | None = None,
+               doc_ids=None, chunk_ids=None):
+        """
+        Returns (chunk_ids, scores) of the top_k most similar chunks, best first.
+        Chunks scoring below `threshold` are dropped when a threshold is given, and
+        `doc_ids` restricts the search to the chunks of those documents. `chunk_ids`
+        restricts it to exactly those chunks (e.g. to score lexical candidates).
+        """
+        if chunk_ids is not None:
+            available = len(chunk_ids)
+        elif doc_ids is not None:
+            available = sum(len(self.documents.get(doc_id, [])) for doc_id in doc_ids)
+        else:
+            available = self.num_chunks
+        k = min(top_k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = np.ascontiguousarray(query_embedding.reshape(1, -1), dtype="float32")
+        params, _keep_alive = self._search_params(doc_ids, chunk_ids)
+        if self.exact_vectors is None:
+            scores, indices = self.index.search(query, k, params=params)
+            scores, indices = scores[0], indices[0]
+        else:
+            # First pass over the compressed codes, then exact scores for the candidates
+            candidates = min(max(k * self.config["rerank_factor"], MIN_RERANK_CANDIDATES), available)
+            _, indices = self.index.search(query, candidates, params=params)
+            indices = indices[0][indices[0] >= 0]
+            scores = self.exact_vectors.take(indices) @ query[0]
+            order = np.argsort(-scores, kind="stable")[:k]
+            scores, indices = scores[order], indices[order]
+
+        keep = indices >= 0
+        if threshold is not None:
+            keep &= scores >= threshold
+        return indices[keep], scores[keep]
+
+    def get_vectors(self, chunk_ids) -> np.ndarray:
+        """Stored (exact) embeddings of the given chunks."""
+        ids = np.asarray(chunk_ids, dtype=np.int64)
+        if self.exact_vectors is not None:
+            return self.exact_vectors.take(ids)
+        if self.index_type == "ivf" and self.index.direct_map.type == faiss.DirectMap.NoMap:
+            # IVF lists are not addressable by id until a direct map is built
+            self.index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = np.empty((len(ids), self.embedding_dim), dtype=np.float32)
+        for row, chunk_id in enumerate(ids):
+            vectors[row] = self.index.reconstruct(int(chunk_id))
+        return vectors
+
+    def query(self, query_embedding: np.ndarray, top_k: int = 5, threshold: float | None = None,
+              doc_ids=None) -> list[tuple[str, float]]:
+        indices, scores = self.search(query_embedding, top_k=top_k, threshold=threshold, doc_ids=doc_ids)
+        return [(self.text_chunks[i], float(score)) for i, score in zip(indices, scores)]
+
+    def save(self, path: str):
+        """
+        Saves the index, chunk texts and document metadata into the directory `path`.
+        """
+        os.makedirs(path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(path, "index.faiss"))
+        self.text_chunks.save(os.path.join(path, "chunks.bin"), os.path.join(path, "offsets.npy"))
+        if self.exact_vectors is not None:
+            self.exact_vectors.save(os.path.join(path, "vectors.npy"))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "embedding_dim": self.embedding_dim,
+                "config": self.config,
+                "documents": self.documents,
+                "removed_ids": sorted(self.removed_ids),
+                "trained_on": self.trained_on,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False):
+        """
+        Loads a store saved with `save`. Chunk texts are memory-mapped; with `mmap=True`
+        the FAISS index is memory-mapped as well where the index type supports it.
+        """
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
 
-    def query(self, query_embedding: np.ndarray, top_k: int = 5) -> list[tuple[str, float]]:
-        distances, indices = self.index.search(query_embedding.reshape(1, -1), top_k)
-        return [(self.text_chunks[i], float(distances[0][j])) for j, i in enumerate(indices[0])]
+        store = cls(meta["embedding_dim"], **meta["config"])
+        io_flags = faiss.IO_FLAG_MMAP if mmap else 0
+        store.index = faiss.read_index(os.path.join(path, "index.faiss"), io_flags)
+        store.text_chunks = ChunkTexts.load(os.path.join(path, "chunks.bin"), os.path.join(path, "offsets.npy"))
+        if store.exact_vectors is not None:
+            store.exact_vectors = ExactVectors.load(os.path.join(path, "vectors.npy"), store.embedding_dim)
+        store.documents = meta["documents"]
+        store.removed_ids = set(meta["removed_ids"])
+        # Stores saved before retraining was tracked count as trained on what they hold
+        store.trained_on = meta.get("trained_on", store.num_chunks if store.needs_training else 0)
+        return store
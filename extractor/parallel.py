@@ -0,0 +1,140 @@
+"""
+Parallel page-range extraction for large PDFs.
+
+The page range is split into contiguous shards, each parsed by a worker process with
+the same per-page parser the sequential path uses, and the results are merged back in
+page order, so the PDFDocument is identical to PDFDocument.from_bytes.
+
+Workers never receive the PDF bytes. A PDF already on disk is opened by path; an
+in-memory PDF is written once to a temporary file (in /dev/shm when available) that
+every worker opens, so the OS page cache holds the only copy.
+"""
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from extractor.pdf_document import PDFDocument, open_pdf, parse_page, pdf_buffer
+from instrumentation.metrics import span
+from storage.artifact_cache import hash_pdf_file
+
+PARALLEL_MIN_PAGES = 64
+SHARDS_PER_WORKER = 4
+DEFAULT_WORKERS = int(os.environ.get("SMARTSCHOLAR_EXTRACTION_WORKERS", os.cpu_count() or 1))
+SHARED_TMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_pool = None
+_pool_workers = 0
+# Documents are extracted from several threads at once (sessions, background jobs)
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """A process pool kept alive between documents; worker start-up costs more than a small PDF."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: safe from threaded parents such as Streamlit
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a pool whose worker died (e.g. OOM-killed), so the next document starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_shard(path, start, end):
+    """Worker: parse pages [start, end) of the PDF at `path`."""
+    with open_pdf(path) as doc:
+        return [parse_page(doc, page_num) for page_num in range(start, end)]
+
+
+def page_shards(num_pages, workers, shards_per_worker=SHARDS_PER_WORKER):
+    """Contiguous (start, end) page ranges; several per worker so uneven pages balance out."""
+    num_shards = min(num_pages, workers * shards_per_worker)
+    bounds = [round(i * num_pages / num_shards) for i in range(num_shards + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+
+def _extract_shards(path, num_pages, workers, content_hash):
+    """Parse the shards in the pool; a broken pool is replaced and the document retried once."""
+    for attempt in range(2):
+        pool = _get_pool(workers)
+        try:
+            futures = [pool.submit(_extract_shard, path, start, end) for start, end in page_shards(num_pages, workers)]
+            shards = [future.result() for future in futures]
+            break
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            if attempt:
+                raise
+            logging.warning("An extraction worker died; retrying the document with a new pool.")
+
+    page_texts, lines, page_word_counts = [], [], []
+    for shard in shards:
+        for page_text, page_lines, word_count in shard:
+            page_texts.append(page_text)
+            lines.extend(page_lines)
+            page_word_counts.append(word_count)
+
+    lines.sort(key=lambda x: (x.page_num, x.y0))
+    return PDFDocument(page_texts, lines, page_word_counts, content_hash=content_hash)
+
+
+def extract_parallel(source, workers=None) -> PDFDocument:
+    """
+    Build a PDFDocument from a path, bytes or file-like object using `workers` processes.
+
+    Documents shorter than PARALLEL_MIN_PAGES are parsed sequentially in this process,
+    where handing pages to workers would cost more than it saves.
+    """
+    workers = workers or DEFAULT_WORKERS
+    is_path = isinstance(source, (str, os.PathLike))
+    if is_path:
+        content_hash = hash_pdf_file(source)
+    else:
+        source = pdf_buffer(source)
+        content_hash = hashlib.sha256(source).hexdigest()
+
+    with span("extraction", parallel=True) as attrs:
+        with open_pdf(source) as doc:
+            attrs["pages"] = len(doc)
+            if workers <= 1 or len(doc) < PARALLEL_MIN_PAGES:
+                attrs["workers"] = 1
+                return PDFDocument.from_fitz(doc, content_hash=content_hash)
+            num_pages = len(doc)
+        attrs["workers"] = workers
+
+        try:
+            if is_path:
+                return _extract_shards(os.fspath(source), num_pages, workers, content_hash)
+
+            with tempfile.NamedTemporaryFile(suffix=".pdf", dir=SHARED_TMP_DIR) as f:
+                f.write(source)
+                f.flush()
+                return _extract_shards(f.name, num_pages, workers, content_hash)
+        except BrokenProcessPool:
+            # Workers died twice in a row (most likely out of memory): parse in this process instead
+            logging.warning("Parallel extraction failed twice; falling back to sequential extraction.")
+            attrs["workers"] = 1
+            with open_pdf(source) as doc:
+                return PDFDocument.from_fitz(doc, content_hash=content_hash)
@@ -0,0 +1,170 @@
+import fitz  # PyMuPDF
+import hashlib
+import os
+from bisect import bisect_right
+from functools import lru_cache
+from typing import NamedTuple
+from instrumentation.metrics import span
+
+PAGE_SEPARATOR = "\n\n"
+
+
+class PDFLine(NamedTuple):
+    page_num: int
+    y0: float
+    text: str
+    is_bold: bool
+    font_size: float
+    bbox: tuple
+
+
+@lru_cache(maxsize=1024)
+def is_bold_font(font_name):
+    # Memoized: a document uses a handful of fonts across thousands of spans
+    return "bold" in font_name.lower()
+
+
+def parse_page(doc, page_num):
+    """
+    Parse one page into (text, lines, word_count) from a single TextPage.
+    Lines are in reading-block order; PDFDocument sorts them by position.
+    """
+    page = doc.load_page(page_num)
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+    page_text = page.get_text("text", textpage=textpage)
+
+    lines = []
+    word_count = 0
+    for block in page.get_text("dict", textpage=textpage)["blocks"]:
+        if block["type"] != 0 or "lines" not in block:
+            continue
+        for line in block["lines"]:
+            spans = line["spans"]
+            if not spans:
+                continue
+            for text_span in spans:
+                word_count += len(text_span["text"].split())
+            line_text = "".join(text_span["text"] for text_span in spans).strip()
+            if not line_text:
+                continue
+            is_bold = any(is_bold_font(text_span["font"]) for text_span in spans)
+            font_size = max(text_span["size"] for text_span in spans)
+            lines.append(PDFLine(page_num, line["bbox"][1], line_text, is_bold, font_size, tuple(line["bbox"])))
+    return page_text, lines, word_count
+
+
+class PDFDocument:
+    """
+    Parsed view of a PDF, built in a single pass over its pages.
+
+    Every page is parsed once into a PyMuPDF TextPage, from which both the plain
+    text and the line/span layout are read. Extraction, heading detection and
+    image-only page detection all consume this object instead of re-opening or
+    re-reading the PDF.
+    """
+
+    def __init__(self, page_texts, lines, page_word_counts, content_hash=None):
+        self.content_hash = content_hash
+        self.page_texts = page_texts
+        self.lines = lines
+        self.page_word_counts = page_word_counts
+
+        # page_ends[i] is the offset in full_text just past page i (separator included)
+        self.page_ends = []
+        cumulative = 0
+        for page_text in page_texts:
+            cumulative += len(page_text) + len(PAGE_SEPARATOR)
+            self.page_ends.append(cumulative)
+
+        self.full_text = "".join(page_text + PAGE_SEPARATOR for page_text in page_texts)
+
+    def __len__(self):
+        return len(self.page_texts)
+
+    @classmethod
+    def from_bytes(cls, pdf_bytes):
+        with span("extraction", bytes=len(pdf_bytes)) as attrs, fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            attrs["pages"] = len(doc)
+            return cls.from_fitz(doc, content_hash=hashlib.sha256(pdf_bytes).hexdigest())
+
+    @classmethod
+    def from_fitz(cls, doc, content_hash=None):
+        page_texts = []
+        lines = []
+        page_word_counts = []
+
+        for page_num in range(len(doc)):
+            page_text, page_lines, word_count = parse_page(doc, page_num)
+            page_texts.append(page_text)
+            lines.extend(page_lines)
+            page_word_counts.append(word_count)
+
+        lines.sort(key=lambda x: (x.page_num, x.y0))
+        return cls(page_texts, lines, page_word_counts, content_hash=content_hash)
+
+    def page_at_offset(self, pos):
+        """Return the page index containing character offset `pos` of full_text."""
+        return min(bisect_right(self.page_ends, pos), len(self.page_texts) - 1)
+
+
+def pdf_buffer(source):
+    """
+    The PDF's bytes without copying them where possible: a zero-copy view of an in-memory
+    upload (BytesIO / Streamlit UploadedFile), the bytes themselves, or the file's contents.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    return source.read()
+
+
+def open_pdf(source):
+    """Open a PDF with PyMuPDF from a path (read lazily from disk) or a single in-memory buffer."""
+    if isinstance(source, (str, os.PathLike)):
+        return fitz.open(source)
+    return fitz.open(stream=pdf_buffer(source), filetype="pdf")
+
+
+def iter_page_texts(source):
+    """
+    Yield the text of each page in turn, without keeping earlier pages or their layout.
+
+    Produces exactly the page texts of PDFDocument.page_texts, so joining them with
+    PAGE_SEPARATOR gives PDFDocument.full_text. Memory stays at one page regardless of
+    document length.
+
+    Each page's parse is its own "page_extraction" span: a span around the whole loop
+    would also time the consumer (chunking, embedding) while the generator is suspended.
+    """
+    with open_pdf(source) as doc:
+        for page_num in range(len(doc)):
+            with span("page_extraction", page=page_num):
+                page = doc.load_page(page_num)
+                textpage = page.get_textpage(flags=fitz.TEXTFLAGS_DICT)
+                text = page.get_text("text", textpage=textpage)
+            yield text
+
+
+def count_pages(source) -> int:
+    with open_pdf(source) as doc:
+        return len(doc)
+
+
+def load_pdf_document(source, workers=None):
+    """
+    Build a PDFDocument from raw bytes, a file-like object or an existing PDFDocument.
+
+    Long documents are parsed in parallel page ranges across `workers` processes
+    (default SMARTSCHOLAR_EXTRACTION_WORKERS, or one per core); workers=1 forces the
+    sequential parser. Both give the same PDFDocument.
+    """
+    if isinstance(source, PDFDocument):
+        return source
+    if workers == 1:
+        return PDFDocument.from_bytes(pdf_buffer(source))
+
+    from extractor.parallel import extract_parallel  # imported here: parallel builds on this module
+    return extract_parallel(source, workers=workers)
@@ -1,13 +1,8 @@
-import fitz  # PyMuPDF
-from io import BytesIO
+from extractor.pdf_document import load_pdf_document
 
-def extract_text_from_pdf(uploaded_file):
-    pdf_bytes = uploaded_file.read()
-    pdf_buffer = BytesIO(pdf_bytes)
-    doc = fitz.open(stream=pdf_buffer, filetype="pdf")
-
-    full_text = ""
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        full_text += page.get_text("text") + "\n\n"
-    return full_text
+def extract_text_from_pdf(uploaded_file, workers=None):
+    """
+    Extract the full text of a PDF. Accepts an uploaded file, raw bytes or a PDFDocument.
+    `workers` is passed to load_pdf_document (workers=1 parses sequentially).
+    """
+    return load_pdf_document(uploaded_file, workers=workers).full_text
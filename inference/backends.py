@@ -0,0 +1,101 @@
+"""
+CPU inference backends for the app's HuggingFace models.
+
+Every model can run as:
+- "torch": the plain fp32 PyTorch model (default)
+- "int8":  the PyTorch model with its Linear layers dynamically quantized to int8
+- "onnx":  the model exported to an ONNX Runtime graph (needs `optimum[onnxruntime]`)
+
+The backend is picked per model role ("summarizer", "chat", "embedder") from an
+explicit argument, then SMARTSCHOLAR_<ROLE>_BACKEND, then SMARTSCHOLAR_INFERENCE_BACKEND.
+"""
+import logging
+import os
+
+BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = "torch"
+ONNX_EXPORT_DIR = os.environ.get(
+    "SMARTSCHOLAR_ONNX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "smartscholar", "onnx")
+)
+
+
+def resolve_backend(role, backend=None) -> str:
+    backend = (
+        backend
+        or os.environ.get(f"SMARTSCHOLAR_{role.upper()}_BACKEND")
+        or os.environ.get("SMARTSCHOLAR_INFERENCE_BACKEND")
+        or DEFAULT_BACKEND
+    ).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r} for {role}; expected one of {', '.join(BACKENDS)}.")
+    return backend
+
+
+def model_key(model_name, backend=DEFAULT_BACKEND) -> str:
+    """
+    Model identity for cache keys. Quantized and exported models give slightly different
+    outputs, so their cached embeddings, answers and summaries are kept apart.
+    """
+    return model_name if backend == DEFAULT_BACKEND else f"{model_name}[{backend}]"
+
+
+def quantize_int8(model):
+    """Dynamically quantize the Linear layers of a PyTorch model to int8 (weights int8, activations fp32)."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_export_path(model_name):
+    return os.path.join(ONNX_EXPORT_DIR, model_name.replace("/", "--"))
+
+
+def _load_onnx_seq2seq(model_name):
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        raise ImportError("The onnx backend needs optimum with ONNX Runtime: pip install optimum[onnxruntime]") from e
+
+    # Export once and reuse the exported graph on later startups
+    export_path = _onnx_export_path(model_name)
+    if os.path.isdir(export_path):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_path)
+    logging.info(f"Exporting {model_name} to ONNX in {export_path}")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_path)
+    return model
+
+
+def load_text2text_pipeline(task, model_name, backend=DEFAULT_BACKEND):
+    """
+    A HuggingFace seq2seq pipeline ("summarization" or "text2text-generation") running on
+    the given backend. The backend name is kept on the pipeline as `inference_backend`.
+    """
+    from transformers import AutoTokenizer, pipeline
+
+    if backend == "onnx":
+        model = _load_onnx_seq2seq(model_name)
+        generator = pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+    else:
+        generator = pipeline(task, model=model_name)
+        if backend == "int8":
+            generator.model = quantize_int8(generator.model)
+    generator.inference_backend = backend
+    return generator
+
+
+def load_sentence_encoder(model_name, backend=DEFAULT_BACKEND, device="cpu"):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        try:
+            return SentenceTransformer(model_name, device=device, backend="onnx")
+        except ImportError as e:
+            raise ImportError(
+                "The onnx backend needs optimum with ONNX Runtime: pip install optimum[onnxruntime]"
+            ) from e
+
+    model = SentenceTransformer(model_name, device=device)
+    if backend == "int8":
+        model = quantize_int8(model)
+    return model
@@ -0,0 +1,184 @@
+"""
+Background jobs for work too slow to run inside a Streamlit script run (indexing, summarization).
+
+Jobs run on a shared thread pool, so a rerun neither waits for a job nor throws it
+away: the session keeps the job id and reads its progress and partial results on
+every run. Jobs have a key (e.g. task, PDF hash and settings). Submitting a key whose
+job is still queued or running returns that job, so two sessions summarizing the
+same paper share one run. Each submitting session owns a reference to the job;
+cancel() drops it and stops the job once no owner is left. Finished jobs are kept
+(up to `max_finished`) so a session can collect the result on its next run.
+
+Threads rather than processes: the models are loaded once per process and shared
+(the summarizer through the micro-batching service), and the heavy work runs in
+torch and faiss code that releases the GIL.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation.metrics import metrics, span
+
+DEFAULT_JOB_WORKERS = int(os.environ.get("SMARTSCHOLAR_JOB_WORKERS", 2))
+MAX_FINISHED_JOBS = 64
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function (see Job.check_cancelled) to stop it early."""
+
+
+class Job:
+    """State of one background job, read by the sessions that own it."""
+
+    def __init__(self, key, kind):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.kind = kind
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.message = ""
+        self.items = []  # partial results published so far, e.g. finished sections
+        self.result = None
+        self.error = None
+        self.owners = set()
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def fraction(self) -> float:
+        """Share of the work done, 0.0 while the total is unknown."""
+        if self.status == DONE:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def report(self, done, total=None, message=None):
+        """Progress callback for the job function: `done` of `total` units, with an optional status line."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    def publish(self, item):
+        """Make a partial result visible to readers before the job finishes."""
+        self.items.append(item)
+
+    def partial(self) -> list:
+        return list(self.items)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobExecutor:
+    """
+    Thread pool running keyed, deduplicated and cancellable jobs.
+
+    The job function is called as fn(job, *args, **kwargs) in a copy of the submitting
+    thread's context (so its spans keep the session's trace id); it reports progress
+    with job.report(), publishes partial results with job.publish(), and its return
+    value becomes job.result.
+    """
+
+    def __init__(self, max_workers=DEFAULT_JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()  # job_id -> Job, oldest first
+        self.active = {}  # key -> queued or running Job
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, owner=None, kind="job", **kwargs) -> Job:
+        """The live job for `key`, or a new job running fn. `owner` (e.g. a session id) is added to its owners."""
+        with self._lock:
+            job = self.active.get(key)
+            if job is not None and not job.cancel_event.is_set():
+                metrics.increment("jobs_deduplicated_total", kind=kind)
+            else:
+                job = Job(key, kind)
+                self.jobs[job.job_id] = job
+                self.active[key] = job
+                metrics.increment("jobs_submitted_total", kind=kind)
+                context = contextvars.copy_context()
+                self._pool.submit(context.run, self._run, job, fn, args, kwargs)
+            if owner is not None:
+                job.owners.add(owner)
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None if there is none (or it was pruned)."""
+        return self.jobs.get(job_id) if job_id is not None else None
+
+    def cancel(self, job_id, owner=None):
+        """
+        Release `owner`'s reference to a job and stop the job if no owner is left;
+        without an owner the job is stopped outright. A running job stops at its next
+        cancellation check, keeping what it has published.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job.owners.discard(owner)
+            if owner is None or not job.owners:
+                job.cancel_event.set()
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_event.is_set():
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        try:
+            with span("job", kind=job.kind):
+                job.result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            logging.exception(f"Background {job.kind} job failed.")
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, FAILED)
+        else:
+            # Job functions may also return early (with partial results) once cancelled
+            self._finish(job, CANCELLED if job.cancel_event.is_set() else DONE)
+
+    def _finish(self, job, status):
+        with self._lock:
+            job.status = status
+            job.finished_at = time.monotonic()
+            if self.active.get(job.key) is job:
+                del self.active[job.key]
+            metrics.increment("jobs_finished_total", kind=job.kind, status=status)
+
+            finished = [job_id for job_id, j in self.jobs.items() if j.finished]
+            for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self.jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            jobs = list(self.jobs.values())
+        return {
+            "queued": sum(job.status == QUEUED for job in jobs),
+            "running": sum(job.status == RUNNING for job in jobs),
+            "finished": sum(job.finished for job in jobs),
+        }
+
+    def shutdown(self):
+        """Stop every job and the pool without waiting."""
+        with self._lock:
+            for job in self.active.values():
+                job.cancel_event.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
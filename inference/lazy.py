@@ -0,0 +1,46 @@
+import logging
+import threading
+
+from instrumentation.metrics import span
+
+
+class LazyResource:
+    """
+    A model (or any expensive object) that is only loaded on first use.
+
+    `warm_up()` starts loading on a background thread so the cost overlaps with
+    other work; `get()` returns the loaded object, waiting for an in-flight warm-up
+    or loading in the caller's thread if nothing has started it yet.
+    """
+
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+        self._value = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def is_loaded(self):
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    with span("model_load", model=self.name):
+                        self._value = self.loader()
+        return self._value
+
+    def _warm_up(self):
+        try:
+            self.get()
+        except Exception:
+            # The next get() retries in the foreground and surfaces the error there
+            logging.exception(f"Background warm-up of {self.name} failed.")
+
+    def warm_up(self):
+        if self._value is None and self._thread is None:
+            self._thread = threading.Thread(target=self._warm_up, name=f"warm-up-{self.name}", daemon=True)
+            self._thread.start()
+        return self
@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from instrumentation.metrics import span, record_tokens
+
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT_MS = 15
+DEFAULT_MAX_QUEUE_SIZE = 256
+DEFAULT_TIMEOUT = 120.0
+
+_STREAM_END = object()
+
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the service already has max_queue_size requests waiting."""
+
+
+class GenerationRequest:
+    def __init__(self, input_ids, generate_kwargs, timeout, cancel_event=None, stream=False):
+        self.input_ids = list(input_ids)
+        self.generate_kwargs = generate_kwargs
+        self.deadline = time.monotonic() + timeout
+        self.cancel_event = cancel_event or threading.Event()
+        self.future = Future()
+        self.text_queue = queue.Queue() if stream else None
+
+    @property
+    def batch_key(self):
+        # Only requests with identical generation settings can share a generate() call
+        return tuple(sorted(self.generate_kwargs.items()))
+
+
+# torch and transformers are imported when the first batch runs, not at import time,
+# so importing this module (and the app) stays cheap.
+class _CancelRows:
+    """
+    Stopping criterion that finishes each row of the batch once its request is cancelled.
+    Under beam search generate() checks batch x num_beams rows, each request's beams in turn.
+    """
+
+    def __init__(self, requests):
+        self.requests = requests
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        cancelled = torch.tensor(
+            [request.cancel_event.is_set() for request in self.requests],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+        return torch.repeat_interleave(cancelled, input_ids.shape[0] // len(self.requests))
+
+
+class _BatchStreamer:
+    """Streamer (put/end protocol) routing each row of a batched generate() to its own request."""
+
+    def __init__(self, tokenizer, requests):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.tokens = [[] for _ in requests]
+        self.emitted = [""] * len(requests)
+        self.seen_prompt = False
+
+    def put(self, value):
+        if not self.seen_prompt:
+            # The first call carries the decoder start tokens, not generated text
+            self.seen_prompt = True
+            return
+        value = value.reshape(len(self.requests), -1)
+        for row, request in enumerate(self.requests):
+            if request.text_queue is None or request.cancel_event.is_set():
+                continue
+            self.tokens[row].extend(value[row].tolist())
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            if len(text) > len(self.emitted[row]) and text.startswith(self.emitted[row]):
+                request.text_queue.put(text[len(self.emitted[row]):])
+                self.emitted[row] = text
+
+    def end(self):
+        pass
+
+
+class GenerationService:
+    """
+    In-process inference service for one seq2seq model with dynamic micro-batching.
+
+    Callers submit prompts as token IDs and get a Future back. A single worker thread
+    takes the first waiting request, waits up to `max_wait_ms` for more to arrive,
+    and runs them as one batched generate() per group of identical generation
+    settings. The queue is bounded (InferenceQueueFull when it is full) and requests
+    that passed their timeout before being scheduled fail with TimeoutError.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_queue_size=DEFAULT_MAX_QUEUE_SIZE, default_timeout=DEFAULT_TIMEOUT, name="generation"):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.default_timeout = default_timeout
+        self.name = name
+        self.requests = queue.Queue(maxsize=max_queue_size)
+        self.batches_run = 0
+        self.requests_run = 0
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._serve, name=f"{name}-service", daemon=True)
+        self._worker.start()
+
+    def _enqueue(self, request):
+        try:
+            self.requests.put_nowait(request)
+        except queue.Full:
+            raise InferenceQueueFull(f"{self.name} service has {self.requests.maxsize} requests waiting.")
+        return request
+
+    def submit(self, input_ids, timeout=None, cancel_event=None, **generate_kwargs) -> Future:
+        """Queue a prompt; the Future resolves to the decoded output text."""
+        request = GenerationRequest(input_ids, generate_kwargs, timeout or self.default_timeout, cancel_event)
+        return self._enqueue(request).future
+
+    async def submit_async(self, input_ids, timeout=None, **generate_kwargs) -> str:
+        return await asyncio.wrap_future(self.submit(input_ids, timeout=timeout, **generate_kwargs))
+
+    def generate(self, input_ids, timeout=None, **generate_kwargs) -> str:
+        timeout = timeout or self.default_timeout
+        return self.submit(input_ids, timeout=timeout, **generate_kwargs).result(timeout=timeout)
+
+    def stream(self, input_ids, timeout=None, cancel_event=None, **generate_kwargs):
+        """
+        Queue a prompt and yield its output text as it is decoded. Setting `cancel_event`
+        (or closing the generator) finishes the request's row of the batch early.
+        """
+        timeout = timeout or self.default_timeout
+        request = self._enqueue(
+            GenerationRequest(input_ids, generate_kwargs, timeout, cancel_event, stream=True)
+        )
+        try:
+            while True:
+                text = request.text_queue.get(timeout=timeout)
+                if text is _STREAM_END:
+                    break
+                yield text
+            if not request.future.cancelled():
+                request.future.result(timeout=timeout)
+        finally:
+            request.cancel_event.set()
+
+    def close(self):
+        self._stopped.set()
+
+    def _collect_batch(self):
+        first = self.requests.get(timeout=0.5)
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                batch = self._collect_batch()
+            except queue.Empty:
+                continue
+
+            now = time.monotonic()
+            groups = {}
+            for request in batch:
+                if request.cancel_event.is_set():
+                    self._finish(request, cancelled=True)
+                    continue
+                if now > request.deadline:
+                    self._finish(request, error=TimeoutError("Request expired before it was scheduled."))
+                    continue
+                groups.setdefault(request.batch_key, []).append(request)
+
+            for group in groups.values():
+                self._run_group(group)
+
+    def _finish(self, request, result=None, error=None, cancelled=False):
+        if request.text_queue is not None:
+            request.text_queue.put(_STREAM_END)
+        if request.future.done():
+            return
+        if cancelled:
+            request.future.cancel()
+        elif error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+
+    def _run_group(self, group):
+        from transformers import StoppingCriteriaList
+
+        try:
+            inputs = self.tokenizer.pad({"input_ids": [r.input_ids for r in group]}, return_tensors="pt")
+            kwargs = dict(group[0].generate_kwargs)
+            kwargs["stopping_criteria"] = StoppingCriteriaList([_CancelRows(group)])
+            if any(r.text_queue is not None for r in group):
+                kwargs["streamer"] = _BatchStreamer(self.tokenizer, group)
+
+            tokens_in = int(inputs["attention_mask"].sum())
+            with span("generation", model=self.name, batch_size=len(group), tokens_in=tokens_in) as attrs:
+                outputs = self.model.generate(**inputs, **kwargs)
+                texts = self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+                tokens_out = int((outputs != self.tokenizer.pad_token_id).sum())
+                attrs["tokens_out"] = tokens_out
+            record_tokens(self.name, tokens_in, tokens_out)
+        except Exception as e:
+            logging.exception(f"Batched generation failed in {self.name} service.")
+            for request in group:
+                self._finish(request, error=e)
+            return
+
+        self.batches_run += 1
+        self.requests_run += len(group)
+        for request, text in zip(group, texts):
+            self._finish(request, result=text.strip())
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.requests.qsize(),
+            "batches_run": self.batches_run,
+            "requests_run": self.requests_run,
+            "mean_batch_size": self.requests_run / self.batches_run if self.batches_run else 0.0,
+        }
+
+
+class ServiceSummarizer:
+    """
+    Drop-in replacement for a HuggingFace summarization pipeline that sends each text
+    through a GenerationService, so chunks from concurrent summaries share batches.
+    """
+
+    def __init__(self, summarization_pipeline, **service_options):
+        self.model = summarization_pipeline.model
+        self.tokenizer = summarization_pipeline.tokenizer
+        self.inference_backend = getattr(summarization_pipeline, "inference_backend", "torch")
+        task_params = dict((self.model.config.task_specific_params or {}).get("summarization", {}))
+        self.prefix = task_params.pop("prefix", "")
+        self.generate_defaults = task_params
+        self.service = GenerationService(self.model, self.tokenizer, name="summarizer", **service_options)
+
+    def __call__(self, texts, min_length=None, max_length=None, truncation=True, batch_size=None, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        generate_kwargs = dict(self.generate_defaults)
+        if min_length is not None:
+            generate_kwargs["min_length"] = min_length
+        if max_length is not None:
+            generate_kwargs["max_length"] = max_length
+
+        futures = []
+        for text in texts:
+            input_ids = self.tokenizer(
+                self.prefix + text, truncation=truncation, max_length=self.tokenizer.model_max_length
+            )["input_ids"]
+            futures.append(self.service.submit(input_ids, **generate_kwargs))
+        return [{"summary_text": future.result()} for future in futures]
@@ -0,0 +1,201 @@
+import contextvars
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_SPANS = 5000
+METRIC_PREFIX = "smartscholar"
+
+_current_trace = contextvars.ContextVar("smartscholar_trace", default=None)
+
+
+def rss_mb() -> float:
+    """Current resident set size of the process in MB."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        # Peak RSS is the best portable fallback (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if peak > 2 ** 32 else peak / 1024
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """
+    Process-wide store of spans, counters and per-stage timing summaries.
+
+    Spans are kept in a bounded ring buffer for the sidebar and JSON lines export;
+    counters and stage summaries are cumulative and feed the Prometheus text format.
+    """
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self.spans = deque(maxlen=max_spans)
+        self.counters = defaultdict(float)
+        self.stage_totals = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+        self._lock = threading.Lock()
+
+    def record_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+            totals = self.stage_totals[span["name"]]
+            totals["count"] += 1
+            totals["seconds"] += span["seconds"]
+            totals["max_seconds"] = max(totals["max_seconds"], span["seconds"])
+
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    def recent_spans(self, limit=None, trace_id=None):
+        with self._lock:
+            spans = list(self.spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s.get("trace_id") == trace_id]
+        return spans[-limit:] if limit else spans
+
+    def stage_summary(self) -> dict:
+        with self._lock:
+            return {
+                name: dict(totals, mean_seconds=totals["seconds"] / totals["count"])
+                for name, totals in self.stage_totals.items()
+            }
+
+    def to_jsonl(self, trace_id=None) -> str:
+        return "".join(json.dumps(span) + "\n" for span in self.recent_spans(trace_id=trace_id))
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            stage_totals = {name: dict(totals) for name, totals in self.stage_totals.items()}
+            counters = dict(self.counters)
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds_total counter")
+        for name, totals in sorted(stage_totals.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_total{{stage="{name}"}} {totals["seconds"]:.6f}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_calls_total counter")
+        for name, totals in sorted(stage_totals.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_calls_total{{stage="{name}"}} {totals["count"]}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_max_seconds gauge")
+        for name, totals in sorted(stage_totals.items()):
+            lines.append(f'{METRIC_PREFIX}_stage_max_seconds{{stage="{name}"}} {totals["max_seconds"]:.6f}')
+
+        for (name, labels), value in sorted(counters.items()):
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            label_text = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{METRIC_PREFIX}_{name}{label_text} {value:g}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_process_resident_memory_mb gauge")
+        lines.append(f"{METRIC_PREFIX}_process_resident_memory_mb {rss_mb():.1f}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.stage_totals.clear()
+
+
+metrics = MetricsRegistry()
+
+
+def set_trace(trace_id):
+    """Tag spans recorded from now on in the current thread/context with `trace_id`."""
+    _current_trace.set(trace_id)
+
+
+@contextmanager
+def trace(trace_id):
+    """Tag every span recorded inside the block (on this thread) with `trace_id`."""
+    token = _current_trace.set(trace_id)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a pipeline stage and sample memory around it.
+
+    Attributes passed in, or set on the yielded dict inside the block (e.g. token
+    counts), are stored with the span.
+    """
+    attrs = dict(attrs)
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        rss_after = rss_mb()
+        record = {
+            "name": name,
+            "start": time.time() - seconds,
+            "seconds": seconds,
+            "rss_mb": round(rss_after, 1),
+            "rss_delta_mb": round(rss_after - rss_before, 1),
+            "thread": threading.current_thread().name,
+            "trace_id": _current_trace.get(),
+            **attrs,
+        }
+        if error:
+            record["error"] = error
+        metrics.record_span(record)
+
+
+def timed(name):
+    """Decorator form of `span` for whole functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_tokens(model, tokens_in, tokens_out=0):
+    """Count tokens going into and coming out of a model call."""
+    metrics.increment("model_tokens_in_total", tokens_in, model=model)
+    if tokens_out:
+        metrics.increment("model_tokens_out_total", tokens_out, model=model)
+    metrics.increment("model_calls_total", 1, model=model)
+
+
+class _PrometheusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_prometheus(port, host="127.0.0.1"):
+    """Expose the registry in Prometheus text format on http://host:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _PrometheusHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -1,3 +1,6 @@
+import os
+import threading
+import uuid
 import streamlit as st
 
 # Set page config early
@@ -18,42 +21,117 @@ if not st.session_state.agreed_to_terms:
     st.stop()
 
 
-from extractor.pdf_extractor import extract_text_from_pdf
+from extractor.pdf_document import count_pages, iter_page_texts, load_pdf_document
 from summarizer.model_loader import load_summarizer_model
-from summarizer.summarization import summarize_document
+from summarizer.extractive import ChunkEmbeddings
+from summarizer.summarization import SUMMARY_MODES, iter_section_summaries, join_sections
 from chatbot.chatbot_runner import ChatbotRunner
 from chatbot.embedder import Embedder
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from chatbot.rag_pipeline import RAGPipeline
+from chatbot.answer_cache import AnswerCache
+from inference.jobs import DONE, FAILED, JobExecutor
+from inference.lazy import LazyResource
+from inference.service import ServiceSummarizer
+from instrumentation.metrics import metrics, serve_prometheus, set_trace, span
+from storage.artifact_cache import ArtifactCache, hash_pdf
+from storage.document_registry import DocumentRegistry
+from storage.embedding_cache import EmbeddingCache, DEFAULT_DISK_PATH
 
 RELEVANCE_THRESHOLD = 0.30
 TOP_K_RELEVANT_CHUNKS = 5
+ANSWER_CACHE_SIMILARITY = 0.95
+# Retrieval chunks are sized in embedder tokens (capped at the encoder's 384) so none is truncated;
+# they stay well below it so the top chunks fit the chat model's prompt together
+CHUNK_MAX_TOKENS = 128
+CHUNK_OVERLAP_TOKENS = 24
+# Longer documents are extracted, chunked and embedded page by page with bounded memory
+STREAMING_MIN_PAGES = 200
+SUMMARY_MODE_LABELS = {"full": "Full", "fast": "Fast (key sentences)", "extractive": "Key sentences only"}
+# How often a page with a running background job refreshes its progress
+JOB_POLL_SECONDS = 1.0
 
-class RelevanceFilter:
-    def __init__(self, embedder, chunk_embeddings, threshold=0.30, top_k=5):
-        self.embedder = embedder
-        self.chunk_embeddings = chunk_embeddings
-        self.threshold = threshold
-        self.top_k = top_k
-
-    def get_relevant_chunks(self, query: str):
-        query_embedding = self.embedder.embed_query(query)
-        scores = cosine_similarity(query_embedding.reshape(1, -1), self.chunk_embeddings).flatten()
-        relevant_indices = np.where(scores >= self.threshold)[0]
-        sorted_indices = relevant_indices[np.argsort(scores[relevant_indices])[::-1]]
-        top_indices = sorted_indices[:self.top_k]
-        return top_indices, scores[top_indices]
-
-def chunk_text_with_overlap(text, max_words=100, overlap=20):
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = min(start + max_words, len(words))
-        chunk = words[start:end]
-        chunks.append(" ".join(chunk))
-        start += (max_words - overlap)
-    return chunks
+@st.cache_resource
+def start_metrics_endpoint():
+    port = os.environ.get("SMARTSCHOLAR_METRICS_PORT")
+    return serve_prometheus(int(port)) if port else None
+
+
+# Models are loaded on first use (or warmed up in the background), not at startup
+@st.cache_resource
+def get_model_hub():
+    # One embedding model shared by retrieval and the answer cache; the chatbot only answers from retrieved chunks
+    embedder = LazyResource(lambda: Embedder(cache=EmbeddingCache(disk_path=DEFAULT_DISK_PATH)), "embedder")
+    # Summaries from every session share one micro-batching inference service
+    summarizer = LazyResource(lambda: ServiceSummarizer(load_summarizer_model()), "summarizer")
+    chatbot = LazyResource(ChatbotRunner, "chatbot")
+    return {"embedder": embedder, "summarizer": summarizer, "chatbot": chatbot}
+
+
+# Shared across sessions so everyone asking the same question about a paper benefits
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache(similarity_threshold=ANSWER_CACHE_SIMILARITY)
+
+
+# One registry per process: sessions opening the same PDF share its text and indexes.
+# A document it evicts is gone for good, so its cached answers go with it.
+@st.cache_resource
+def get_document_registry():
+    return DocumentRegistry(on_evict=lambda doc_hash: get_answer_cache().invalidate(doc_id=doc_hash))
+
+
+# Indexing and summarization run here, off the script thread, shared by every session
+@st.cache_resource
+def get_job_executor():
+    return JobExecutor()
+
+
+def render_metrics_panel(trace_id):
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        summary = metrics.stage_summary()
+        if not summary:
+            st.caption("No stages recorded yet.")
+            return
+        st.markdown("**All sessions (cumulative)**")
+        st.dataframe(
+            [
+                {
+                    "stage": name,
+                    "calls": totals["count"],
+                    "total s": round(totals["seconds"], 3),
+                    "mean s": round(totals["mean_seconds"], 3),
+                    "max s": round(totals["max_seconds"], 3),
+                }
+                for name, totals in sorted(summary.items(), key=lambda item: -item[1]["seconds"])
+            ],
+            hide_index=True,
+        )
+        session_spans = metrics.recent_spans(limit=50, trace_id=trace_id)
+        if session_spans:
+            st.markdown("**This session (latest spans)**")
+            st.dataframe(
+                [
+                    {"stage": s["name"], "s": round(s["seconds"], 3), "rss MB": s["rss_mb"]}
+                    for s in reversed(session_spans)
+                ],
+                hide_index=True,
+            )
+        registry = get_document_registry().stats()
+        st.caption(
+            f"Documents in memory: {registry['documents']} ({registry['open_documents']} open, "
+            f"{registry['sessions']} sessions), {registry['bytes'] / 1024 ** 2:.0f} of "
+            f"{registry['max_bytes'] / 1024 ** 2:.0f} MB, {registry['evictions']} evicted"
+        )
+        jobs = get_job_executor().stats()
+        st.caption(f"Background jobs: {jobs['running']} running, {jobs['queued']} queued")
+        st.download_button("Download spans (JSON lines)", metrics.to_jsonl(), file_name="spans.jsonl")
+        st.download_button("Download Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom")
+
+
+start_metrics_endpoint()
+if "trace_id" not in st.session_state:
+    st.session_state.trace_id = uuid.uuid4().hex[:12]
+set_trace(st.session_state.trace_id)
 
 st.title("SmartScholar")
 st.write("📄 Research Paper Summarizer + Document Chatbot")
@@ -65,75 +143,304 @@ st.markdown(
 uploaded_file = st.file_uploader("Upload a PDF", type=["pdf"])
 
 if uploaded_file:
-    # Cache models to avoid reloads
     @st.cache_resource
-    def load_models():
-        return load_summarizer_model(), ChatbotRunner(), Embedder()
+    def get_artifact_cache():
+        return ArtifactCache()
+
+    models = get_model_hub()
+    # Load the embedder and chat model while the PDF is parsed; the summarizer waits for its button
+    models["embedder"].warm_up()
+    models["chatbot"].warm_up()
 
-    with st.spinner("Loading models..."):
-        summarizer_model, chatbot, embedder = load_models()
+    artifact_cache = get_artifact_cache()
+    registry = get_document_registry()
+    jobs = get_job_executor()
+    # Zero-copy view of the upload: hashing and every PyMuPDF open share this one buffer
+    pdf_buffer = uploaded_file.getbuffer()
+    upload_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("upload_id") != upload_id:
+        # A new upload: hash it once, and drop the summary, chat and jobs of the previous document
+        if st.session_state.get("generation_cancel") is not None:
+            st.session_state.generation_cancel.set()
+        for key in ("index_job", "summary_job"):
+            jobs.cancel(st.session_state.get(key), owner=st.session_state.trace_id)
+        for key in ("summary", "summary_mode", "summary_sections", "summary_job", "index_job", "chat_history",
+                    "generation_cancel"):
+            st.session_state.pop(key, None)
+        st.session_state.upload_id = upload_id
+        st.session_state.doc_hash = hash_pdf(pdf_buffer)
+    doc_hash = st.session_state.doc_hash
+    # Text and retriever are shared with every other session that has this PDF open
+    document = registry.open(st.session_state.trace_id, doc_hash)
+    streaming = registry.get_or_build(document, "pages", lambda: count_pages(pdf_buffer)) >= STREAMING_MIN_PAGES
 
-    with st.spinner("Extracting text from PDF..."):
-        full_text = extract_text_from_pdf(uploaded_file).replace("<n>", "\n")
+    # Set when this run parses the PDF, so a summary in the same run reuses the parse
+    parsed = {}
 
-    st.success(f"✅ Extracted {len(full_text.split())} words from the document.")
+    def extract_full_text():
+        text = artifact_cache.load_text(doc_hash, "text")
+        if text is None:
+            parsed["document"] = load_pdf_document(pdf_buffer)
+            text = parsed["document"].full_text.replace("<n>", "\n")
+            artifact_cache.save_text(doc_hash, "text", text)
+        return text
+
+    full_text = document.get("text")
+    if streaming:
+        # The full text is only built if a summary is requested
+        st.success("✅ Large document: text is extracted and indexed page by page.")
+    else:
+        if full_text is None:
+            with st.spinner("Extracting text from PDF..."):
+                full_text = registry.get_or_build(document, "text", extract_full_text)
+        st.success(f"✅ Extracted {len(full_text.split())} words from the document.")
 
     # Initialize session state variables
     if "summary" not in st.session_state:
         st.session_state.summary = None
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
-    if "chunks" not in st.session_state:
-        with st.spinner("Chunking & indexing document..."):
-            chunks = chunk_text_with_overlap(full_text)
-            chunk_embeddings = embedder.embed_texts(chunks)
-            st.session_state.chunks = chunks
-            st.session_state.chunk_embeddings = chunk_embeddings
-            st.session_state.relevance_filter = RelevanceFilter(
-                embedder, chunk_embeddings, RELEVANCE_THRESHOLD, TOP_K_RELEVANT_CHUNKS
+
+    with st.spinner("Loading embedding model..."):
+        embedder = models["embedder"].get()
+
+    # The job functions below run on the job executor's threads: they must not call st.*
+    def build_retriever(job=None):
+        retriever = RAGPipeline(embedder, threshold=RELEVANCE_THRESHOLD, top_k=TOP_K_RELEVANT_CHUNKS)
+        chunker = embedder.chunker(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+        if streaming:
+            # Pages -> overlapping chunks -> embedding batches -> index, one batch in memory at a time.
+            # Chunk embeddings still hit the embedding cache, so a re-upload skips the encoder.
+            num_pages = document.get("pages")
+
+            def page_texts():
+                for page_num, text in enumerate(iter_page_texts(pdf_buffer)):
+                    if job is not None:
+                        job.check_cancelled()
+                        job.report(page_num, num_pages, f"Indexing page {page_num + 1} of {num_pages}...")
+                    yield text.replace("<n>", "\n")
+
+            retriever.index_stream(chunker.iter_chunks(page_texts()), doc_id=doc_hash)
+        else:
+            chunk_config = chunker.config()
+            chunks = artifact_cache.load_json(doc_hash, "chunks", chunk_config)
+            if chunks is None:
+                if job is not None:
+                    job.report(0, 2, "Chunking document...")
+                with span("chunking", words=len(full_text.split())):
+                    chunks = chunker.chunk(full_text)
+                artifact_cache.save_json(doc_hash, "chunks", chunks, chunk_config)
+
+            embedding_config = dict(chunk_config, model=embedder.model_key)
+            chunk_embeddings = artifact_cache.load_array(doc_hash, "embeddings", embedding_config)
+            if chunk_embeddings is None:
+                if job is not None:
+                    job.check_cancelled()
+                    job.report(1, 2, f"Embedding {len(chunks)} chunks...")
+                chunk_embeddings = embedder.embed_texts(chunks)
+                artifact_cache.save_array(doc_hash, "embeddings", chunk_embeddings, embedding_config)
+
+            retriever.index_document(chunks, embeddings=chunk_embeddings, doc_id=doc_hash)
+        # Sessions search it concurrently; compacting now keeps searches read-only
+        retriever.lexical_index.compact()
+        return retriever
+
+    def index_document(job):
+        return registry.get_or_build(document, "retriever", lambda: build_retriever(job))
+
+    def summarize(job, summary_mode):
+        summarizer_model = None
+        if summary_mode != "extractive":
+            job.report(0, message="Loading summarization model...")
+            summarizer_model = models["summarizer"].get()
+        job.report(0, message="Extracting text from PDF...")
+        text = registry.get_or_build(document, "text", extract_full_text)
+        chunk_embeddings = None
+        if summary_mode != "full":
+            # Sentences are ranked with the chunk embeddings of the retrieval index (waits for indexing)
+            job.report(0, message="Waiting for the document index...")
+            document_retriever = registry.get_or_build(document, "retriever", build_retriever)
+            chunk_embeddings = ChunkEmbeddings.locate(text, *document_retriever.document_chunks(doc_hash))
+
+        job.report(0, message="Summarizing document...")
+        for section in iter_section_summaries(
+            text, summarizer_model, parsed.get("document", pdf_buffer), cache=artifact_cache,
+            cancel_event=job.cancel_event, mode=summary_mode, chunk_embeddings=chunk_embeddings, progress=job.report,
+        ):
+            job.publish(section)
+        return job.partial()
+
+    retriever = document.get("retriever")
+    if retriever is None:
+        index_job = jobs.get(st.session_state.get("index_job"))
+        if index_job is not None and index_job.status == FAILED:
+            st.error(f"❌ Indexing failed: {index_job.error}")
+            if st.button("Retry indexing"):
+                st.session_state.pop("index_job")
+                st.rerun()
+        else:
+            # Returns the job already indexing this PDF, if any (this session's or another's)
+            index_job = jobs.submit(
+                ("index", doc_hash, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS), index_document,
+                owner=st.session_state.trace_id, kind="index",
             )
-            chatbot.index_document(chunks)
+            st.session_state.index_job = index_job.job_id
+
+            @st.fragment(run_every=JOB_POLL_SECONDS)
+            def show_index_progress():
+                job = jobs.get(st.session_state.get("index_job"))
+                if job is None or job.finished:
+                    st.rerun()
+                default = "Chunking & indexing document" + (" page by page..." if streaming else "...")
+                st.progress(job.fraction, text=job.message or default)
+
+            show_index_progress()
+    elif st.session_state.pop("index_job", None) is not None:
         st.success("Chatbot ready!")
-    else:
-        chunks = st.session_state.chunks
-        relevance_filter = st.session_state.relevance_filter
 
-    # Summary generation
-    if st.button("🔍 Generate Summary") and st.session_state.summary is None:
-        with st.spinner("Summarizing document..."):
-            summary = summarize_document(full_text, summarizer_model, uploaded_file.getvalue())
-            st.session_state.summary = summary.replace("<n>", "\n")
+    # Summary generation runs in the background: reruns (chat questions, widget clicks) leave it running,
+    # and sections are shown as they finish, most important first
+    summary_mode = st.radio(
+        "Summary mode", SUMMARY_MODES, format_func=SUMMARY_MODE_LABELS.get, horizontal=True,
+        help="Fast summarizes only the most central sentences of each section; "
+             "key sentences only returns them without running the summarization model.",
+    )
+    summary_job = jobs.get(st.session_state.get("summary_job"))
+    generate = st.button("🔍 Generate Summary")
+    if generate and (st.session_state.summary is None or st.session_state.get("summary_mode") != summary_mode):
+        if summary_job is not None and summary_job.key[2] != summary_mode:
+            jobs.cancel(summary_job.job_id, owner=st.session_state.trace_id)
+            summary_job = None
+        if summary_job is None:
+            summary_job = jobs.submit(
+                ("summary", doc_hash, summary_mode), summarize, summary_mode,
+                owner=st.session_state.trace_id, kind="summary",
+            )
+            st.session_state.summary_job = summary_job.job_id
+            st.session_state.pop("summary_sections", None)
+
+    def collect_summary(job):
+        """Move a finished (or stopped) job's sections into the session, so they outlive the job."""
+        st.session_state.summary_job = None
+        if job.status == DONE:
+            st.session_state.summary = join_sections(job.result).replace("<n>", "\n")
+            st.session_state.summary_mode = job.key[2]
+        elif job.status == FAILED:
+            st.session_state.summary_error = job.error
+        else:
+            st.session_state.summary_sections = job.partial()
+
+    if summary_job is not None and summary_job.finished:
+        collect_summary(summary_job)
+    elif summary_job is not None:
+        @st.fragment(run_every=JOB_POLL_SECONDS)
+        def show_summary_progress():
+            job = jobs.get(st.session_state.get("summary_job"))
+            if job is None or job.finished:
+                st.rerun()
+            if st.button("⏹️ Stop summarizing"):
+                # Stops the job unless another session is waiting for the same summary
+                jobs.cancel(job.job_id, owner=st.session_state.trace_id)
+                collect_summary(job)
+                st.rerun()
+            if job.total:
+                text = f"Summarized {job.done} of {job.total} sections"
+            else:
+                text = job.message or "Summarizing document..."
+            st.progress(job.fraction, text=text)
+            sections = job.partial()
+            if sections:
+                st.subheader("📝 Summary")
+                st.write("".join(s.text for s in sections))
+
+        show_summary_progress()
+    elif st.session_state.get("summary_job") is not None:
+        # Pruned before this session collected it; the artifact cache makes a new request quick
+        st.session_state.summary_job = None
+
+    if st.session_state.get("summary_error"):
+        st.error(f"❌ Summarization failed: {st.session_state.pop('summary_error')}")
 
     if st.session_state.summary:
         st.subheader("📝 Summary")
         st.write(st.session_state.summary)
+    elif st.session_state.get("summary_sections"):
+        st.subheader("📝 Summary (stopped)")
+        st.caption("Summarization was stopped. Click Generate Summary to run it again.")
+        st.write(join_sections(st.session_state.summary_sections))
 
     st.divider()
     st.subheader("💬 Ask Questions About the PDF")
 
-    query = st.text_input("Ask a question:")
+    if st.session_state.chat_history:
+        st.markdown("### Conversation so far:")
+        for i, (q, a) in enumerate(st.session_state.chat_history):
+            st.markdown(f"**Q{i+1}:** {q}")
+            st.markdown(f"**A{i+1}:** {a}")
+
+    if retriever is None:
+        st.info("Questions can be asked once the document is indexed.")
+        query = None
+    else:
+        # chat_input returns a question only on the run its submission triggered, so reruns started
+        # by background jobs (or any other widget) never answer the same question again
+        query = st.chat_input("Ask a question about the PDF")
     if query:
-        relevance_filter = st.session_state.relevance_filter
-        top_indices, scores = relevance_filter.get_relevant_chunks(query)
+        # Term lookups (a dataset name, an equation label) are answered from the lexical index without the encoder
+        query_embedding = None
+        keyword_hits = retriever.keyword_search(query)
+        if keyword_hits is not None:
+            top_indices, scores = keyword_hits
+        else:
+            query_embedding = embedder.embed_query(query)
+            top_indices, scores = retriever.get_relevant_chunks(query, query_embedding=query_embedding)
         if len(top_indices) == 0:
             st.error("❌ Sorry, this question doesn't seem to relate to the document.")
         else:
-            relevant_chunks = [chunks[i] for i in top_indices]
-            chatbot_context = "\n".join(relevant_chunks)
-
-            with st.spinner("Generating answer..."):
-                response = chatbot.generate_response(
-                    query,
-                    context_override=chatbot_context,
-                    chat_history=st.session_state.chat_history
+            relevant_chunks = retriever.get_chunk_texts(top_indices)
+
+            # A new question cancels any answer still being generated for the previous one
+            previous_cancel = st.session_state.get("generation_cancel")
+            if previous_cancel is not None:
+                previous_cancel.set()
+            cancel_event = threading.Event()
+            st.session_state.generation_cancel = cancel_event
+
+            st.markdown("### Latest Answer:")
+            st.markdown(f"**Q{len(st.session_state.chat_history) + 1}:** {query}")
+            with st.spinner("Loading chat model..."):
+                chatbot = models["chatbot"].get()
+            answer_cache = get_answer_cache()
+            answer_model = f"{chatbot.model_key}|{embedder.model_key}"
+            answer_cache.switch_model(answer_model)
+            # The semantic answer cache needs the query embedding, so keyword lookups bypass it
+            response = None
+            if query_embedding is not None:
+                response = answer_cache.get(doc_hash, answer_model, query_embedding, top_indices)
+            if response is not None:
+                st.write(response)
+            else:
+                response = st.write_stream(
+                    chatbot.stream_response(
+                        query,
+                        relevant_chunks,
+                        chat_history=st.session_state.chat_history,
+                        cancel_event=cancel_event,
+                    )
                 )
+                if not isinstance(response, str):
+                    response = "".join(str(part) for part in response)
+                response = response.strip()
+                if response and query_embedding is not None:
+                    answer_cache.put(doc_hash, answer_model, query, query_embedding, top_indices, response)
 
             st.session_state.chat_history.append((query, response))
 
-            st.markdown("### Conversation so far:")
-            for i, (q, a) in enumerate(st.session_state.chat_history):
-                st.markdown(f"**Q{i+1}:** {q}")
-                st.markdown(f"**A{i+1}:** {a}")
+else:
+    # The upload was removed: let the registry free the document once no session uses it
+    get_document_registry().close(st.session_state.trace_id)
+    for key in ("index_job", "summary_job"):
+        get_job_executor().cancel(st.session_state.pop(key, None), owner=st.session_state.trace_id)
+    st.session_state.pop("upload_id", None)
 
-            st.markdown("### Latest Answer:")
-            st.write(response)
+render_metrics_panel(st.session_state.trace_id)
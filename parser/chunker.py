@@ -1,3 +1,8 @@
+import re
+
+import numpy as np
+
+
 def chunk_large_section(text, max_words=400):
     """Split a large section into smaller chunks by paragraphs."""
     paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
@@ -19,3 +24,203 @@ def chunk_large_section(text, max_words=400):
     if current_chunk:
         chunks.append(" ".join(current_chunk))
     return chunks
+
+
+def chunk_text_with_overlap(text, max_words=100, overlap=20):
+    """Split text into fixed-size word windows that overlap by `overlap` words."""
+    words = text.split()
+    chunks = []
+    start = 0
+    while start < len(words):
+        end = min(start + max_words, len(words))
+        chunk = words[start:end]
+        chunks.append(" ".join(chunk))
+        start += (max_words - overlap)
+    return chunks
+
+
+def iter_chunks_with_overlap(texts, max_words=100, overlap=20):
+    """
+    Streaming form of chunk_text_with_overlap over an iterable of texts (e.g. pages).
+
+    Yields the same chunks chunk_text_with_overlap gives for the whitespace-joined texts,
+    while holding at most one window plus one text's words in memory.
+    """
+    step = max_words - overlap
+    window = []
+    for text in texts:
+        window.extend(text.split())
+        while len(window) >= max_words:
+            yield " ".join(window[:max_words])
+            del window[:step]
+    while window:
+        yield " ".join(window[:max_words])
+        del window[:step]
+
+
+PARAGRAPH_BREAK_REGEX = re.compile(r"\n\s*\n")
+# End punctuation (optionally closed by quotes/brackets) followed by whitespace and a likely sentence start
+SENTENCE_BREAK_REGEX = re.compile(r"[.!?][\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+# Break levels of a token: the strongest boundary it starts after
+WORD_BREAK, SENTENCE_BREAK, PARAGRAPH_BREAK = 1, 2, 3
+# A chunk ends at the last paragraph break that keeps it this full, else at the last sentence
+# break that does, else at the last word break within the budget
+PARAGRAPH_MIN_FILL = 0.75
+SENTENCE_MIN_FILL = 0.5
+# iter_chunks tokenizes the streamed texts in pieces of about this many characters
+STREAM_BUFFER_CHARS = 64_000
+_WHITESPACE_CODES = np.array([ord(c) for c in " \t\n\r\f\v\xa0"], dtype=np.uint32)
+
+
+def token_budget(tokenizer, max_tokens=None, prefix=""):
+    """
+    Tokens of text that fit in one model call: `max_tokens` (the tokenizer's model_max_length
+    by default) minus the special tokens and the task prefix the model input adds.
+    """
+    max_tokens = max_tokens or tokenizer.model_max_length
+    prefix_tokens = len(tokenizer(prefix, add_special_tokens=False)["input_ids"]) if prefix else 0
+    return max_tokens - tokenizer.num_special_tokens_to_add() - prefix_tokens
+
+
+class TokenChunker:
+    """
+    Chunks text by the token count of a model's tokenizer instead of by words, so every
+    chunk fits the model input (nothing is silently truncated) and fills it closely.
+
+    The text is tokenized once, paragraphs in one batch call of the fast (Rust) tokenizer,
+    and the offset mappings place every token in the text. Chunks end at paragraph or
+    sentence boundaries when that keeps them reasonably full, and are sliced from the
+    original text by character offsets, so no text is re-tokenized or re-joined.
+    """
+
+    def __init__(self, tokenizer, max_tokens, overlap_tokens=0):
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("TokenChunker needs a fast tokenizer: offset mappings are not available otherwise.")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError(f"overlap_tokens must be in [0, max_tokens), got {overlap_tokens} for {max_tokens}.")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def config(self) -> dict:
+        """Identity of the chunking for artifact cache keys."""
+        return {
+            "tokenizer": getattr(self.tokenizer, "name_or_path", type(self.tokenizer).__name__),
+            "max_tokens": self.max_tokens,
+            "overlap_tokens": self.overlap_tokens,
+        }
+
+    def encode(self, text):
+        """
+        Tokenize `text` once. Returns (starts, ends, breaks): the character span of every
+        token, and for every token position the break level before it (breaks[len] marks the end).
+        """
+        paragraph_starts = [0] + [m.end() for m in PARAGRAPH_BREAK_REGEX.finditer(text)]
+        paragraph_ends = paragraph_starts[1:] + [len(text)]
+        paragraphs = [text[start:end] for start, end in zip(paragraph_starts, paragraph_ends)]
+        # verbose=False: long paragraphs are expected here, they are split below
+        offsets = self.tokenizer(
+            paragraphs, add_special_tokens=False, return_offsets_mapping=True,
+            return_attention_mask=False, verbose=False,
+        )["offset_mapping"]
+
+        starts, ends, breaks = [], [], []
+        for paragraph_start, paragraph, paragraph_offsets in zip(paragraph_starts, paragraphs, offsets):
+            spans = np.asarray(paragraph_offsets, dtype=np.int64).reshape(-1, 2)
+            spans = spans[spans[:, 1] > spans[:, 0]]
+            if not len(spans):
+                continue
+            token_starts = spans[:, 0] + paragraph_start
+            level = np.zeros(len(spans), dtype=np.int8)
+            sentence_starts = [paragraph_start + m.end() for m in SENTENCE_BREAK_REGEX.finditer(paragraph)]
+            # The token holding the first character of each sentence (it may also hold the space before it)
+            sentence_tokens = np.searchsorted(spans[:, 1] + paragraph_start, sentence_starts, side="right")
+            level[sentence_tokens.clip(max=len(spans) - 1)] = SENTENCE_BREAK
+            level[0] = PARAGRAPH_BREAK
+            starts.append(token_starts)
+            ends.append(spans[:, 1] + paragraph_start)
+            breaks.append(level)
+        if not starts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.full(1, PARAGRAPH_BREAK, dtype=np.int8)
+
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        breaks = np.concatenate(breaks + [np.array([PARAGRAPH_BREAK], dtype=np.int8)])
+        # Tokens after whitespace, or holding it (SentencePiece "▁word"), start a word; the rest
+        # continue one (sub-word pieces, punctuation)
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        at_space = np.isin(codes[starts], _WHITESPACE_CODES)
+        at_space |= np.isin(codes[np.maximum(starts - 1, 0)], _WHITESPACE_CODES)
+        word_starts = np.flatnonzero(at_space & (breaks[:-1] < WORD_BREAK))
+        breaks[word_starts] = WORD_BREAK
+        return starts, ends, breaks
+
+    def _chunk_end(self, breaks, start, stop):
+        """Token index where the chunk starting at `start` ends (exclusive)."""
+        limit = start + self.max_tokens
+        if limit >= stop:
+            return stop
+        window = breaks[start + 1:limit + 1]
+        for level, min_fill in ((PARAGRAPH_BREAK, PARAGRAPH_MIN_FILL), (SENTENCE_BREAK, SENTENCE_MIN_FILL),
+                                (WORD_BREAK, 0.0)):
+            first = max(int(self.max_tokens * min_fill) - 1, 0)
+            candidates = np.flatnonzero(window[first:] >= level)
+            if len(candidates):
+                return start + 1 + first + int(candidates[-1])
+        return limit
+
+    def _next_start(self, breaks, start, end):
+        """Start of the chunk after [start, end): `overlap_tokens` back, moved forward to a word start."""
+        if not self.overlap_tokens:
+            return end
+        overlap_start = max(end - self.overlap_tokens, start + 1)
+        word_starts = np.flatnonzero(breaks[overlap_start:end] >= WORD_BREAK)
+        return overlap_start + int(word_starts[0]) if len(word_starts) else end
+
+    def spans(self, encoded, start_char=0, end_char=None):
+        """(start, end) character spans of the chunks of text[start_char:end_char] of an encoded text."""
+        starts, ends, breaks = encoded
+        first = int(np.searchsorted(ends, start_char, side="right"))
+        stop = len(starts) if end_char is None else int(np.searchsorted(starts, end_char))
+        if end_char is not None:
+            ends = np.minimum(ends, end_char)
+        spans = []
+        start = first
+        while start < stop:
+            end = self._chunk_end(breaks, start, stop)
+            spans.append((int(starts[start]), int(ends[end - 1])))
+            if end == stop:
+                break
+            start = self._next_start(breaks, start, end)
+        return spans
+
+    def chunk(self, text, encoded=None, start_char=0, end_char=None) -> list[str]:
+        """
+        Split text (or the part text[start_char:end_char], for sections of an already
+        `encoded` document) into chunks of at most max_tokens tokens.
+        """
+        if encoded is None:
+            encoded = self.encode(text)
+        return [text[start:end].strip() for start, end in self.spans(encoded, start_char, end_char)]
+
+    def iter_chunks(self, texts, separator="\n"):
+        """
+        Streaming form of chunk over an iterable of texts (e.g. pages) joined by `separator`.
+
+        Texts are tokenized about STREAM_BUFFER_CHARS at a time. All chunks of a buffer but
+        the last are yielded; the last is re-chunked with the next texts, so chunks flow
+        across text boundaries as in chunk and memory stays at one buffer.
+        """
+        pending = None
+        for text in texts:
+            pending = text if pending is None else pending + separator + text
+            if len(pending) < STREAM_BUFFER_CHARS:
+                continue
+            spans = self.spans(self.encode(pending))
+            for start, end in spans[:-1]:
+                yield pending[start:end].strip()
+            if spans:
+                pending = pending[spans[-1][0]:]
+        if pending:
+            for start, end in self.spans(self.encode(pending)):
+                yield pending[start:end].strip()
@@ -1,5 +1,6 @@
 # heading_detector.py
 import re
+from collections import Counter
 
 MAIN_HEADINGS = [
     "abstract",
@@ -49,64 +50,172 @@ MAIN_HEADINGS = [
     "index",
 ]
 
-HEADING_REGEX = re.compile(
-    r"^(?:\s*\d+(?:\.\d+)*\s*)?"          # optional numbering (e.g., 1.2.3)
-    r"(" + "|".join(re.escape(h) for h in MAIN_HEADINGS) + r")" # heading keywords
-    r"\s*[:\-\.]?\s*$",                   # optional trailing punctuation
-    flags=re.IGNORECASE
-)
-
 EXCEPTION_SHORT_SECTIONS = {"keywords", "acknowledgments", "funding"}
 
-def looks_like_numbered_heading(line):
-    return re.match(r"^\s*\d+(\.\d+)*\.?\s*", line) is not None
+# Numbering before a heading: "3", "3.", "3.2.1", or a roman numeral "IV."
+NUMBERING_REGEX = re.compile(r"^\s*(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s*")
+TRAILING_PUNCTUATION_REGEX = re.compile(r"[:.\-]+$")
 
-def detect_headings_from_lines(text_lines):
-    """
-    Detect headings from extracted PDF lines with font info.
+MAX_HEADING_WORDS = 10
+# A line this much larger than the body text size counts as a heading candidate
+HEADING_SIZE_RATIO = 1.15
+# Above this share of bold text (e.g. an all-bold document), bold says nothing about headings
+MAX_BOLD_RATIO = 0.6
 
-    Args:
-        text_lines: list of tuples (page_num, y0, line_text, is_bold)
+_TRIE_END = ""
 
-    Returns:
-        List of (start_offset, end_offset, heading_name)
+
+def looks_like_numbered_heading(line):
+    return NUMBERING_REGEX.match(line) is not None
+
+
+class HeadingTrie:
+    """Word-level trie over a heading vocabulary; matches a whole normalized line in one pass."""
+
+    def __init__(self, vocabulary):
+        self.root = {}
+        for phrase in vocabulary:
+            node = self.root
+            for word in phrase.lower().split():
+                node = node.setdefault(word, {})
+            node[_TRIE_END] = phrase.lower()
+
+    def match(self, words):
+        """The vocabulary phrase equal to `words`, or None."""
+        node = self.root
+        for word in words:
+            node = node.get(word)
+            if node is None:
+                return None
+        return node.get(_TRIE_END)
+
+
+class FontStats:
+    """Body text size and share of bold text, computed once per document from its lines."""
+
+    def __init__(self, body_size=None, bold_ratio=0.0):
+        self.body_size = body_size
+        self.bold_ratio = bold_ratio
+
+    @classmethod
+    def from_lines(cls, lines):
+        chars_by_size = Counter()
+        bold_chars = total_chars = 0
+        for line in lines:
+            length = len(line.text)
+            total_chars += length
+            if line.is_bold:
+                bold_chars += length
+            chars_by_size[round(line.font_size * 2) / 2] += length
+        if not total_chars:
+            return cls()
+        # The size covering the most characters is the body text
+        return cls(body_size=chars_by_size.most_common(1)[0][0], bold_ratio=bold_chars / total_chars)
+
+
+class HeadingDetector:
     """
-    headings = []
-    offset = 0
+    Detects section headings in a document's lines.
 
-    for _, _, line_text, is_bold_line in text_lines:
-        stripped_line = line_text.strip()
-        line_len = len(stripped_line) + 1  # +1 for newline in full text concat
+    A line is a heading candidate if it is bold (unless most of the document is bold),
+    numbered, or set noticeably larger than the body text. A candidate is a heading when,
+    with numbering and trailing punctuation removed, it is exactly one of the vocabulary
+    phrases. Font sizes are only used for lines that carry them (PDFLine); plain
+    (page_num, y0, text, is_bold) tuples are judged on bold and numbering alone.
+    """
 
-        if not stripped_line:
+    def __init__(self, vocabulary=MAIN_HEADINGS, max_words=MAX_HEADING_WORDS, size_ratio=HEADING_SIZE_RATIO):
+        self.vocabulary = list(vocabulary)
+        self.trie = HeadingTrie(self.vocabulary)
+        self.max_words = max_words
+        self.size_ratio = size_ratio
+
+    def match_heading(self, line_text):
+        """The vocabulary heading a line consists of, or None."""
+        text = NUMBERING_REGEX.sub("", line_text, count=1)
+        text = TRAILING_PUNCTUATION_REGEX.sub("", text.strip().lower()).strip()
+        words = text.split()
+        if not words or len(words) > self.max_words:
+            return None
+        return self.trie.match(words)
+
+    def detect(self, lines, text=None):
+        """
+        Args:
+            lines: PDFLines, or (page_num, y0, line_text, is_bold) tuples, in reading order.
+            text: The full text the lines come from. When given, each heading's offsets are
+                found in it, so sections split exactly at the heading line; otherwise they are
+                estimated from accumulated line lengths.
+
+        Returns:
+            List of (start_offset, end_offset, heading_name)
+        """
+        has_font_info = bool(lines) and hasattr(lines[0], "font_size")
+        stats = FontStats.from_lines(lines) if has_font_info else FontStats()
+        bold_is_signal = stats.bold_ratio <= MAX_BOLD_RATIO
+        min_heading_size = stats.body_size * self.size_ratio if stats.body_size else None
+
+        headings = []
+        offset = 0
+        cursor = 0
+        for line in lines:
+            line_text, is_bold = line[2], line[3]
+            stripped_line = line_text.strip()
+            line_len = len(stripped_line) + 1  # +1 for newline in full text concat
+            if not stripped_line:
+                offset += line_len
+                continue
+
+            is_candidate = (
+                (is_bold and bold_is_signal)
+                or looks_like_numbered_heading(stripped_line)
+                or (min_heading_size is not None and line.font_size >= min_heading_size)
+            )
+            heading = self.match_heading(stripped_line) if is_candidate else None
+            if heading is not None:
+                if text is None:
+                    headings.append((offset, offset + line_len, heading))
+                else:
+                    start = find_line(text, stripped_line, cursor)
+                    if start != -1:
+                        cursor = start + len(stripped_line)
+                        headings.append((start, cursor, heading))
             offset += line_len
-            continue
 
-        lowered = stripped_line.lower()
-        # Only consider if bold or numbered heading (your heuristic)
-        if not (is_bold_line or looks_like_numbered_heading(stripped_line)):
-            offset += line_len
-            continue
+        headings.sort(key=lambda x: x[0])
+        return headings
 
-        # Remove numbering from start, trailing punctuation
-        text_no_num = re.sub(r"^\s*\d+(\.\d+)*\.?\s*", "", lowered).strip()
-        text_no_num = re.sub(r"[\:\.\-]+$", "", text_no_num).strip()
 
-        if len(text_no_num.split()) > 10:
-            offset += line_len
-            continue
+def find_line(text, line, start=0):
+    """Offset of `line` in `text` at or after `start`, where it stands on a line of its own; -1 if absent."""
+    pos = text.find(line, start)
+    while pos != -1:
+        line_start = text.rfind("\n", 0, pos) + 1
+        line_end = text.find("\n", pos + len(line))
+        line_end = len(text) if line_end == -1 else line_end
+        # Only whitespace may surround it on its line
+        if not text[line_start:pos].strip() and not text[pos + len(line):line_end].strip():
+            return pos
+        pos = text.find(line, pos + 1)
+    return -1
+
+
+DEFAULT_DETECTOR = HeadingDetector()
+
 
-        # Match using old regex for known headings
-        if HEADING_REGEX.match(text_no_num):
-            # Extract heading keyword only
-            match = HEADING_REGEX.match(text_no_num)
-            heading_word = match.group(1).lower()
-            headings.append((offset, offset + line_len, heading_word))
+def detect_headings_from_lines(text_lines, text=None, detector=None):
+    """
+    Detect headings from extracted PDF lines with font info.
 
-        offset += line_len
+    Args:
+        text_lines: list of PDFLines or tuples (page_num, y0, line_text, is_bold)
+        text: full text of the document, to place headings at their exact offsets
+        detector: HeadingDetector to use (e.g. with a custom vocabulary)
 
-    headings.sort(key=lambda x: x[0])
-    return headings
+    Returns:
+        List of (start_offset, end_offset, heading_name)
+    """
+    return (detector or DEFAULT_DETECTOR).detect(text_lines, text)
 
 def chunk_text_by_headings(text, headings):
     """
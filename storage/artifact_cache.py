@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SMARTSCHOLAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "smartscholar", "artifacts")
+)
+DEFAULT_MAX_BYTES = int(os.environ.get("SMARTSCHOLAR_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+# Eviction frees space down to this share of the cap, so a full cache is not pruned on every save
+EVICTION_TARGET = 0.9
+
+
+def hash_pdf(pdf_bytes) -> str:
+    """Content hash identifying a PDF regardless of its file name."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def hash_pdf_file(path, block_size=1 << 20) -> str:
+    """hash_pdf of a file on disk, read in blocks instead of loading it whole."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_name(kind: str, config=None) -> str:
+    """
+    Name of an artifact file within a document's entry.
+
+    The config (model names, chunk sizes, ...) is folded into the name so a change
+    of model or settings never serves a stale artifact.
+    """
+    payload = json.dumps({"version": CACHE_VERSION, "config": config or {}}, sort_keys=True, default=str)
+    return f"{kind}-{hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]}"
+
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk cache of per-PDF artifacts.
+
+    Each PDF gets one directory named after its hash holding extracted text, chunk
+    lists (JSON), embedding matrices (.npy, loaded memory-mapped) and summaries.
+    Whole documents are evicted least-recently-used first once the cache grows past
+    `max_bytes`. The size is tracked as a running total, so saves only list the cache
+    directory once the total passes the cap. One instance is shared by the app's
+    sessions; the total and the hit counters are updated under a lock.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size_bytes = self.size_bytes()
+
+    def _entry_dir(self, doc_hash):
+        return os.path.join(self.root, doc_hash)
+
+    def _path(self, doc_hash, kind, config, ext):
+        return os.path.join(self._entry_dir(doc_hash), artifact_name(kind, config) + ext)
+
+    def _touch(self, doc_hash):
+        try:
+            os.utime(self._entry_dir(doc_hash))
+        except OSError:
+            pass
+
+    def _lookup(self, path, doc_hash):
+        found = os.path.exists(path)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if found:
+            self._touch(doc_hash)
+        return found
+
+    def _write(self, doc_hash, path, write_fn):
+        entry_dir = self._entry_dir(doc_hash)
+        os.makedirs(entry_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write_fn(f)
+            # The size of the replaced file is read and the new one swapped in under one lock,
+            # so concurrent saves of the same artifact do not both subtract the old size
+            with self._lock:
+                replaced = os.path.getsize(path) if os.path.exists(path) else 0
+                os.replace(tmp_path, path)
+                self._size_bytes += os.path.getsize(path) - replaced
+                over_budget = self._size_bytes > self.max_bytes
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._touch(doc_hash)
+        if over_budget:
+            self.evict(keep=doc_hash)
+
+    def load_text(self, doc_hash, kind, config=None):
+        path = self._path(doc_hash, kind, config, ".txt")
+        if not self._lookup(path, doc_hash):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def save_text(self, doc_hash, kind, text, config=None):
+        path = self._path(doc_hash, kind, config, ".txt")
+        self._write(doc_hash, path, lambda f: f.write(text.encode("utf-8")))
+
+    def load_json(self, doc_hash, kind, config=None):
+        path = self._path(doc_hash, kind, config, ".json")
+        if not self._lookup(path, doc_hash):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_json(self, doc_hash, kind, value, config=None):
+        path = self._path(doc_hash, kind, config, ".json")
+        self._write(doc_hash, path, lambda f: f.write(json.dumps(value).encode("utf-8")))
+
+    def load_array(self, doc_hash, kind, config=None, mmap=True):
+        path = self._path(doc_hash, kind, config, ".npy")
+        if not self._lookup(path, doc_hash):
+            return None
+        return np.load(path, mmap_mode="r" if mmap else None)
+
+    def save_array(self, doc_hash, kind, array, config=None):
+        path = self._path(doc_hash, kind, config, ".npy")
+        self._write(doc_hash, path, lambda f: np.save(f, np.asarray(array)))
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, name)
+            if not os.path.isdir(entry_dir):
+                continue
+            size = 0
+            for file_name in os.listdir(entry_dir):
+                try:
+                    size += os.path.getsize(os.path.join(entry_dir, file_name))
+                except OSError:
+                    pass
+            entries.append((os.path.getmtime(entry_dir), name, size))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used documents until the cache is back under EVICTION_TARGET
+        of max_bytes (if it is over max_bytes at all). Re-counts the cache from disk, since
+        other processes may share it.
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, _, size in entries)
+            target = self.max_bytes * EVICTION_TARGET if total > self.max_bytes else self.max_bytes
+            for _, name, size in entries:
+                if total <= target:
+                    break
+                if name == keep:
+                    continue
+                logging.info(f"Evicting cached artifacts for document {name[:12]} ({size} bytes).")
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                total -= size
+            self._size_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size_bytes": self._size_bytes}
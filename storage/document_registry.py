@@ -0,0 +1,184 @@
+"""
+Process-wide registry of per-document state shared by every session of the app.
+
+A document's in-memory values (extracted text, page count, retriever, ...) are built
+once per PDF hash and shared by all sessions that have the PDF open. Sessions hold a
+reference to at most one document; a session that has not been seen for
+`session_ttl` seconds is treated as gone. Documents no session references are kept
+for reuse until the registry grows past `max_bytes`, then evicted least recently
+used first; `on_evict(doc_hash)` lets caches keyed by document drop it too.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from instrumentation.metrics import metrics
+
+DEFAULT_MAX_BYTES = int(os.environ.get("SMARTSCHOLAR_REGISTRY_MAX_BYTES", 1024 ** 3))
+DEFAULT_SESSION_TTL = float(os.environ.get("SMARTSCHOLAR_SESSION_TTL", 30 * 60))
+
+
+def estimate_nbytes(value) -> int:
+    """Approximate memory held by a value; objects can report their own via memory_bytes()."""
+    if hasattr(value, "memory_bytes"):
+        return value.memory_bytes()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class DocumentEntry:
+    """In-memory values of one PDF, shared by the sessions that have it open."""
+
+    def __init__(self, doc_hash):
+        self.doc_hash = doc_hash
+        self.values = {}
+        self.sizes = {}
+        self.sessions = set()
+        self.last_used = time.monotonic()
+        # One lock per value name, so building one value (e.g. the retriever) never holds up another (the text)
+        self._build_locks = {}
+        self._build_locks_lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(self.sizes.values())
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def build_lock(self, name) -> threading.Lock:
+        with self._build_locks_lock:
+            return self._build_locks.setdefault(name, threading.Lock())
+
+
+class DocumentRegistry:
+    """
+    Reference-counted, memory-bounded map from PDF hash to DocumentEntry.
+
+    Call open() on every rerun of a session (it also keeps the session alive) and
+    close() when the session drops its upload. Values are added with get_or_build().
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, session_ttl=DEFAULT_SESSION_TTL, on_evict=None):
+        self.max_bytes = max_bytes
+        self.session_ttl = session_ttl
+        self.on_evict = on_evict
+        self.entries = OrderedDict()  # doc_hash -> DocumentEntry, least recently used first
+        self.sessions = {}  # session_id -> (doc_hash, last seen)
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def open(self, session_id, doc_hash) -> DocumentEntry:
+        """
+        The entry for `doc_hash`, referenced by `session_id`. A session that had another
+        document open releases it, so replacing an upload never keeps the old one alive.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire_sessions(now)
+            previous = self.sessions.get(session_id)
+            if previous is not None and previous[0] != doc_hash:
+                self._detach(session_id, previous[0])
+
+            entry = self.entries.get(doc_hash)
+            if entry is None:
+                entry = self.entries[doc_hash] = DocumentEntry(doc_hash)
+            self.entries.move_to_end(doc_hash)
+            entry.sessions.add(session_id)
+            entry.last_used = now
+            self.sessions[session_id] = (doc_hash, now)
+            self._evict()
+        return entry
+
+    def close(self, session_id):
+        """Release the document a session has open, if any."""
+        with self._lock:
+            previous = self.sessions.pop(session_id, None)
+            if previous is not None:
+                self._detach(session_id, previous[0])
+            self._evict()
+
+    def get_or_build(self, entry, name, build):
+        """
+        The value `name` of a document, built with `build()` on first use. Sessions
+        asking for a value that is being built wait for that build instead of repeating it;
+        different values of a document are built concurrently.
+        """
+        if name in entry.values:
+            with self._lock:
+                self.hits += 1
+            return entry.values[name]
+
+        with entry.build_lock(name):
+            if name in entry.values:
+                with self._lock:
+                    self.hits += 1
+                return entry.values[name]
+            value = build()
+            size = estimate_nbytes(value)
+            with self._lock:
+                entry.values[name] = value
+                entry.sizes[name] = size
+                self.builds += 1
+                metrics.increment("document_registry_builds_total", kind=name)
+                total = self._evict()
+            if total > self.max_bytes:
+                # Only documents open in some session are left: the budget is exceeded until they are released
+                logging.warning(f"Open documents take {total / 1024 ** 2:.0f} MB, over the "
+                                f"{self.max_bytes / 1024 ** 2:.0f} MB registry budget.")
+        return value
+
+    def _detach(self, session_id, doc_hash):
+        entry = self.entries.get(doc_hash)
+        if entry is None:
+            return
+        entry.sessions.discard(session_id)
+        if not entry.sessions and not entry.values:
+            del self.entries[doc_hash]
+
+    def _expire_sessions(self, now):
+        for session_id, (doc_hash, last_seen) in list(self.sessions.items()):
+            if now - last_seen > self.session_ttl:
+                del self.sessions[session_id]
+                self._detach(session_id, doc_hash)
+
+    def _evict(self) -> int:
+        """Evict idle documents, least recently used first, until under budget; returns the bytes left."""
+        total = sum(entry.nbytes for entry in self.entries.values())
+        for doc_hash in list(self.entries):
+            if total <= self.max_bytes:
+                break
+            entry = self.entries[doc_hash]
+            if entry.sessions:
+                continue
+            total -= entry.nbytes
+            del self.entries[doc_hash]
+            self.evictions += 1
+            metrics.increment("document_registry_evictions_total")
+            logging.info(f"Evicted document {doc_hash[:12]} ({entry.nbytes / 1024 ** 2:.1f} MB) from the registry.")
+            if self.on_evict is not None:
+                self.on_evict(doc_hash)
+        return total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": len(self.entries),
+                "open_documents": sum(1 for entry in self.entries.values() if entry.sessions),
+                "sessions": len(self.sessions),
+                "bytes": sum(entry.nbytes for entry in self.entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
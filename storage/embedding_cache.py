@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_DISK_PATH = os.environ.get(
+    "SMARTSCHOLAR_EMBEDDING_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "smartscholar", "embeddings.sqlite")
+)
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get("SMARTSCHOLAR_EMBEDDING_CACHE_MAX_BYTES", 1024 ** 3))
+# Eviction frees space down to this share of the cap, so a full cache is not pruned on every write
+DISK_EVICTION_TARGET = 0.9
+SQL_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def embedding_key(model_name: str, text: str) -> str:
+    """Cache key for one text under one model; whitespace differences do not change the key."""
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embedding cache: an in-memory LRU, optionally backed by a size-bounded SQLite file.
+
+    Memory hits are served directly; disk hits are promoted to memory. Counters of
+    hits and misses are kept so the savings can be checked.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_path=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_bytes = 0  # running total of vector bytes on disk, so writes need not scan the table
+
+        if disk_path:
+            os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, last_access REAL)"
+            )
+            self._db.commit()
+            self._disk_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys) -> dict:
+        """Return {key: vector} for the keys found in memory or on disk."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+
+            missing = [key for key in keys if key not in found]
+            if missing and self._db is not None:
+                now = time.time()
+                for start in range(0, len(missing), SQL_BATCH_SIZE):
+                    batch = missing[start:start + SQL_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember(key, vector)
+                    self._db.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key, _ in rows]
+                    )
+                self._db.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, keys, vectors):
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+
+            if self._db is not None:
+                now = time.time()
+                rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in zip(keys, vectors)]
+                # Rows being replaced no longer count towards the total
+                keys = [key for key, _, _ in rows]
+                for start in range(0, len(keys), SQL_BATCH_SIZE):
+                    batch = keys[start:start + SQL_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    self._disk_bytes -= self._db.execute(
+                        f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchone()[0]
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+                self._disk_bytes += sum(len(blob) for _, blob, _ in rows)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+
+    def _evict_disk(self):
+        # Only runs once the running total passes the cap; re-count exactly, since other
+        # processes may share the file
+        total, count = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings").fetchone()
+        self._disk_bytes = total
+        if total <= self.max_disk_bytes or count == 0:
+            return
+        # Drop the least recently used rows until the store is back under the eviction target
+        excess_rows = int(count * (1 - DISK_EVICTION_TARGET * self.max_disk_bytes / total)) + 1
+        logging.info(f"Evicting {excess_rows} embeddings from the disk cache.")
+        freed = self._db.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access LIMIT ?) "
+            "RETURNING LENGTH(vector)",
+            (excess_rows,),
+        ).fetchall()
+        self._db.commit()
+        self._disk_bytes -= sum(length for length, in freed)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self._disk_bytes,
+        }
@@ -0,0 +1,122 @@
+import logging
+from contextlib import contextmanager
+from instrumentation.metrics import record_tokens, span
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MIN_LENGTH = 30
+DEFAULT_MAX_LENGTH = 100
+# Token metrics label, shared with the inference service's summarizer
+TOKEN_METRICS_MODEL = "summarizer"
+
+
+@contextmanager
+def torch_threads(num_threads):
+    """Temporarily set the number of intra-op threads torch uses on CPU."""
+    if not num_threads:
+        yield
+        return
+
+    import torch
+
+    previous = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def _is_raw_pipeline(summarizer) -> bool:
+    """
+    Whether `summarizer` is a HuggingFace pipeline whose model summarize_chunks calls
+    itself; a ServiceSummarizer counts tokens through its service, and stubs have no model.
+    """
+    return not hasattr(summarizer, "service") and all(
+        getattr(summarizer, name, None) is not None for name in ("model", "tokenizer")
+    )
+
+
+def _generate(summarizer, texts, min_length, max_length):
+    """
+    Summarize a batch with the pipeline's model and tokenizer, as the pipeline itself
+    would (task prefix and generation defaults, truncation, padding to the batch).
+
+    Returns (summaries, tokens_in, tokens_out), the counts read from the attention mask
+    and generated ids of this one tokenization, rather than by tokenizing texts and
+    summaries again.
+    """
+    tokenizer, model = summarizer.tokenizer, summarizer.model
+    prefix = getattr(summarizer, "prefix", None) or getattr(model.config, "prefix", None) or ""
+    # The pipeline's generation config already holds the task parameters; without one, apply them here
+    generation_config = getattr(summarizer, "generation_config", None)
+    generate_kwargs = {}
+    if generation_config is None:
+        generate_kwargs = dict((model.config.task_specific_params or {}).get("summarization", {}))
+        generate_kwargs.pop("prefix", None)
+    generate_kwargs.update(min_length=min_length, max_length=max_length)
+
+    inputs = tokenizer([prefix + text for text in texts], padding=True, truncation=True, return_tensors="pt")
+    inputs.pop("token_type_ids", None)  # the pipeline drops them too: seq2seq models take none
+    outputs = model.generate(**inputs.to(model.device), generation_config=generation_config, **generate_kwargs)
+    summaries = tokenizer.batch_decode(outputs, skip_special_tokens=True, clean_up_tokenization_spaces=True)
+    tokens_in = int(inputs["attention_mask"].sum())
+    tokens_out = int((outputs != tokenizer.pad_token_id).sum())
+    return summaries, tokens_in, tokens_out
+
+
+def summarize_chunks(chunks, summarizer, batch_size=DEFAULT_BATCH_SIZE, num_threads=None,
+                     min_length=DEFAULT_MIN_LENGTH, max_length=DEFAULT_MAX_LENGTH, cancel_event=None, progress=None):
+    """
+    Summarize many chunks with batched forward passes.
+
+    Chunks are sorted by length so each batch pads to similar sizes, run through the
+    summarization pipeline `batch_size` at a time, and returned in their original order.
+
+    Args:
+        chunks (List[str]): Text chunks to summarize.
+        summarizer (callable): HuggingFace summarization pipeline.
+        batch_size (int): Number of chunks per forward pass.
+        num_threads (int | None): Torch CPU thread count to use, or None to leave it unchanged.
+        cancel_event (threading.Event | None): Checked between batches; once set, no further
+            batches are run and the chunks not yet summarized are left as None.
+        progress (callable | None): Called with the input positions of each batch once it is summarized.
+
+    Returns:
+        List[str]: One summary per chunk, in input order.
+    """
+    summaries = [None] * len(chunks)
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i].split()), reverse=True)
+    raw_pipeline = _is_raw_pipeline(summarizer)
+
+    with torch_threads(num_threads):
+        for start in range(0, len(order), batch_size):
+            if cancel_event is not None and cancel_event.is_set():
+                logging.info("Summarization cancelled.")
+                break
+            batch_indices = order[start:start + batch_size]
+            batch = [chunks[i] for i in batch_indices]
+            logging.info(
+                f"Summarizing batch {start // batch_size + 1}/{-(-len(order) // batch_size)} "
+                f"({len(batch)} chunks, up to {len(batch[0].split())} words)..."
+            )
+            with span("summarizer_batch", chunks=len(batch), words=sum(len(c.split()) for c in batch)) as attrs:
+                if raw_pipeline:
+                    # The pipeline only returns text; calling its model directly keeps the token ids for counting
+                    batch_summaries, tokens_in, tokens_out = _generate(summarizer, batch, min_length, max_length)
+                    attrs.update(tokens_in=tokens_in, tokens_out=tokens_out)
+                    record_tokens(TOKEN_METRICS_MODEL, tokens_in, tokens_out)
+                else:
+                    outputs = summarizer(
+                        batch,
+                        min_length=min_length,
+                        max_length=max_length,
+                        truncation=True,
+                        batch_size=len(batch),
+                    )
+                    batch_summaries = [(o[0] if isinstance(o, list) else o)["summary_text"] for o in outputs]
+            for i, summary in zip(batch_indices, batch_summaries):
+                summaries[i] = summary
+            if progress is not None:
+                progress(batch_indices)
+
+    return summaries
@@ -0,0 +1,143 @@
+"""
+Extractive sentence selection for the fast summary modes.
+
+Sentences of a section are ranked by centrality: TextRank over a lexical (TF-IDF
+cosine) sentence graph, blended with how close the retrieval chunk holding each
+sentence is to the section's mean chunk embedding. The embeddings are the ones
+already computed for retrieval, so ranking runs no model.
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from chatbot.lexical_index import tokenize
+from parser.chunker import SENTENCE_BREAK_REGEX
+
+WORD_REGEX = re.compile(r"\S+")
+# Shorter "sentences" are mostly captions, equation debris and reference fragments
+MIN_SENTENCE_WORDS = 6
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+# Share of a sentence's score taken from chunk embedding similarity (when embeddings are given)
+EMBEDDING_WEIGHT = 0.4
+
+
+def split_sentences(text, start=0, end=None):
+    """(start, end) character spans of the sentences in text[start:end]."""
+    end = len(text) if end is None else end
+    spans = []
+    sentence_start = start
+    for match in SENTENCE_BREAK_REGEX.finditer(text, start, end):
+        spans.append((sentence_start, match.start() + 1))
+        sentence_start = match.end()
+    if text[sentence_start:end].strip():
+        spans.append((sentence_start, end))
+    return [(s, e) for s, e in spans if len(text[s:e].split()) >= MIN_SENTENCE_WORDS]
+
+
+def textrank(similarity, damping=TEXTRANK_DAMPING, iterations=TEXTRANK_ITERATIONS, tol=1e-6):
+    """PageRank scores of a weighted, undirected sentence graph given as a similarity matrix."""
+    n = len(similarity)
+    weights = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other spread their weight uniformly
+    transition = np.where(weights > 0, similarity / np.maximum(weights, 1e-12), 1.0 / n)
+    scores = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * transition.T @ scores
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def lexical_similarity(sentences):
+    """Cosine similarity of TF-IDF vectors of the sentences, idf taken within the section."""
+    counts = [Counter(tokenize(sentence)) for sentence in sentences]
+    document_frequency = Counter(term for terms in counts for term in terms)
+    vocabulary = {term: i for i, term in enumerate(document_frequency)}
+    vectors = np.zeros((len(sentences), len(vocabulary)), dtype=np.float32)
+    for row, terms in enumerate(counts):
+        for term, tf in terms.items():
+            idf = math.log(len(sentences) / document_frequency[term]) + 1
+            vectors[row, vocabulary[term]] = (1 + math.log(tf)) * idf
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    return similarity
+
+
+class ChunkEmbeddings:
+    """Character spans of retrieval chunks in the document text, with their embeddings."""
+
+    def __init__(self, starts, ends, vectors):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.vectors = vectors
+
+    @classmethod
+    def locate(cls, text, chunks, vectors):
+        """
+        Find each chunk in the text, in order (chunks may overlap). Matching ignores
+        whitespace differences, so word chunks re-joined with single spaces are found too;
+        chunks that cannot be found are left out.
+        """
+        words = [(m.start(), m.end()) for m in WORD_REGEX.finditer(text)]
+        normalized = " ".join(text[start:end] for start, end in words)
+        # Offset in `normalized` of each word, to map matches back to the original text
+        word_offsets = np.cumsum([0] + [end - start + 1 for start, end in words[:-1]])
+        word_starts = np.array([start for start, _ in words], dtype=np.int64)
+
+        def original(position):
+            word = int(np.searchsorted(word_offsets, position, side="right")) - 1
+            return int(word_starts[word] + position - word_offsets[word])
+
+        starts, ends, rows = [], [], []
+        search_from = 0
+        for row, chunk in enumerate(chunks):
+            chunk = " ".join(chunk.split())
+            found = normalized.find(chunk, search_from) if chunk else -1
+            if found == -1:
+                continue
+            starts.append(original(found))
+            ends.append(original(found + len(chunk) - 1) + 1)
+            rows.append(row)
+            search_from = found + 1
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return cls(starts, ends, vectors[rows] if rows else vectors[:0])
+
+    def vectors_at(self, positions):
+        """Embedding of the chunk holding each character position (the latest-starting one where chunks overlap)."""
+        rows = np.searchsorted(self.starts, positions, side="right") - 1
+        found = (rows >= 0) & (self.ends[np.maximum(rows, 0)] > positions)
+        return [self.vectors[row] if ok else None for row, ok in zip(rows, found)]
+
+
+def rank_sentences(text, start=0, end=None, chunk_embeddings=None, embedding_weight=EMBEDDING_WEIGHT):
+    """Sentence spans of text[start:end], most central first."""
+    spans = split_sentences(text, start, end)
+    if len(spans) <= 1:
+        return spans
+
+    scores = textrank(lexical_similarity([text[s:e] for s, e in spans]))
+    scores /= scores.max()
+    if chunk_embeddings is not None and len(chunk_embeddings.starts):
+        vectors = chunk_embeddings.vectors_at([s for s, _ in spans])
+        known = [v for v in vectors if v is not None]
+        if known:
+            centroid = np.mean(known, axis=0)
+            centroid /= max(np.linalg.norm(centroid), 1e-12)
+            closeness = np.array([float(v @ centroid) if v is not None else 0.0 for v in vectors])
+            spread = closeness.max() - closeness.min()
+            closeness = (closeness - closeness.min()) / spread if spread > 0 else np.ones_like(closeness)
+            scores = (1 - embedding_weight) * scores + embedding_weight * closeness
+
+    order = np.argsort(-scores, kind="stable")
+    return [spans[i] for i in order]
+
+
+def select_sentences(text, max_sentences, start=0, end=None, chunk_embeddings=None) -> str:
+    """The `max_sentences` most central sentences of text[start:end], in document order."""
+    top = sorted(rank_sentences(text, start, end, chunk_embeddings)[:max_sentences])
+    return " ".join(" ".join(text[s:e].split()) for s, e in top)
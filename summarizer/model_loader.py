@@ -1,4 +1,7 @@
-from transformers import pipeline
+from inference.backends import load_text2text_pipeline, resolve_backend
 
-def load_summarizer_model():
-    return pipeline("summarization", model="t5-small")
+SUMMARIZER_MODEL_NAME = "t5-small"
+
+def load_summarizer_model(model_name=SUMMARIZER_MODEL_NAME, backend=None):
+    """Summarization pipeline on the configured backend (torch, int8 or onnx)."""
+    return load_text2text_pipeline("summarization", model_name, resolve_backend("summarizer", backend))
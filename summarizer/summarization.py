@@ -1,44 +1,42 @@
 import re
-import fitz  
 import logging
-from io import BytesIO
-from parser.heading_detector import detect_headings_from_lines, chunk_text_by_headings
-from parser.chunker import chunk_large_section
+from typing import NamedTuple
+from extractor.pdf_document import PDFDocument, load_pdf_document
+from parser.heading_detector import DEFAULT_DETECTOR, detect_headings_from_lines, chunk_text_by_headings
+from parser.chunker import TokenChunker, chunk_large_section, token_budget
 from summarizer.utils import detect_image_only_pages, is_section_image_only
+from summarizer.batch_engine import DEFAULT_BATCH_SIZE, summarize_chunks
+from summarizer.extractive import select_sentences
+from storage.artifact_cache import hash_pdf
+from instrumentation.metrics import span
 
 
-def extract_lines_with_bold_info(doc):
-    text_lines = []
+# Sections readers look at first are summarized first when streaming (see iter_section_summaries)
+SECTION_PRIORITY = ("abstract", "introduction", "conclusion", "summary", "discussion", "result")
+IMAGE_ONLY_NOTICE = "⚠️ This section appears to contain mostly images and was skipped from summarization."
+# "full" summarizes every word; "fast" summarizes only each section's most central sentences;
+# "extractive" returns those sentences without running the model
+SUMMARY_MODES = ("full", "fast", "extractive")
+FAST_SUMMARY_SENTENCES = 8
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        blocks = page.get_text("dict")["blocks"]
-        for block in blocks:
-            if "lines" not in block:
-                continue
-            for line in block["lines"]:
-                spans = line["spans"]
-                if not spans:
-                    continue
-                line_text = "".join(span["text"] for span in spans).strip()
-                is_bold = any("bold" in span["font"].lower() or "demibold" in span["font"].lower() for span in spans)
-                y0 = line["bbox"][1]
-                if line_text:
-                    text_lines.append((page_num, y0, line_text, is_bold))
 
-    text_lines.sort(key=lambda x: (x[0], x[1]))
-    return text_lines
+class SectionSummary(NamedTuple):
+    position: int  # index of the section in document order
+    heading: str
+    text: str  # formatted "Heading:\nsummary\n\n" block
+    image_only: bool
 
 
-def summarize_section(text, summarizer, max_words=400):
-    chunks = chunk_large_section(text, max_words=max_words)
-    chunk_summaries = []
+def extract_lines_with_bold_info(doc):
+    """
+    Return the document's lines as (page_num, y0, line_text, is_bold) tuples, sorted by position.
+    """
+    return [(line.page_num, line.y0, line.text, line.is_bold) for line in doc.lines]
 
-    for i, chunk in enumerate(chunks, 1):
-        print(f" Summarizing chunk {i}/{len(chunks)} (words: {len(chunk.split())})...")
-        summary = summarizer(chunk, min_length=30, max_length=100)[0]['summary_text']
-        chunk_summaries.append(summary)
 
+def summarize_section(text, summarizer, max_words=400, batch_size=DEFAULT_BATCH_SIZE, num_threads=None):
+    chunks = chunk_large_section(text, max_words=max_words)
+    chunk_summaries = summarize_chunks(chunks, summarizer, batch_size=batch_size, num_threads=num_threads)
     return " ".join(chunk_summaries)
 
 
@@ -81,14 +79,178 @@ def polish_summary(summary: str) -> str:
     return summary
 
 
-def summarize_document(text, summarizer, pdf_bytes):
+def summary_chunker(summarizer, max_tokens=None):
+    """
+    TokenChunker that fills the summarizer's input: `max_tokens` (the tokenizer's
+    model_max_length by default) less the special tokens and the task prefix. None when the
+    summarizer has no fast tokenizer, in which case sections are chunked by words.
+    """
+    tokenizer = getattr(summarizer, "tokenizer", None)
+    if not getattr(tokenizer, "is_fast", False):
+        return None
+    # ServiceSummarizer keeps the prefix itself; a pipeline reads it from the model config
+    prefix = getattr(summarizer, "prefix", None)
+    if prefix is None:
+        prefix = getattr(getattr(summarizer, "model", None), "config", None)
+        prefix = getattr(prefix, "prefix", None) or ""
+    return TokenChunker(tokenizer, token_budget(tokenizer, max_tokens, prefix))
+
+
+def summary_cache_config(summarizer, max_words=400, heading_detector=None, chunker=None, mode="full",
+                         max_sentences=FAST_SUMMARY_SENTENCES, chunk_embeddings=None):
+    model = getattr(summarizer, "model", None)
+    config = {"model": getattr(model, "name_or_path", type(summarizer).__name__)}
+    if mode != "full":
+        config["mode"] = mode
+        config["max_sentences"] = max_sentences
+        config["embedding_ranking"] = chunk_embeddings is not None
+    if chunker is not None:
+        config.update(chunker.config())
+    else:
+        config["max_words"] = max_words
+    if heading_detector is not None and heading_detector.vocabulary != DEFAULT_DETECTOR.vocabulary:
+        config["headings"] = heading_detector.vocabulary
+    backend = getattr(summarizer, "inference_backend", "torch")
+    if backend != "torch":
+        config["backend"] = backend
+    return config
+
+
+def section_priority(heading: str) -> int:
+    """Rank of a heading in SECTION_PRIORITY (lower first); other sections keep document order after them."""
+    heading = heading.lower()
+    for rank, keyword in enumerate(SECTION_PRIORITY):
+        if keyword in heading:
+            return rank
+    return len(SECTION_PRIORITY)
+
+
+def format_section(heading, summary=None):
+    """The summary block for one section, or the image-only notice when `summary` is None."""
+    if summary is None:
+        return f"{heading.capitalize()}:\n{IMAGE_ONLY_NOTICE}\n\n"
+    return f"{heading.capitalize()}:\n{polish_summary(summary)}\n\n"
+
+
+def join_sections(section_summaries):
+    """The full summary text, with sections in document order."""
+    return "".join(s.text for s in sorted(section_summaries, key=lambda s: s.position)).strip()
+
+
+def plan_sections(text, pdf, max_words=400, heading_detector=None, chunker=None, mode="full",
+                  max_sentences=FAST_SUMMARY_SENTENCES, chunk_embeddings=None):
+    """
+    Split the document into sections and chunk them for summarization: by tokens with
+    `chunker` (the whole text is tokenized once), else by paragraphs of up to max_words words.
+
+    In the "fast" and "extractive" modes only the `max_sentences` most central sentences
+    of each section are kept (see summarizer.extractive; `chunk_embeddings` adds retrieval
+    embedding similarity to the ranking). Extractive sections are a single "chunk" holding
+    those sentences.
+
+    Returns:
+        List[Tuple[str, List[str] | None]]: (heading, chunks) per section in document
+        order; chunks is None for image-only sections. Empty sections are dropped.
+    """
+    doc = load_pdf_document(pdf)
+    with span("heading_detection", pages=len(doc)) as attrs:
+        image_only_pages = detect_image_only_pages(doc)
+        # PDFLines carry font sizes, so headings are also found by relative size, not only bold
+        headings = detect_headings_from_lines(doc.lines, text, detector=heading_detector)
+        sections = chunk_text_by_headings(text, headings)
+        attrs["sections"] = len(sections)
+
+    planned_sections = []
+    last_pos = 0
+
+    with span("chunking", tokens=chunker is not None) as attrs:
+        encoded = chunker.encode(text) if chunker is not None and mode == "full" else None
+        for heading, content in sections.items():
+            content = content.strip()
+            if not content:
+                logging.warning(f"Section '{heading}' is empty or contains no extractable text. Skipping.")
+                continue
+
+            start_pos = text.find(content, last_pos)
+            if start_pos == -1:
+                logging.warning(f"Could not locate content of section '{heading}' in the main text. Skipping.")
+                continue
+            end_pos = start_pos + len(content)
+            last_pos = end_pos
+
+            if is_section_image_only(start_pos, end_pos, [], image_only_pages, doc):
+                logging.warning(f"Section '{heading}' appears to contain mostly images. Skipping summarization.")
+                planned_sections.append((heading, None))
+                continue
+
+            if mode != "full":
+                selected = select_sentences(text, max_sentences, start_pos, end_pos, chunk_embeddings) or content
+                if mode == "extractive":
+                    chunks = [selected]
+                elif chunker is not None:
+                    chunks = chunker.chunk(selected)
+                else:
+                    chunks = chunk_large_section(selected, max_words=max_words)
+            elif chunker is not None:
+                chunks = chunker.chunk(text, encoded, start_pos, end_pos)
+            else:
+                chunks = chunk_large_section(content, max_words=max_words)
+            planned_sections.append((heading, chunks))
+        attrs["chunks"] = sum(len(chunks) for _, chunks in planned_sections if chunks)
+
+    return planned_sections
+
+
+def _summary_cache_key(summarizer, pdf, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings):
+    doc_hash = pdf.content_hash if isinstance(pdf, PDFDocument) else hash_pdf(pdf)
+    return doc_hash, summary_cache_config(
+        summarizer, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings
+    )
+
+
+def _summarize_chunks(chunks, summarizer, mode, progress=None, **kwargs):
+    """Chunk summaries from the model; extractive chunks are already the summary."""
+    if mode == "extractive":
+        if progress is not None:
+            progress(range(len(chunks)))
+        return list(chunks)
+    return summarize_chunks(chunks, summarizer, progress=progress, **kwargs)
+
+
+def _cache_store(cache, doc_hash, cache_config, section_summaries):
+    cache.save_json(doc_hash, "summary_sections", [list(s) for s in section_summaries], cache_config)
+    cache.save_text(doc_hash, "summary", join_sections(section_summaries), cache_config)
+
+
+def summarize_document(text, summarizer, pdf, max_words=400, batch_size=DEFAULT_BATCH_SIZE, num_threads=None,
+                       cache=None, heading_detector=None, max_tokens=None, mode="full",
+                       max_sentences=FAST_SUMMARY_SENTENCES, chunk_embeddings=None, progress=None):
     """
     Summarize a large text chunked by headings, skipping image-only or empty sections.
 
+    Chunks from every section are summarized together in length-sorted batches and
+    then regrouped by section before polishing.
+
     Args:
         text (str): Full text of the document.
         summarizer (callable): Function that summarizes a string input.
-        pdf_bytes (bytes): Raw PDF bytes.
+        pdf (bytes | PDFDocument): Raw PDF bytes or an already parsed PDFDocument.
+        max_words (int): Maximum words per chunk, for summarizers without a fast tokenizer.
+        batch_size (int): Number of chunks per forward pass.
+        num_threads (int | None): Torch CPU thread count used while summarizing.
+        cache (ArtifactCache | None): If given, a summary cached for this PDF and
+            summarizer config is returned without doing any work, and new summaries are stored.
+        heading_detector (HeadingDetector | None): Detector to split sections with, e.g. one
+            with a custom heading vocabulary.
+        max_tokens (int | None): Input token limit chunks are filled to (see summary_chunker);
+            defaults to the summarizer tokenizer's model_max_length.
+        mode (str): "full", "fast" (only the most central sentences of each section are
+            summarized) or "extractive" (those sentences are the summary; no model runs).
+        max_sentences (int): Sentences kept per section in the fast and extractive modes.
+        chunk_embeddings (ChunkEmbeddings | None): Retrieval chunk embeddings of the text,
+            used to rank sentences in the fast and extractive modes.
+        progress (callable | None): Called as progress(sections_done, total_sections) before
+            summarizing and whenever the last chunk of a section is summarized.
 
     Returns:
         str: Polished concatenated summary of all text sections.
@@ -96,41 +258,134 @@ def summarize_document(text, summarizer, pdf_bytes):
 
     logging.basicConfig(level=logging.INFO)
 
-    pdf_stream = BytesIO(pdf_bytes)
-    doc = fitz.open(stream=pdf_stream, filetype="pdf")
-    image_only_pages = detect_image_only_pages(doc)
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}; expected one of {', '.join(SUMMARY_MODES)}.")
+    chunker = summary_chunker(summarizer, max_tokens)
+    if cache is not None:
+        doc_hash, cache_config = _summary_cache_key(
+            summarizer, pdf, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings
+        )
+        cached_summary = cache.load_text(doc_hash, "summary", cache_config)
+        if cached_summary is not None:
+            logging.info("Using cached summary.")
+            return cached_summary
+
+    planned_sections = plan_sections(
+        text, pdf, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings
+    )
+
+    # Range of each section's chunks in all_chunks; None for image-only sections
+    all_chunks = []
+    chunk_ranges = []
+    for heading, chunks in planned_sections:
+        if chunks is None:
+            chunk_ranges.append(None)
+            continue
+        chunk_ranges.append(range(len(all_chunks), len(all_chunks) + len(chunks)))
+        all_chunks.extend(chunks)
+
+    # Chunks left per section: batches are length-sorted, so sections finish in any order
+    remaining = [len(r) if r is not None else 0 for r in chunk_ranges]
+    section_of = [section for section, r in enumerate(chunk_ranges) if r is not None for _ in r]
+
+    def on_batch(indices):
+        for i in indices:
+            remaining[section_of[i]] -= 1
+        progress(remaining.count(0), len(remaining))
+
+    if progress is not None:
+        progress(remaining.count(0), len(remaining))
+
+    logging.info(f"Summarizing {len(all_chunks)} chunks across {len(planned_sections)} sections...")
+    with span("summarization", chunks=len(all_chunks), words=sum(len(c.split()) for c in all_chunks)):
+        chunk_summaries = _summarize_chunks(
+            all_chunks, summarizer, mode, on_batch if progress else None, batch_size=batch_size, num_threads=num_threads
+        )
+
+    section_summaries = []
+    for position, ((heading, _), chunk_range) in enumerate(zip(planned_sections, chunk_ranges)):
+        if chunk_range is None:
+            section_summaries.append(SectionSummary(position, heading, format_section(heading), True))
+            continue
+        summary = " ".join(chunk_summaries[i] for i in chunk_range)
+        section_summaries.append(SectionSummary(position, heading, format_section(heading, summary), False))
 
-    text_lines = extract_lines_with_bold_info(doc)
-    headings = detect_headings_from_lines(text_lines)
-    sections = chunk_text_by_headings(text, headings)
+    if cache is not None and doc_hash:
+        _cache_store(cache, doc_hash, cache_config, section_summaries)
+    return join_sections(section_summaries)
 
-    final_summary = []
-    last_pos = 0
 
-    for heading, content in sections.items():
-        content = content.strip()
-        if not content:
-            logging.warning(f"Section '{heading}' is empty or contains no extractable text. Skipping.")
-            continue
+def iter_section_summaries(text, summarizer, pdf, max_words=400, batch_size=DEFAULT_BATCH_SIZE, num_threads=None,
+                           cache=None, cancel_event=None, heading_detector=None, max_tokens=None, mode="full",
+                           max_sentences=FAST_SUMMARY_SENTENCES, chunk_embeddings=None, progress=None):
+    """
+    Generator form of summarize_document that yields each section as soon as it is ready.
 
-        start_pos = text.find(content, last_pos)
-        if start_pos == -1:
-            logging.warning(f"Could not locate content of section '{heading}' in the main text. Skipping.")
-            continue
-        end_pos = start_pos + len(content)
-        last_pos = end_pos
-
-        if is_section_image_only(start_pos, end_pos, [], image_only_pages, doc):
-            logging.warning(f"Section '{heading}' appears to contain mostly images. Skipping summarization.")
-            final_summary.append(
-                f"{heading.capitalize()}:\n⚠️ This section appears to contain mostly images and was skipped from summarization.\n\n"
-            )
-            continue
+    Sections are summarized one at a time in SECTION_PRIORITY order (abstract,
+    introduction and conclusion first, then the rest in document order), so the parts
+    readers care about most appear within seconds. Image-only sections are yielded as
+    their notice straight away. Use join_sections() on the yielded items for the
+    full summary in document order.
 
-        logging.info(f"Summarizing section '{heading}'...")
-        summary = summarize_section(content, summarizer)
-        polished_summary = polish_summary(summary)
-        final_summary.append(f"{heading.capitalize()}:\n{polished_summary}\n\n")  
+    Setting `cancel_event` (or closing the generator) stops after the current batch of
+    chunks; a cancelled run is not cached. The mode options are those of summarize_document.
+    `progress`, if given, is called as progress(sections_done, total_sections) once the
+    sections are planned and after each one is yielded.
 
-    return "".join(final_summary).strip()
+    Yields:
+        SectionSummary: One per section, in priority order.
+    """
+    logging.basicConfig(level=logging.INFO)
 
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode!r}; expected one of {', '.join(SUMMARY_MODES)}.")
+    chunker = summary_chunker(summarizer, max_tokens)
+    doc_hash = cache_config = None
+    if cache is not None:
+        doc_hash, cache_config = _summary_cache_key(
+            summarizer, pdf, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings
+        )
+        cached_sections = cache.load_json(doc_hash, "summary_sections", cache_config)
+        if cached_sections is not None:
+            logging.info("Using cached summary.")
+            cached_sections = [SectionSummary(*s) for s in cached_sections]
+            ordered = sorted(cached_sections, key=lambda s: (section_priority(s.heading), s.position))
+            for done, section in enumerate(ordered, 1):
+                yield section
+                if progress is not None:
+                    progress(done, len(ordered))
+            return
+
+    planned_sections = plan_sections(
+        text, pdf, max_words, heading_detector, chunker, mode, max_sentences, chunk_embeddings
+    )
+    order = sorted(range(len(planned_sections)), key=lambda i: (section_priority(planned_sections[i][0]), i))
+    if progress is not None:
+        progress(0, len(order))
+
+    section_summaries = []
+    for position in order:
+        if cancel_event is not None and cancel_event.is_set():
+            logging.info(f"Summarization cancelled after {len(section_summaries)} of {len(order)} sections.")
+            return
+
+        heading, chunks = planned_sections[position]
+        if chunks is None:
+            section = SectionSummary(position, heading, format_section(heading), True)
+        else:
+            with span("summarization", section=heading, chunks=len(chunks)):
+                chunk_summaries = _summarize_chunks(
+                    chunks, summarizer, mode, batch_size=batch_size, num_threads=num_threads, cancel_event=cancel_event
+                )
+            if None in chunk_summaries:
+                logging.info(f"Summarization cancelled in section '{heading}'.")
+                return
+            section = SectionSummary(position, heading, format_section(heading, " ".join(chunk_summaries)), False)
+
+        section_summaries.append(section)
+        yield section
+        if progress is not None:
+            progress(len(section_summaries), len(order))
+
+    if cache is not None and doc_hash:
+        _cache_store(cache, doc_hash, cache_config, section_summaries)
@@ -0,0 +1,26 @@
+"""Shared fixtures: tiny randomly initialized models, so the tests run offline."""
+import pytest
+
+from benchmarks.stubs import save_tiny_sentence_encoder, tiny_t5_pipeline
+from instrumentation.metrics import metrics
+
+
+@pytest.fixture(scope="session")
+def tiny_t5():
+    return tiny_t5_pipeline()
+
+
+@pytest.fixture(scope="session")
+def tiny_encoder_path(tmp_path_factory):
+    return save_tiny_sentence_encoder(str(tmp_path_factory.mktemp("tiny-encoder")))
+
+
+@pytest.fixture
+def token_counters():
+    """Returns a function reading the model_* counters of one model label."""
+    def read(model):
+        return {
+            name: value for (name, labels), value in metrics.counters.items()
+            if name.startswith("model_") and dict(labels).get("model") == model
+        }
+    return read
@@ -0,0 +1,57 @@
+import numpy as np
+
+from chatbot.answer_cache import AnswerCache
+from storage.document_registry import DocumentRegistry
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_duplicate_question_with_same_chunks_hits():
+    cache = AnswerCache(similarity_threshold=0.9)
+    cache.put("doc", "model", "What is X?", unit(1, 0), [1, 2], "X is Y.")
+    assert cache.get("doc", "model", unit(1, 0.1), [2, 1]) == "X is Y."
+    assert cache.get("doc", "model", unit(1, 0.1), [1, 3]) is None
+    assert cache.get("doc", "model", unit(0, 1), [1, 2]) is None
+
+
+def test_lookups_do_not_create_namespaces():
+    cache = AnswerCache()
+    for i in range(100):
+        assert cache.get(f"doc{i}", "model", unit(1, 0), [1]) is None
+    assert cache.stats()["documents"] == 0
+    assert cache.stats()["misses"] == 100
+
+
+def test_namespaces_are_capped_least_recently_used_first():
+    cache = AnswerCache(max_documents=2)
+    cache.put("a", "model", "q", unit(1, 0), [1], "A")
+    cache.put("b", "model", "q", unit(1, 0), [1], "B")
+    assert cache.get("a", "model", unit(1, 0), [1]) == "A"
+    cache.put("c", "model", "q", unit(1, 0), [1], "C")
+    assert set(cache.namespaces) == {("a", "model"), ("c", "model")}
+
+
+def test_switching_models_drops_the_previous_models_answers():
+    cache = AnswerCache()
+    cache.switch_model("old")
+    cache.put("doc", "old", "q", unit(1, 0), [1], "old answer")
+    cache.switch_model("old")
+    assert cache.get("doc", "old", unit(1, 0), [1]) == "old answer"
+    cache.switch_model("new")
+    assert cache.stats()["documents"] == 0
+
+
+def test_registry_eviction_invalidates_the_documents_answers():
+    cache = AnswerCache()
+    registry = DocumentRegistry(max_bytes=1000, on_evict=lambda doc_hash: cache.invalidate(doc_id=doc_hash))
+    for doc_hash in ("old", "new"):
+        entry = registry.open("s1", doc_hash)
+        registry.get_or_build(entry, "embeddings", lambda: np.zeros(200, dtype=np.float32))
+        cache.put(doc_hash, "model", "q", unit(1, 0), [1], doc_hash)
+    registry.close("s1")
+    assert registry.evictions == 1
+    assert cache.get("old", "model", unit(1, 0), [1]) is None
+    assert cache.get("new", "model", unit(1, 0), [1]) == "new"
@@ -0,0 +1,32 @@
+import threading
+
+import numpy as np
+
+from storage.artifact_cache import ArtifactCache
+
+
+def test_running_total_matches_disk_under_concurrent_saves(tmp_path):
+    cache = ArtifactCache(root=str(tmp_path), max_bytes=1024 ** 3)
+
+    def save(worker):
+        for i in range(50):
+            # Half the saves replace an artifact another thread is also writing
+            cache.save_array(f"doc{i % 5}", "embeddings", np.zeros(worker * 10 + i, dtype=np.float32))
+            cache.save_text(f"doc{worker}", f"text{i}", "x" * i)
+
+    threads = [threading.Thread(target=save, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.stats()["size_bytes"] == cache.size_bytes()
+
+
+def test_saves_past_the_cap_evict_least_recently_used(tmp_path):
+    cache = ArtifactCache(root=str(tmp_path), max_bytes=10_000)
+    for i in range(4):
+        cache.save_text(f"doc{i}", "text", "x" * 4000)
+    assert cache.load_text("doc0", "text") is None
+    assert cache.load_text("doc3", "text") == "x" * 4000
+    assert cache.stats()["size_bytes"] == cache.size_bytes() <= 10_000
@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+import pytest
+
+import batch_summarize
+from batch_summarize import process_pdf, read_chunks
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from chatbot.embedder import Embedder
+from storage.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    options = {
+        "output_dir": str(tmp_path), "summarize": True, "embed": True, "batch_size": 4, "threads": 1,
+        "chunk_tokens": 64, "chunk_overlap": 8, "summary_mode": "extractive",
+    }
+    (tmp_path / batch_summarize.EMBEDDINGS_DIR).mkdir()
+    monkeypatch.setattr(batch_summarize, "_worker", {"options": options})
+    return batch_summarize._worker
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(make_synthetic_pdf(6))
+    return str(path)
+
+
+def test_chunk_texts_go_to_a_sidecar_file(worker, pdf_path, tiny_encoder_path, tmp_path):
+    worker["embedder"] = Embedder(model_name=tiny_encoder_path, cache=EmbeddingCache())
+    record = process_pdf(pdf_path)
+
+    assert "error" not in record, record.get("error")
+    assert isinstance(record["chunks"], int) and record["chunks"] > 0
+    chunks = read_chunks(tmp_path / record["chunks_path"])
+    embeddings = np.load(tmp_path / record["embeddings_path"])
+    assert len(chunks) == record["chunks"] == embeddings.shape[0]
+    assert record["summary"]
+    json.dumps(record)
+
+
+def test_model_load_failure_is_the_documents_error(worker, pdf_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("model not found")
+
+    monkeypatch.setattr("chatbot.embedder.Embedder", fail)
+    record = process_pdf(pdf_path)
+    assert record["error"] == "OSError: model not found"
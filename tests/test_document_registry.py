@@ -0,0 +1,89 @@
+import threading
+import time
+
+import numpy as np
+
+from storage.document_registry import DocumentRegistry
+
+
+def test_sessions_share_one_build():
+    registry = DocumentRegistry()
+    builds = []
+    first = registry.open("s1", "doc")
+    second = registry.open("s2", "doc")
+    assert first is second
+    assert registry.get_or_build(first, "text", lambda: builds.append(1) or "text") == "text"
+    assert registry.get_or_build(second, "text", lambda: builds.append(1) or "other") == "text"
+    assert len(builds) == 1
+
+
+def test_concurrent_requests_wait_for_the_build_in_progress():
+    registry = DocumentRegistry()
+    entry = registry.open("s1", "doc")
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)
+        return "retriever"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get_or_build(entry, "retriever", build)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["retriever"] * 4
+    assert len(builds) == 1
+
+
+def test_different_values_build_concurrently():
+    registry = DocumentRegistry()
+    entry = registry.open("s1", "doc")
+    retriever_started, release = threading.Event(), threading.Event()
+
+    def build_retriever():
+        retriever_started.set()
+        release.wait(5)
+        return "retriever"
+
+    thread = threading.Thread(target=registry.get_or_build, args=(entry, "retriever", build_retriever))
+    thread.start()
+    retriever_started.wait(5)
+    started = time.monotonic()
+    # The text must not wait for the retriever build still running
+    assert registry.get_or_build(entry, "text", lambda: "text") == "text"
+    assert time.monotonic() - started < 1
+    release.set()
+    thread.join()
+
+
+def test_idle_documents_are_evicted_least_recently_used_first():
+    registry = DocumentRegistry(max_bytes=2500)
+    for doc in ("a", "b", "c"):
+        entry = registry.open("s1", doc)  # opening the next document releases the previous one
+        registry.get_or_build(entry, "vectors", lambda: np.zeros(1000, dtype=np.uint8))
+    assert set(registry.entries) == {"b", "c"}
+    assert registry.stats()["evictions"] == 1
+
+
+def test_open_documents_are_not_evicted():
+    registry = DocumentRegistry(max_bytes=500)
+    entry = registry.open("s1", "a")
+    registry.get_or_build(entry, "vectors", lambda: np.zeros(1000, dtype=np.uint8))
+    assert "a" in registry.entries
+    registry.close("s1")
+    assert "a" not in registry.entries
+
+
+def test_expired_sessions_release_their_document():
+    registry = DocumentRegistry(max_bytes=500, session_ttl=0.05)
+    entry = registry.open("s1", "a")
+    registry.get_or_build(entry, "vectors", lambda: np.zeros(1000, dtype=np.uint8))
+    time.sleep(0.1)
+    registry.open("s2", "b")  # any open() expires idle sessions
+    assert "a" not in registry.entries
+    assert registry.stats()["sessions"] == 1
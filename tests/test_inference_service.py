@@ -0,0 +1,14 @@
+from inference.service import ServiceSummarizer
+
+
+def test_service_summarizer_batches_under_beam_search(tiny_t5):
+    # t5-small's settings use num_beams=4: the cancel criterion must cover every beam of every request
+    summarizer = ServiceSummarizer(tiny_t5, max_wait_ms=200)
+    try:
+        texts = [" ".join(f"w{3 + i % 50}" for i in range(40)), " ".join(f"w{60 + i % 40}" for i in range(25))]
+        outputs = summarizer(texts, min_length=5, max_length=12)
+        assert len(outputs) == 2
+        assert all(isinstance(output["summary_text"], str) for output in outputs)
+        assert summarizer.service.stats()["mean_batch_size"] > 1
+    finally:
+        summarizer.service.close()
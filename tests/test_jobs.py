@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from inference.jobs import CANCELLED, DONE, FAILED, JobExecutor
+from instrumentation.metrics import metrics, trace
+
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+    return job
+
+
+def count_to(job, n, release=None):
+    for i in range(n):
+        if release is not None:
+            release.wait(5)
+        job.check_cancelled()
+        job.report(i + 1, n, f"step {i + 1}")
+        job.publish(i)
+    return n
+
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+def test_result_progress_and_partial_results(executor):
+    job = wait_finished(executor.submit("key", count_to, 3))
+    assert job.status == DONE
+    assert job.result == 3
+    assert job.partial() == [0, 1, 2]
+    assert (job.done, job.total, job.message, job.fraction) == (3, 3, "step 3", 1.0)
+
+
+def test_live_jobs_are_deduplicated(executor):
+    release = threading.Event()
+    first = executor.submit("key", count_to, 3, release, owner="s1")
+    second = executor.submit("key", count_to, 3, release, owner="s2")
+    assert first is second
+    assert first.owners == {"s1", "s2"}
+    release.set()
+    wait_finished(first)
+    # A finished job is not reused: the next submission runs again
+    assert executor.submit("key", count_to, 1) is not first
+
+
+def test_job_stops_only_when_every_owner_cancels(executor):
+    release = threading.Event()
+    job = executor.submit("key", count_to, 100, release, owner="s1")
+    executor.submit("key", count_to, 100, release, owner="s2")
+    executor.cancel(job.job_id, owner="s1")
+    assert not job.cancel_event.is_set()
+    executor.cancel(job.job_id, owner="s2")
+    release.set()
+    assert wait_finished(job).status == CANCELLED
+    assert len(job.partial()) < 100
+
+
+def test_cancelled_queued_job_never_runs():
+    executor = JobExecutor(max_workers=1)
+    try:
+        release = threading.Event()
+        blocker = executor.submit("blocker", count_to, 1, release)
+        ran = []
+        queued = executor.submit("queued", lambda job: ran.append(1))
+        executor.cancel(queued.job_id)
+        release.set()
+        wait_finished(blocker)
+        assert wait_finished(queued).status == CANCELLED
+        assert ran == []
+    finally:
+        executor.shutdown()
+
+
+def test_failures_are_reported(executor):
+    job = wait_finished(executor.submit("key", lambda job: 1 / 0))
+    assert job.status == FAILED
+    assert job.error.startswith("ZeroDivisionError")
+
+
+def test_finished_jobs_are_pruned_oldest_first():
+    executor = JobExecutor(max_workers=1, max_finished=2)
+    try:
+        jobs = [wait_finished(executor.submit(i, count_to, 1)) for i in range(4)]
+        assert executor.get(jobs[0].job_id) is None
+        assert [executor.get(job.job_id) for job in jobs[2:]] == jobs[2:]
+    finally:
+        executor.shutdown()
+
+
+def test_spans_keep_the_submitting_trace(executor):
+    with trace("session-1"):
+        wait_finished(executor.submit("key", count_to, 1, kind="summary"))
+    spans = metrics.recent_spans(trace_id="session-1")
+    assert any(span["name"] == "job" and span["kind"] == "summary" for span in spans)
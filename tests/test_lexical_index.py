@@ -0,0 +1,46 @@
+import random
+
+from benchmarks.stubs import StubEmbedder
+from chatbot.lexical_index import LexicalIndex
+from chatbot.rag_pipeline import RAGPipeline
+
+RELEVANCE_THRESHOLD = 0.30  # main.RELEVANCE_THRESHOLD
+
+
+def make_chunks(count=50, seed=0):
+    """Chunks of 20 distinct filler words, each also mentioning "method"."""
+    rng = random.Random(seed)
+    return [" ".join(["method"] + [f"filler{rng.randrange(10 ** 6)}" for _ in range(20)]) for _ in range(count)]
+
+
+def test_ubiquitous_term_cannot_pass_hybrid_relevance_gate():
+    chunks = make_chunks()
+    retriever = RAGPipeline(StubEmbedder(), threshold=RELEVANCE_THRESHOLD, top_k=5)
+    retriever.index_document(chunks)
+
+    _, lexical_scores = retriever.get_relevant_chunks("method", threshold=0.0, mode="lexical")
+    assert lexical_scores.max() < 0.05
+    # The query fails the gate on cosine similarity alone...
+    _, dense_scores = retriever.get_relevant_chunks("method", threshold=0.0, mode="dense")
+    assert dense_scores.max() < RELEVANCE_THRESHOLD
+    # ...and the shared ubiquitous term must not lift it over
+    chunk_ids, _ = retriever.get_relevant_chunks("method", mode="hybrid")
+    assert len(chunk_ids) == 0
+
+
+def test_rare_term_finds_its_chunk():
+    chunks = make_chunks()
+    index = LexicalIndex()
+    index.add(range(len(chunks)), chunks)
+    chunk_ids, scores = index.search(chunks[7].split()[3], top_k=5)
+    assert chunk_ids.tolist() == [7]
+    assert scores[0] > RELEVANCE_THRESHOLD
+
+
+def test_search_is_scoped_to_documents():
+    index = LexicalIndex()
+    index.add([0, 1], ["resnet-50 on cifar-10", "a transformer baseline"], doc_id="a")
+    index.add([2], ["resnet-50 again"], doc_id="b")
+    assert index.search("resnet-50", doc_ids=["b"])[0].tolist() == [2]
+    index.remove_document("b")
+    assert index.search("resnet-50")[0].tolist() == [0]
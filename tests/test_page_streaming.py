@@ -0,0 +1,19 @@
+import time
+
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from extractor.pdf_document import PDFDocument, iter_page_texts
+from instrumentation.metrics import metrics, trace
+
+
+def test_streamed_pages_match_the_document():
+    pdf_bytes = make_synthetic_pdf(5, seed=1)
+    assert list(iter_page_texts(pdf_bytes)) == PDFDocument.from_bytes(pdf_bytes).page_texts
+
+
+def test_each_page_is_timed_without_the_consumer():
+    with trace("page-streaming-test"):
+        for _ in iter_page_texts(make_synthetic_pdf(3, seed=1)):
+            time.sleep(0.1)
+    spans = [s for s in metrics.recent_spans(trace_id="page-streaming-test") if s["name"] == "page_extraction"]
+    assert [s["page"] for s in spans] == [0, 1, 2]
+    assert all(s["seconds"] < 0.1 for s in spans)
@@ -0,0 +1,35 @@
+import os
+import signal
+import time
+
+import pytest
+
+from benchmarks.synthetic_pdf import make_synthetic_pdf
+from extractor import parallel
+from extractor.parallel import PARALLEL_MIN_PAGES, extract_parallel
+from extractor.pdf_document import PDFDocument
+
+
+@pytest.fixture(scope="module")
+def pdf_bytes():
+    return make_synthetic_pdf(PARALLEL_MIN_PAGES, seed=3)
+
+
+def test_parallel_matches_sequential(pdf_bytes):
+    parallel_doc = extract_parallel(pdf_bytes, workers=2)
+    sequential_doc = PDFDocument.from_bytes(pdf_bytes)
+    assert parallel_doc.full_text == sequential_doc.full_text
+    assert parallel_doc.content_hash == sequential_doc.content_hash
+
+
+def test_recovers_after_worker_is_killed(pdf_bytes):
+    expected = extract_parallel(pdf_bytes, workers=2).full_text
+    pool = parallel._pool
+    # As an OOM kill would
+    os.kill(next(iter(pool._processes)), signal.SIGKILL)
+    time.sleep(0.5)
+
+    assert extract_parallel(pdf_bytes, workers=2).full_text == expected
+    assert parallel._pool is not pool
+    # The replacement pool keeps serving later documents
+    assert extract_parallel(pdf_bytes, workers=2).full_text == expected
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+from benchmarks.stubs import StubTokenizer, word_tokenizer
+from parser import chunker as chunker_module
+from parser.chunker import TokenChunker, token_budget
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    return word_tokenizer(256)
+
+
+def make_text(paragraphs=6, seed=0):
+    """Paragraphs of sentences of 4-12 vocabulary words (one token each), capitalized and ending in a period."""
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(
+            " ".join(f"w{rng.randrange(3, 256)}" for _ in range(rng.randrange(4, 13))).capitalize() + "."
+            for _ in range(rng.randrange(3, 9))
+        )
+        for _ in range(paragraphs)
+    )
+
+
+def count_tokens(tokenizer, text):
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def test_chunks_fit_the_budget_and_cover_the_text(tokenizer):
+    text = make_text()
+    chunks = TokenChunker(tokenizer, max_tokens=40).chunk(text)
+    assert len(chunks) > 1
+    assert all(count_tokens(tokenizer, chunk) <= 40 for chunk in chunks)
+    # Without overlap the chunks are the text, in order
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_chunks_end_at_sentence_boundaries_when_sentences_fit(tokenizer):
+    chunks = TokenChunker(tokenizer, max_tokens=40).chunk(make_text(seed=1))
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+
+def test_overlap_repeats_whole_words(tokenizer):
+    chunks = TokenChunker(tokenizer, max_tokens=30, overlap_tokens=8).chunk(make_text(seed=2))
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        previous, current = previous.split(), current.split()
+        shared = max(k for k in range(len(current) + 1) if k == 0 or previous[-k:] == current[:k])
+        assert 0 < shared
+        assert count_tokens(tokenizer, " ".join(current[:shared])) <= 8
+
+
+def test_words_longer_than_the_budget_are_split(tokenizer):
+    text = " ".join(f"w{i}" for i in range(3, 103))  # one 100-token "sentence"
+    chunks = TokenChunker(tokenizer, max_tokens=16).chunk(text)
+    assert all(count_tokens(tokenizer, chunk) <= 16 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_sections_of_an_encoded_document(tokenizer):
+    text = make_text(seed=3)
+    chunker = TokenChunker(tokenizer, max_tokens=40)
+    start, end = text.index("\n\n") + 2, len(text) // 2
+    assert " ".join(chunker.chunk(text, chunker.encode(text), start, end)).split() == text[start:end].split()
+
+
+def test_iter_chunks_streams_across_page_boundaries(tokenizer, monkeypatch):
+    monkeypatch.setattr(chunker_module, "STREAM_BUFFER_CHARS", 200)
+    pages = [make_text(paragraphs=2, seed=seed) for seed in range(5)]
+    chunker = TokenChunker(tokenizer, max_tokens=40)
+    streamed = list(chunker.iter_chunks(pages))
+    assert all(count_tokens(tokenizer, chunk) <= 40 for chunk in streamed)
+    assert " ".join(streamed).split() == "\n".join(pages).split()
+
+
+def test_token_budget_leaves_room_for_special_tokens_and_prefix(tokenizer):
+    # The tokenizer appends </s>; "w3 w4" is a two-token prefix
+    assert token_budget(tokenizer, 100) == 99
+    assert token_budget(tokenizer, 100, prefix="w3 w4") == 97
+
+
+def test_rejects_slow_tokenizers_and_bad_overlap(tokenizer):
+    with pytest.raises(ValueError):
+        TokenChunker(StubTokenizer(), max_tokens=40)
+    with pytest.raises(ValueError):
+        TokenChunker(tokenizer, max_tokens=40, overlap_tokens=40)
@@ -0,0 +1,44 @@
+import numpy as np
+from transformers import pipeline
+
+from chatbot.embedder import Embedder
+from storage.embedding_cache import EmbeddingCache
+from summarizer.batch_engine import TOKEN_METRICS_MODEL, summarize_chunks
+
+
+def test_embedding_records_input_tokens_of_cache_misses(tiny_encoder_path, token_counters):
+    embedder = Embedder(model_name=tiny_encoder_path, cache=EmbeddingCache())
+    before = token_counters(embedder.model_key)
+    embedder.embed_texts(["w3 w4 w5", "w6 w7"])
+    embedder.embed_texts(["w3 w4 w5"])  # cache hit: no model call
+    after = token_counters(embedder.model_key)
+
+    # 3 + 2 words plus the </s> the tokenizer appends to each text
+    assert after["model_tokens_in_total"] - before.get("model_tokens_in_total", 0) == 7
+    assert after["model_calls_total"] - before.get("model_calls_total", 0) == 1
+
+
+def test_pipeline_summarization_records_tokens(tiny_t5, token_counters):
+    summarizer = pipeline("summarization", model=tiny_t5.model, tokenizer=tiny_t5.tokenizer)
+    before = token_counters(TOKEN_METRICS_MODEL)
+    summaries = summarize_chunks(["w3 w4 w5 w6 w7 w8", "w9 w10 w11"], summarizer, min_length=2, max_length=6)
+    after = token_counters(TOKEN_METRICS_MODEL)
+
+    assert all(isinstance(summary, str) for summary in summaries)
+    assert after["model_tokens_in_total"] - before.get("model_tokens_in_total", 0) >= 9 + 2
+    assert after["model_tokens_out_total"] - before.get("model_tokens_out_total", 0) > 0
+    assert after["model_calls_total"] - before.get("model_calls_total", 0) == 1
+
+
+def test_embeddings_match_sentence_transformers_encode(tiny_encoder_path):
+    embedder = Embedder(model_name=tiny_encoder_path, cache=EmbeddingCache())
+    texts = ["w3 w4 w5", "w6", "w7 w8 w9 w10 w11 w12"]
+    expected = embedder.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    np.testing.assert_allclose(embedder.embed_texts(texts), expected, atol=1e-5)
+
+
+def test_pipeline_summaries_match_the_pipeline(tiny_t5):
+    summarizer = pipeline("summarization", model=tiny_t5.model, tokenizer=tiny_t5.tokenizer)
+    chunks = ["w3 w4 w5 w6 w7 w8", "w9 w10 w11"]
+    expected = [o["summary_text"] for o in summarizer(chunks, min_length=2, max_length=6, truncation=True, batch_size=2)]
+    assert summarize_chunks(chunks, summarizer, min_length=2, max_length=6) == expected
@@ -0,0 +1,72 @@
+import faiss
+import numpy as np
+
+from chatbot.vectorstore import VectorStore
+
+
+def random_vectors(count, dim=32, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def stream(store, vectors, batch_size=64, doc_id="doc"):
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        first = len(store.text_chunks)
+        store.add_embeddings(batch, [f"chunk {first + i}" for i in range(len(batch))], doc_id=doc_id)
+
+
+def pq_bits(store):
+    return faiss.downcast_index(faiss.extract_index_ivf(store.index)).pq.nbits
+
+
+def test_ivf_trained_on_a_first_batch_is_retrained_as_the_store_grows():
+    store = VectorStore(32, index_type="ivf", nlist=128, nprobe=128)
+    vectors = random_vectors(3000)
+    stream(store, vectors[:64])
+    assert faiss.extract_index_ivf(store.index).nlist == 64
+
+    stream(store, vectors[64:])
+    assert faiss.extract_index_ivf(store.index).nlist == 128
+    assert store.trained_on >= 1024
+    assert store.index.ntotal == 3000
+    ids, _ = store.search(vectors[2500], top_k=1)
+    assert ids.tolist() == [2500] and store.text_chunks[2500] == "chunk 2500"
+
+
+def test_pq_codebooks_reach_full_size_after_a_small_first_batch():
+    store = VectorStore(32, compression="pq")
+    vectors = random_vectors(1200)
+    stream(store, vectors[:64])
+    assert pq_bits(store) == 6
+
+    stream(store, vectors[64:])
+    assert pq_bits(store) == 8
+    ids, _ = store.search(vectors[700], top_k=1)
+    assert ids.tolist() == [700]
+
+
+def test_hnsw_is_rebuilt_once_tombstones_pile_up():
+    store = VectorStore(32, index_type="hnsw")
+    vectors = random_vectors(400)
+    for doc in range(8):
+        stream(store, vectors[doc * 50:(doc + 1) * 50], doc_id=f"doc{doc}")
+
+    store.remove_document("doc0")
+    store.remove_document("doc1")
+    assert len(store.removed_ids) == 100
+    store.remove_document("doc2")
+    assert store.removed_ids == set() and store.index.ntotal == 250
+
+    ids, _ = store.search(vectors[10], top_k=50)
+    assert len(ids) == 50 and ids.min() >= 150
+    ids, _ = store.search(vectors[321], top_k=1)
+    assert ids.tolist() == [321] and store.text_chunks[321] == "chunk 321"
+
+
+def test_save_and_load_keep_training_state(tmp_path):
+    store = VectorStore(32, index_type="ivf", nlist=16)
+    stream(store, random_vectors(300))
+    store.save(str(tmp_path))
+    loaded = VectorStore.load(str(tmp_path))
+    assert loaded.trained_on == store.trained_on